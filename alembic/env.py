@@ -1,12 +1,14 @@
+import logging
 from logging.config import fileConfig
-from sqlalchemy import engine_from_config
 from sqlalchemy import pool
 from alembic import context
 import asyncio
-from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.ext.asyncio import async_engine_from_config
 
+from app.core.backfill import run_scheduled, scheduled
 from app.core.database import Base
 from app.core.config import settings
+import app.models  # noqa: F401  (registers the tables on Base.metadata)
 
 config = context.config
 
@@ -14,6 +16,7 @@ if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
 target_metadata = Base.metadata
+logger = logging.getLogger("alembic.env")
 
 
 def run_migrations_offline() -> None:
@@ -28,7 +31,7 @@ def run_migrations_offline() -> None:
     script output.
 
     """
-    url = settings.database_url.replace("+asyncpg", "")
+    url = config.get_main_option("sqlalchemy.url") or settings.database_url
     context.configure(
         url=url,
         target_metadata=target_metadata,
@@ -39,6 +42,14 @@ def run_migrations_offline() -> None:
     with context.begin_transaction():
         context.run_migrations()
 
+    if scheduled():
+        # Nothing to run them on; the script only carries the schema change.
+        logger.warning(
+            "%s backfill(s) or index build(s) were scheduled and are not in the script; "
+            "run them with app.cli.backfill after applying it",
+            scheduled(),
+        )
+
 
 def do_run_migrations(connection):
     context.configure(connection=connection, target_metadata=target_metadata)
@@ -54,9 +65,9 @@ async def run_migrations_online() -> None:
     and associate a connection with the context.
 
     """
-    configuration = config.get_section(config.config_ini_section)
-    configuration["sqlalchemy.url"] = settings.database_url.replace("+asyncpg", "")
-    connectable = engine_from_config(
+    configuration = config.get_section(config.config_ini_section, {})
+    configuration.setdefault("sqlalchemy.url", settings.database_url)
+    connectable = async_engine_from_config(
         configuration,
         prefix="sqlalchemy.",
         poolclass=pool.NullPool,
@@ -65,6 +76,11 @@ async def run_migrations_online() -> None:
     async with connectable.connect() as connection:
         await connection.run_sync(do_run_migrations)
 
+    # Backfills and CONCURRENTLY index builds queued by the migrations run
+    # after the schema change has committed, outside its transaction. They
+    # checkpoint as they go, so an interrupted upgrade can be finished with
+    # app.cli.backfill.
+    await run_scheduled(connectable)
     await connectable.dispose()
 
 
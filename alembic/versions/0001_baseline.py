@@ -0,0 +1,77 @@
+"""Baseline: users and templates
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 00:00:00.000000
+
+Databases created by the old create_all startup already have this schema
+and only need `alembic stamp 0001` (after app.cli.migrate_uuid_ids if their
+ids are still VARCHAR).
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: str | None = None
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | None = None
+
+
+def _common_columns() -> list[sa.Column]:
+    return [
+        sa.Column("id", sa.Uuid(as_uuid=False), primary_key=True),
+        sa.Column("email", sa.String(255), nullable=False, unique=True),
+        sa.Column("name", sa.String(255), nullable=True),
+        sa.Column("password", sa.String(255), nullable=False),
+    ]
+
+
+def _timestamps() -> list[sa.Column]:
+    return [
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    ]
+
+
+def _search_indexes(table: str, postgresql: bool) -> None:
+    for field in ("email", "name"):
+        if postgresql:
+            op.execute(f"CREATE INDEX ix_{table}_{field}_prefix ON {table} (lower({field}) text_pattern_ops)")
+            op.execute(f"CREATE INDEX ix_{table}_{field}_trgm ON {table} USING gin (lower({field}) gin_trgm_ops)")
+        else:
+            op.create_index(f"ix_{table}_{field}_prefix", table, [sa.text(f"lower({field})")])
+
+
+def upgrade() -> None:
+    postgresql = op.get_bind().dialect.name == "postgresql"
+    if postgresql:
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    op.create_table("users", *_common_columns(), *_timestamps())
+    op.create_index("ix_users_created_at_id", "users", ["created_at", "id"])
+    _search_indexes("users", postgresql)
+
+    op.create_table(
+        "templates",
+        *_common_columns(),
+        sa.Column("published", sa.Boolean(), nullable=False),
+        *_timestamps(),
+    )
+    op.create_index("ix_templates_created_at_id", "templates", ["created_at", "id"])
+    op.create_index(
+        "ix_templates_published_created_at_id",
+        "templates",
+        ["created_at", "id"],
+        postgresql_where=sa.text("published IS true"),
+        sqlite_where=sa.text("published IS 1"),
+    )
+    _search_indexes("templates", postgresql)
+
+
+def downgrade() -> None:
+    op.drop_table("templates")
+    op.drop_table("users")
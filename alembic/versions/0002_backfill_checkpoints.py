@@ -0,0 +1,40 @@
+"""Backfill checkpoints
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 00:00:00.000000
+
+Progress of the batched data migrations in app.core.backfill. The table may
+already exist on databases where app.cli.migrate_uuid_ids ran a backfill
+before they were stamped.
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: str | None = "0001"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | None = None
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("backfill_checkpoints"):
+        return
+    op.create_table(
+        "backfill_checkpoints",
+        sa.Column("name", sa.String(255), primary_key=True),
+        sa.Column("last_key", sa.String(255), nullable=True),
+        sa.Column("rows", sa.BigInteger(), nullable=False),
+        sa.Column("batches", sa.Integer(), nullable=False),
+        sa.Column("started_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("backfill_checkpoints")
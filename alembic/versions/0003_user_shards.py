@@ -0,0 +1,35 @@
+"""User shard directory
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 00:00:00.000000
+
+Email-to-shard lookup used when DATABASE_SHARD_URLS spreads users over
+several databases. Unused (and empty) otherwise.
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: str | None = "0002"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_shards",
+        sa.Column("email", sa.String(255), nullable=False),
+        sa.Column("user_id", sa.Uuid(as_uuid=False), nullable=False),
+        sa.Column("shard", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("email", name="user_shards_email_key"),
+    )
+    op.create_index("ix_user_shards_user_id", "user_shards", ["user_id"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_table("user_shards")
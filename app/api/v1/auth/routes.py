@@ -1,9 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request, Security
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Request, Security
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
 from secrets import token_urlsafe
-from app.core.database import get_db
-from app.core.security import create_access_token, verify_password, get_password_hash
+from app.core.database import get_db, get_session_maker
+from app.core.ids import new_id
+from app.core.security import (
+    create_access_token,
+    decode_token_cached,
+    get_token_id,
+    verify_password_async,
+    hash_password_async,
+    password_needs_rehash,
+)
 from app.api.v1.auth.schemas import (
     LoginRequest,
     RegisterRequest,
@@ -12,11 +20,15 @@ from app.api.v1.auth.schemas import (
     ForgotPasswordRequest,
     VerifyForgotPasswordRequest,
 )
+from app.common.dependencies import get_current_user
+from app.models.user import User
 from app.repositories.user_repository import UserRepository
 from app.services.user_service import UserService
+from app.services.password_service import rehash_user_password
 from app.services.cache_service import cache_service
+from app.services.revocation_service import revocation_service
+from app.services.principal_cache import principal_cache
 from app.services.email_service import email_service
-import uuid
 
 router = APIRouter()
 security = HTTPBearer()
@@ -29,18 +41,11 @@ async def register(
     user_repo = UserRepository(db)
     user_service = UserService(user_repo)
 
-    existing_user = await user_repo.get_by_email(request.email)
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered"
-        )
-
     user_data = {
-        "id": str(uuid.uuid4()),
+        "id": new_id(),
         "email": request.email,
         "name": request.name,
-        "password": get_password_hash(request.password),
+        "password": await hash_password_async(request.password),
     }
 
     user = await user_service.create_user(user_data)
@@ -57,18 +62,31 @@ async def register(
 @router.post("/login", response_model=TokenResponse, summary="API login")
 async def login(
     request: LoginRequest,
+    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db),
 ):
     user_repo = UserRepository(db)
-    user = await user_repo.get_by_email(request.email)
+    # The password hash is never cached, so it is read from the database.
+    user = await user_repo.get_by_email_uncached(request.email)
+    # Hand the connection back before bcrypt, which takes far longer.
+    await user_repo.release()
 
-    if not user or not verify_password(request.password, user.password):
+    if not user or not await verify_password_async(request.password, user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    if password_needs_rehash(user.password):
+        background_tasks.add_task(
+            rehash_user_password,
+            get_session_maker(db),
+            user.id,
+            user.password,
+            request.password,
+        )
+
     access_token = create_access_token(data={"sub": user.id})
     
     return TokenResponse(
@@ -89,10 +107,31 @@ async def logout(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token required",
         )
-    await cache_service.set_blacklist_token(token, ttl=3600)
+    payload = decode_token_cached(token)
+    await revocation_service.revoke(get_token_id(token, payload), payload["exp"])
     return {"message": "Logged out successfully"}
 
 
+@router.post("/logout-all", status_code=status.HTTP_200_OK, summary="API logout from all devices")
+async def logout_all(
+    user: User = Depends(get_current_user),
+):
+    await revocation_service.revoke_all(user.id)
+    return {"message": "Logged out from all devices successfully"}
+
+
+@router.get("/me", response_model=UserResponse, summary="API current user")
+async def me(
+    user: User = Depends(get_current_user),
+):
+    # Served from the principal cache, so this does not query the database.
+    return UserResponse(
+        id=user.id,
+        email=user.email,
+        name=user.name,
+    )
+
+
 @router.post("/forgot-password", status_code=status.HTTP_200_OK, summary="API forgot password")
 async def forgot_password(
     request: ForgotPasswordRequest,
@@ -104,6 +143,7 @@ async def forgot_password(
     if not user:
         return {"message": "If that email exists, we'll send a password reset link."}
     
+    await user_repo.release()
     reset_token = token_urlsafe(32)
     await cache_service.set(f"reset_token:{request.email}", reset_token, ttl=3600)
     
@@ -134,8 +174,11 @@ async def verify_forgot_password(
             detail="Invalid or expired reset token"
         )
     
-    hashed_password = get_password_hash(request.new_password)
+    await user_repo.release()
+    hashed_password = await hash_password_async(request.new_password)
     await user_repo.update(user.id, {"password": hashed_password})
+    await revocation_service.revoke_all(user.id)
+    await principal_cache.invalidate(user.id)
     
     await cache_service.delete(f"reset_token:{request.email}")
     
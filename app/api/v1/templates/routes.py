@@ -1,16 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.common.dependencies import ListParams
+from app.common.export import ExportFormat, export_response
+from app.common.filtering import parse_filters, parse_sort
+from app.common.pagination import CountMode
+from app.common.schemas import BulkItemResult, BulkResponse
+from app.common.projection import parse_fields, project, sparse_response
+from app.core.config import settings
 from app.core.database import get_db
-from app.core.security import get_password_hash
+from app.core.ids import new_id
+from app.core.security import hash_password_async, hash_passwords_async
 from app.api.v1.templates.schemas import (
     TemplateResponse,
     TemplateCreateRequest,
     TemplateUpdateRequest,
     TemplateListResponse,
+    TemplateBulkRequest,
 )
 from app.repositories.template_repository import TemplateRepository
 from app.services.template_service import TemplateService
-import uuid
 
 router = APIRouter()
 
@@ -23,18 +31,11 @@ async def create_template(
     template_repo = TemplateRepository(db)
     template_service = TemplateService(template_repo)
 
-    existing_template = await template_repo.get_by_email(request.email)
-    if existing_template:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered"
-        )
-
     template_data = {
-        "id": str(uuid.uuid4()),
+        "id": new_id(),
         "email": request.email,
         "name": request.name,
-        "password": get_password_hash(request.password),
+        "password": await hash_password_async(request.password),
         "published": request.published,
     }
 
@@ -47,24 +48,135 @@ async def create_template(
     )
 
 
+@router.post("/bulk", response_model=BulkResponse)
+async def bulk_templates(
+    request: TemplateBulkRequest,
+    db: AsyncSession = Depends(get_db),
+):
+    template_repo = TemplateRepository(db)
+    template_service = TemplateService(template_repo)
+    response = BulkResponse()
+
+    if request.create:
+        passwords = await hash_passwords_async([item.password for item in request.create])
+        templates = await template_service.bulk_create_templates([
+            {
+                "id": new_id(),
+                "email": item.email,
+                "name": item.name,
+                "password": password,
+                "published": item.published,
+            }
+            for item, password in zip(request.create, passwords, strict=True)
+        ])
+        response.created = [
+            BulkItemResult(index=i, id=template.id, status="created")
+            if template is not None
+            else BulkItemResult(index=i, status="conflict", detail="Email already registered")
+            for i, template in enumerate(templates)
+        ]
+
+    if request.update:
+        templates = await template_service.bulk_update_templates(
+            [item.model_dump(exclude_unset=True) for item in request.update]
+        )
+        response.updated = [
+            BulkItemResult.from_outcome(i, item.id, template, "updated")
+            for i, (item, template) in enumerate(zip(request.update, templates, strict=True))
+        ]
+
+    if request.delete:
+        deleted = await template_service.bulk_delete_templates(request.delete)
+        response.deleted = [
+            BulkItemResult.from_outcome(i, template_id, outcome, "deleted")
+            for i, (template_id, outcome) in enumerate(zip(request.delete, deleted, strict=True))
+        ]
+
+    return response
+
+
 @router.get("/", response_model=TemplateListResponse)
 async def get_templates(
-    skip: int = 0,
-    limit: int = 100,
+    params: ListParams = Depends(),
     db: AsyncSession = Depends(get_db),
 ):
     template_repo = TemplateRepository(db)
     template_service = TemplateService(template_repo)
 
-    templates = await template_service.get_all_templates(skip, limit)
-    return TemplateListResponse(
-        templates=[
-            TemplateResponse(id=t.id, email=t.email, name=t.name, published=t.published)
-            for t in templates
-        ],
-        total=len(templates),
+    columns = parse_fields(params.fields, TemplateResponse)
+    filters = parse_filters(params.filter_specs)
+    order = parse_sort(params.sort)
+    total = await template_service.count_templates(params.count, filters)
+    if params.skip and not params.cursor:
+        templates = await template_service.get_all_templates(params.skip, params.limit, columns, filters, order)
+        response = TemplateListResponse.create(
+            items=[],
+            total=total,
+            page=params.skip // params.limit + 1,
+            limit=params.limit,
+            total_is_estimate=params.count == CountMode.estimated,
+        )
+    else:
+        page = await template_service.get_templates_page(params.limit, params.cursor, columns, filters, order)
+        templates = page.items
+        response = TemplateListResponse.create(
+            items=[],
+            total=total,
+            page=None,
+            limit=params.limit,
+            next_cursor=page.next_cursor,
+            prev_cursor=page.prev_cursor,
+            total_is_estimate=params.count == CountMode.estimated,
+        )
+
+    if params.fields:
+        return sparse_response(response, [project(t, columns) for t in templates])
+    response.items = [
+        TemplateResponse(id=t.id, email=t.email, name=t.name, published=t.published)
+        for t in templates
+    ]
+    return response
+
+
+@router.get("/search", response_model=TemplateListResponse)
+async def search_templates(
+    q: str = Query(..., min_length=1, max_length=255, description="Email or name prefix or substring"),
+    cursor: str | None = None,
+    limit: int = Query(20, ge=1, le=settings.pagination_max_limit),
+    fields: str | None = Query(None, description="Comma-separated fields to return, e.g. id,email"),
+    db: AsyncSession = Depends(get_db),
+):
+    template_repo = TemplateRepository(db)
+    template_service = TemplateService(template_repo)
+
+    columns = parse_fields(fields, TemplateResponse)
+    page = await template_service.search_templates(q, columns, limit, cursor)
+    response = TemplateListResponse.create(
+        items=[],
+        total=None,
+        page=None,
+        limit=limit,
+        next_cursor=page.next_cursor,
     )
 
+    if fields:
+        return sparse_response(response, page.items)
+    response.items = [TemplateResponse(**item) for item in page.items]
+    return response
+
+
+@router.get("/export")
+async def export_templates(
+    file_format: ExportFormat = Query(ExportFormat.ndjson, alias="format"),
+    fields: str | None = Query(None, description="Comma-separated fields to export, e.g. id,email"),
+    db: AsyncSession = Depends(get_db),
+):
+    template_repo = TemplateRepository(db)
+    template_service = TemplateService(template_repo)
+
+    columns = parse_fields(fields, TemplateResponse)
+    return export_response(template_service.stream_templates(columns), columns, file_format, "templates")
+
 
 @router.get("/{template_id}", response_model=TemplateResponse)
 async def get_template(
@@ -74,7 +186,9 @@ async def get_template(
     template_repo = TemplateRepository(db)
     template_service = TemplateService(template_repo)
 
-    template = await template_service.get_template_by_id(template_id)
+    template = await template_service.get_template_by_id(
+        template_id, list(TemplateResponse.model_fields)
+    )
     if not template:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -98,16 +212,14 @@ async def update_template(
     template_repo = TemplateRepository(db)
     template_service = TemplateService(template_repo)
 
-    template = await template_service.get_template_by_id(template_id)
-    if not template:
+    update_data = request.model_dump(exclude_unset=True)
+    updated_template = await template_service.update_template(template_id, update_data)
+    if not updated_template:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Template not found"
         )
 
-    update_data = request.model_dump(exclude_unset=True)
-    updated_template = await template_service.update_template(template_id, update_data)
-
     return TemplateResponse(
         id=updated_template.id,
         email=updated_template.email,
@@ -124,13 +236,10 @@ async def delete_template(
     template_repo = TemplateRepository(db)
     template_service = TemplateService(template_repo)
 
-    template = await template_service.get_template_by_id(template_id)
-    if not template:
+    if not await template_service.delete_template(template_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Template not found"
         )
-
-    await template_service.delete_template(template_id)
     return None
 
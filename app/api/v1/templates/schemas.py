@@ -1,4 +1,7 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field, field_validator
+
+from app.common.schemas import PaginationResponse
+from app.core.config import settings
 
 
 class TemplateResponse(BaseModel):
@@ -23,8 +26,25 @@ class TemplateUpdateRequest(BaseModel):
     name: str | None = None
     published: bool | None = None
 
+    @field_validator("email", "published")
+    @classmethod
+    def not_null(cls, value):
+        # Optional, but an explicit null would violate NOT NULL.
+        if value is None:
+            message = "must not be null"
+            raise ValueError(message)
+        return value
+
+
+class TemplateListResponse(PaginationResponse[TemplateResponse]):
+    items: list[TemplateResponse] = Field(alias="templates")
+
+
+class TemplateBulkUpdateItem(TemplateUpdateRequest):
+    id: str
 
-class TemplateListResponse(BaseModel):
-    templates: list[TemplateResponse]
-    total: int
 
+class TemplateBulkRequest(BaseModel):
+    create: list[TemplateCreateRequest] = Field(default_factory=list, max_length=settings.bulk_max_items)
+    update: list[TemplateBulkUpdateItem] = Field(default_factory=list, max_length=settings.bulk_max_items)
+    delete: list[str] = Field(default_factory=list, max_length=settings.bulk_max_items)
@@ -1,17 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from app.common.dependencies import ListParams
+from app.common.export import ExportFormat, export_response
+from app.common.filtering import parse_filters, parse_sort
+from app.common.pagination import CountMode
+from app.common.schemas import BulkItemResult, BulkResponse
+from app.common.projection import parse_fields, project, sparse_response
+from app.core.config import settings
 from app.core.database import get_db
-from app.core.security import get_password_hash
+from app.core.ids import new_id
+from app.core.security import hash_password_async, hash_passwords_async
 from app.api.v1.users.schemas import (
     UserResponse,
     UserCreateRequest,
     UserUpdateRequest,
     UserListResponse,
+    UserBulkRequest,
+    UserImportResponse,
 )
 from app.repositories.user_repository import UserRepository
+from app.services.import_service import ImportFormat, ImportService, read_records
 from app.services.user_service import UserService
-import uuid
+from app.services.principal_cache import principal_cache
 
 router = APIRouter()
 
@@ -24,18 +34,11 @@ async def create_user(
     user_repo = UserRepository(db)
     user_service = UserService(user_repo)
 
-    existing_user = await user_repo.get_by_email(request.email)
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered"
-        )
-
     user_data = {
-        "id": str(uuid.uuid4()),
+        "id": new_id(),
         "email": request.email,
         "name": request.name,
-        "password": get_password_hash(request.password),
+        "password": await hash_password_async(request.password),
     }
 
     user = await user_service.create_user(user_data)
@@ -46,21 +49,154 @@ async def create_user(
     )
 
 
+@router.post("/bulk", response_model=BulkResponse, summary="Create, update and delete users in bulk")
+async def bulk_users(
+    request: UserBulkRequest,
+    db: AsyncSession = Depends(get_db),
+):
+    user_repo = UserRepository(db)
+    user_service = UserService(user_repo)
+    response = BulkResponse()
+
+    if request.create:
+        passwords = await hash_passwords_async([item.password for item in request.create])
+        users = await user_service.bulk_create_users([
+            {
+                "id": new_id(),
+                "email": item.email,
+                "name": item.name,
+                "password": password,
+            }
+            for item, password in zip(request.create, passwords, strict=True)
+        ])
+        response.created = [
+            BulkItemResult(index=i, id=user.id, status="created")
+            if user is not None
+            else BulkItemResult(index=i, status="conflict", detail="Email already registered")
+            for i, user in enumerate(users)
+        ]
+
+    if request.update:
+        users = await user_service.bulk_update_users(
+            [item.model_dump(exclude_unset=True) for item in request.update]
+        )
+        response.updated = [
+            BulkItemResult.from_outcome(i, item.id, user, "updated")
+            for i, (item, user) in enumerate(zip(request.update, users, strict=True))
+        ]
+
+    if request.delete:
+        deleted = await user_service.bulk_delete_users(request.delete)
+        response.deleted = [
+            BulkItemResult.from_outcome(i, user_id, outcome, "deleted")
+            for i, (user_id, outcome) in enumerate(zip(request.delete, deleted, strict=True))
+        ]
+
+    await principal_cache.invalidate_many([
+        result.id
+        for result in [*response.updated, *response.deleted]
+        if result.status in ("updated", "deleted")
+    ])
+    return response
+
+
+@router.post("/import", response_model=UserImportResponse, summary="Import users from CSV or NDJSON")
+async def import_users(
+    request: Request,
+    file_format: ImportFormat = Query(ImportFormat.csv, alias="format"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Streams the raw request body (email, password and optional name per
+    record) into the users table without buffering it in memory.
+
+    Existing emails are always skipped. Overwriting existing users' passwords
+    (``--on-conflict update``) is only available from the CLI, since this
+    endpoint is not authenticated.
+    """
+    import_service = ImportService(UserRepository(db))
+    report = await import_service.import_users(read_records(request.stream(), file_format))
+    return report.as_dict()
+
+
 @router.get("/", response_model=UserListResponse, summary="Get all users")
 async def get_users(
-    skip: int = 0,
-    limit: int = 100,
+    params: ListParams = Depends(),
     db: AsyncSession = Depends(get_db),
 ):
     user_repo = UserRepository(db)
     user_service = UserService(user_repo)
 
-    users = await user_service.get_all_users(skip, limit)
-    return UserListResponse(
-        users=[UserResponse(id=u.id, email=u.email, name=u.name) for u in users],
-        total=len(users),
+    columns = parse_fields(params.fields, UserResponse)
+    filters = parse_filters(params.filter_specs)
+    order = parse_sort(params.sort)
+    total = await user_service.count_users(params.count, filters)
+    if params.skip and not params.cursor:
+        users = await user_service.get_all_users(params.skip, params.limit, columns, filters, order)
+        response = UserListResponse.create(
+            items=[],
+            total=total,
+            page=params.skip // params.limit + 1,
+            limit=params.limit,
+            total_is_estimate=params.count == CountMode.estimated,
+        )
+    else:
+        page = await user_service.get_users_page(params.limit, params.cursor, columns, filters, order)
+        users = page.items
+        response = UserListResponse.create(
+            items=[],
+            total=total,
+            page=None,
+            limit=params.limit,
+            next_cursor=page.next_cursor,
+            prev_cursor=page.prev_cursor,
+            total_is_estimate=params.count == CountMode.estimated,
+        )
+
+    if params.fields:
+        return sparse_response(response, [project(u, columns) for u in users])
+    response.items = [UserResponse(id=u.id, email=u.email, name=u.name) for u in users]
+    return response
+
+
+@router.get("/search", response_model=UserListResponse, summary="Search users by email or name")
+async def search_users(
+    q: str = Query(..., min_length=1, max_length=255, description="Email or name prefix or substring"),
+    cursor: str | None = None,
+    limit: int = Query(20, ge=1, le=settings.pagination_max_limit),
+    fields: str | None = Query(None, description="Comma-separated fields to return, e.g. id,email"),
+    db: AsyncSession = Depends(get_db),
+):
+    user_repo = UserRepository(db)
+    user_service = UserService(user_repo)
+
+    columns = parse_fields(fields, UserResponse)
+    page = await user_service.search_users(q, columns, limit, cursor)
+    response = UserListResponse.create(
+        items=[],
+        total=None,
+        page=None,
+        limit=limit,
+        next_cursor=page.next_cursor,
     )
 
+    if fields:
+        return sparse_response(response, page.items)
+    response.items = [UserResponse(**item) for item in page.items]
+    return response
+
+
+@router.get("/export", summary="Export all users")
+async def export_users(
+    file_format: ExportFormat = Query(ExportFormat.ndjson, alias="format"),
+    fields: str | None = Query(None, description="Comma-separated fields to export, e.g. id,email"),
+    db: AsyncSession = Depends(get_db),
+):
+    user_repo = UserRepository(db)
+    user_service = UserService(user_repo)
+
+    columns = parse_fields(fields, UserResponse)
+    return export_response(user_service.stream_users(columns), columns, file_format, "users")
+
 
 @router.get("/{user_id}", response_model=UserResponse, summary="Get user by ID")
 async def get_user(
@@ -70,7 +206,7 @@ async def get_user(
     user_repo = UserRepository(db)
     user_service = UserService(user_repo)
 
-    user = await user_service.get_user_by_id(user_id)
+    user = await user_service.get_user_by_id(user_id, list(UserResponse.model_fields))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -93,15 +229,14 @@ async def update_user(
     user_repo = UserRepository(db)
     user_service = UserService(user_repo)
 
-    user = await user_service.get_user_by_id(user_id)
-    if not user:
+    update_data = request.model_dump(exclude_unset=True)
+    updated_user = await user_service.update_user(user_id, update_data)
+    if not updated_user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
-
-    update_data = request.model_dump(exclude_unset=True)
-    updated_user = await user_service.update_user(user_id, update_data)
+    await principal_cache.invalidate(user_id)
 
     return UserResponse(
         id=updated_user.id,
@@ -118,13 +253,11 @@ async def delete_user(
     user_repo = UserRepository(db)
     user_service = UserService(user_repo)
 
-    user = await user_service.get_user_by_id(user_id)
-    if not user:
+    if not await user_service.delete_user(user_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
-
-    await user_service.delete_user(user_id)
+    await principal_cache.invalidate(user_id)
     return None
 
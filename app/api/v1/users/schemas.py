@@ -1,4 +1,7 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field, field_validator
+
+from app.common.schemas import PaginationResponse
+from app.core.config import settings
 
 
 class UserResponse(BaseModel):
@@ -20,8 +23,41 @@ class UserUpdateRequest(BaseModel):
     email: EmailStr | None = None
     name: str | None = None
 
+    @field_validator("email")
+    @classmethod
+    def not_null(cls, value):
+        # Optional, but an explicit null would violate NOT NULL.
+        if value is None:
+            message = "must not be null"
+            raise ValueError(message)
+        return value
+
+
+class UserListResponse(PaginationResponse[UserResponse]):
+    items: list[UserResponse] = Field(alias="users")
+
+
+class UserBulkUpdateItem(UserUpdateRequest):
+    id: str
+
+
+class UserBulkRequest(BaseModel):
+    create: list[UserCreateRequest] = Field(default_factory=list, max_length=settings.bulk_max_items)
+    update: list[UserBulkUpdateItem] = Field(default_factory=list, max_length=settings.bulk_max_items)
+    delete: list[str] = Field(default_factory=list, max_length=settings.bulk_max_items)
+
+
+class UserImportError(BaseModel):
+    line: int
+    error: str
 
-class UserListResponse(BaseModel):
-    users: list[UserResponse]
-    total: int
 
+class UserImportResponse(BaseModel):
+    rows: int
+    imported: int
+    skipped: int
+    invalid: int
+    batches: int
+    elapsed_seconds: float
+    rows_per_second: float
+    errors: list[UserImportError]
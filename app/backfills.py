@@ -0,0 +1,28 @@
+"""Backfills known to ``python -m app.cli.backfill``.
+
+Define a backfill here and register it, then schedule it from the migration
+that adds the columns it fills (see app.core.backfill).
+"""
+from sqlalchemy import cast, column, table
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.core.backfill import Backfill, register
+
+
+def id_uuid_backfill(name: str) -> Backfill:
+    # Fills the shadow column added by app.cli.migrate_uuid_ids. The table is
+    # described by hand because the models already declare id as uuid.
+    shadow = table(name, column("id"), column("id_uuid"))
+    return Backfill(
+        name=f"{name}_id_uuid",
+        key=shadow.c.id,
+        statement=lambda batch: (
+            shadow.update()
+            .where(batch, shadow.c.id_uuid.is_(None))
+            .values(id_uuid=cast(shadow.c.id, UUID))
+        ),
+    )
+
+
+users_id_uuid = register(id_uuid_backfill("users"))
+templates_id_uuid = register(id_uuid_backfill("templates"))
@@ -0,0 +1,63 @@
+"""Run and inspect backfills (see app.core.backfill).
+
+    python -m app.cli.backfill status
+    python -m app.cli.backfill run users_id_uuid --batch-size 5000
+    python -m app.cli.backfill run users_id_uuid --restart
+
+``run`` resumes from the last committed checkpoint, so an interrupted or
+killed run can simply be started again.
+"""
+import argparse
+import asyncio
+import dataclasses
+import logging
+import sys
+
+import app.backfills  # noqa: F401  (registers the backfills)
+from app.core.backfill import Throttle, backfill_status, registry, run_backfill
+from app.core.database import close_db, engine
+
+
+async def run(args: argparse.Namespace) -> list[dict]:
+    try:
+        if args.command == "status":
+            return await backfill_status(engine)
+
+        backfill = registry[args.name]
+        if args.batch_size:
+            backfill = dataclasses.replace(backfill, batch_size=args.batch_size)
+        throttle = Throttle.from_settings()
+        if args.pause is not None:
+            throttle.pause = args.pause
+        if args.max_lag is not None:
+            throttle.max_replication_lag = args.max_lag
+        return [await run_backfill(engine, backfill, throttle, restart=args.restart)]
+    finally:
+        await close_db()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run data migrations in resumable batches.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="Show the checkpoint of every backfill that has run")
+    run_parser = commands.add_parser("run", help="Run a backfill from its last checkpoint")
+    run_parser.add_argument("name", choices=sorted(registry))
+    run_parser.add_argument("--batch-size", type=int, help="Defaults to BACKFILL_BATCH_SIZE")
+    run_parser.add_argument("--pause", type=float, help="Seconds to sleep between batches")
+    run_parser.add_argument("--max-lag", type=float, help="Wait while replicas are further behind (seconds)")
+    run_parser.add_argument("--restart", action="store_true", help="Discard the checkpoint and start over")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    checkpoints = asyncio.run(run(args))
+    sys.stdout.write(f"{'name':<32} {'rows':>12} {'batches':>8} {'last key':<36} finished\n")
+    for checkpoint in checkpoints:
+        sys.stdout.write(
+            f"{checkpoint['name']:<32} {checkpoint['rows']:>12} {checkpoint['batches']:>8} "
+            f"{checkpoint['last_key'] or '-':<36} {checkpoint['finished_at'] or 'no'}\n"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
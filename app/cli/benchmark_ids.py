@@ -0,0 +1,83 @@
+"""Compare insert throughput and primary key size for the id formats.
+
+    python -m app.cli.benchmark_ids --rows 1000000
+
+Inserts the same number of rows into scratch tables keyed by random UUID4
+text (the old format), random UUID4 and time-ordered UUID7 (the current
+format), then reports rows per second and the size of each primary key
+index. The scratch tables are dropped afterwards.
+"""
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+from collections.abc import Callable
+
+from sqlalchemy import text
+
+from app.core.database import close_db, engine
+from app.core.ids import uuid7
+
+VARIANTS: dict[str, tuple[str, Callable[[], object]]] = {
+    "text_uuid4": ("varchar", lambda: str(uuid.uuid4())),
+    "uuid4": ("uuid", uuid.uuid4),
+    "uuid7": ("uuid", uuid7),
+}
+
+
+async def bench(name: str, column_type: str, make_id: Callable[[], object], rows: int, batch_size: int) -> dict:
+    table = f"bench_ids_{name}"
+    async with engine.begin() as connection:
+        await connection.execute(text(f"DROP TABLE IF EXISTS {table}"))
+        await connection.execute(text(
+            f"CREATE TABLE {table} (id {column_type} PRIMARY KEY, created_at timestamptz NOT NULL DEFAULT now())"
+        ))
+
+    insert = text(f"INSERT INTO {table} (id) VALUES (:id)")
+    started = time.perf_counter()
+    for offset in range(0, rows, batch_size):
+        batch = [{"id": make_id()} for _ in range(min(batch_size, rows - offset))]
+        async with engine.begin() as connection:
+            await connection.execute(insert, batch)
+    elapsed = time.perf_counter() - started
+
+    async with engine.begin() as connection:
+        index_bytes = (await connection.execute(
+            text(f"SELECT pg_relation_size('{table}_pkey')")
+        )).scalar_one()
+        await connection.execute(text(f"DROP TABLE {table}"))
+    return {"variant": name, "rows_per_second": rows / elapsed, "pkey_bytes": index_bytes}
+
+
+async def run(args: argparse.Namespace) -> list[dict]:
+    try:
+        if engine.dialect.name != "postgresql":
+            message = "The benchmark needs PostgreSQL"
+            raise SystemExit(message)
+        return [
+            await bench(name, column_type, make_id, args.rows, args.batch_size)
+            for name, (column_type, make_id) in VARIANTS.items()
+        ]
+    finally:
+        await close_db()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark primary key formats.")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    sys.stdout.write(f"{'variant':<12} {'rows/s':>10} {'pkey MB':>10}\n")
+    for result in results:
+        sys.stdout.write(
+            f"{result['variant']:<12} {result['rows_per_second']:>10.0f} "
+            f"{result['pkey_bytes'] / 1024 / 1024:>10.1f}\n"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
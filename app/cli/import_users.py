@@ -0,0 +1,84 @@
+"""Import users from a CSV or NDJSON file.
+
+    python -m app.cli.import_users users.csv
+    python -m app.cli.import_users users.ndjson --on-conflict update
+
+Batches commit as they go and rows are merged on email, so an interrupted
+import can simply be run again.
+"""
+import argparse
+import asyncio
+import logging
+import sys
+from collections.abc import AsyncIterator
+from pathlib import Path
+
+from app.core.cache import cache_service
+from app.core.config import settings
+from app.core.database import async_session_maker, close_db
+from app.core.hashing import hashing_pool
+from app.repositories.user_repository import UserRepository
+from app.services.import_service import (
+    ConflictMode,
+    ImportFormat,
+    ImportReport,
+    ImportService,
+    read_records,
+)
+
+CHUNK_SIZE = 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+async def read_chunks(path: Path) -> AsyncIterator[bytes]:
+    with path.open("rb") as f:
+        while chunk := await asyncio.to_thread(f.read, CHUNK_SIZE):
+            yield chunk
+
+
+def log_progress(report: ImportReport) -> None:
+    logger.info(
+        "%s rows, %s imported, %s skipped, %s invalid (%.0f rows/s)",
+        report.rows,
+        report.imported,
+        report.skipped,
+        report.invalid,
+        report.rows_per_second,
+    )
+
+
+async def run(args: argparse.Namespace) -> ImportReport:
+    fmt = args.format or (ImportFormat.ndjson if args.path.suffix in (".ndjson", ".jsonl") else ImportFormat.csv)
+    try:
+        async with async_session_maker() as session:
+            import_service = ImportService(UserRepository(session))
+            return await import_service.import_users(
+                read_records(read_chunks(args.path), fmt),
+                on_conflict=args.on_conflict,
+                batch_size=args.batch_size,
+                progress=log_progress,
+            )
+    finally:
+        await close_db()
+        await cache_service.disconnect()
+        hashing_pool.shutdown()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Import users from a CSV or NDJSON file.")
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--format", type=ImportFormat, choices=[f.value for f in ImportFormat], help="Defaults to the file extension")
+    parser.add_argument("--on-conflict", type=ConflictMode, choices=[m.value for m in ConflictMode], default=ConflictMode.skip)
+    parser.add_argument("--batch-size", type=int, default=settings.import_batch_size)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    report = asyncio.run(run(args))
+    for error in report.errors:
+        logger.error("line %s: %s", error["line"], error["error"])
+    return 1 if report.invalid else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
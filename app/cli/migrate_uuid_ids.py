@@ -0,0 +1,174 @@
+"""Convert users.id and templates.id from VARCHAR to native UUID online.
+
+    python -m app.cli.migrate_uuid_ids
+    python -m app.cli.migrate_uuid_ids --table users --pause 0.5
+
+ALTER COLUMN ... TYPE uuid would rewrite the table under an ACCESS
+EXCLUSIVE lock. Instead each table gets a shadow ``id_uuid`` column that a
+trigger keeps in sync for new writes, existing rows are backfilled through
+app.core.backfill (BACKFILL_BATCH_SIZE rows per checkpointed batch,
+throttled on replication lag), indexes are built CONCURRENTLY, and the
+columns are swapped in one short transaction. Every step is idempotent, so an
+interrupted run can simply be started again. Existing ids keep their value;
+only new rows get time-ordered (v7) ids.
+
+Run it before deploying code that declares the columns as UUID; the old
+code keeps writing text ids, which the trigger converts.
+"""
+import argparse
+import asyncio
+import logging
+import sys
+
+from sqlalchemy import Column, Index, MetaData, Table, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+import app.backfills  # noqa: F401  (registers the id_uuid backfills)
+from app.core.backfill import (
+    Throttle,
+    create_index_concurrently,
+    registry,
+    run_backfill,
+)
+from app.core.database import Base, close_db, engine
+from app.models import Template, User  # noqa: F401  (registers the tables)
+
+logger = logging.getLogger(__name__)
+
+TABLES = ("users", "templates")
+SHADOW = "id_uuid"
+
+
+def _id_indexes(table: Table) -> list[Index]:
+    # Secondary indexes that include id are dropped along with the old
+    # column, so copies on the shadow column are built beforehand.
+    return [
+        index
+        for index in table.indexes
+        if all(isinstance(expr, Column) for expr in index.expressions)
+        and any(column.name == "id" for column in index.columns)
+    ]
+
+
+def _shadow_indexes(table: Table) -> list[Index]:
+    # Described on a detached copy of the table with id renamed, so building
+    # them leaves the model metadata alone.
+    shadow = Table(
+        table.name,
+        MetaData(),
+        *(Column(SHADOW if column.name == "id" else column.name, column.type) for column in table.columns),
+    )
+    return [
+        Index(f"{table.name}_{SHADOW}_key", shadow.c[SHADOW], unique=True),
+        *(
+            Index(
+                f"{index.name}_uuid",
+                *(shadow.c[SHADOW if column.name == "id" else column.name] for column in index.columns),
+                postgresql_where=index.dialect_options["postgresql"]["where"],
+            )
+            for index in _id_indexes(table)
+        ),
+    ]
+
+
+async def _column_type(connection: AsyncConnection, table: str) -> str:
+    result = await connection.execute(
+        text(
+            "SELECT data_type FROM information_schema.columns "
+            "WHERE table_name = :table AND column_name = 'id'"
+        ),
+        {"table": table},
+    )
+    return result.scalar_one()
+
+
+async def migrate_table(
+    target: AsyncEngine,
+    connection: AsyncConnection,
+    table: Table,
+    throttle: Throttle,
+) -> None:
+    # ``connection`` is in autocommit mode; the swap uses a transaction of
+    # its own.
+    name = table.name
+    if await _column_type(connection, name) == "uuid":
+        logger.info("%s.id is already uuid", name)
+        return
+
+    # 1. Shadow column plus a trigger that fills it for concurrent writes.
+    await connection.execute(text(f"ALTER TABLE {name} ADD COLUMN IF NOT EXISTS {SHADOW} uuid"))
+    await connection.execute(text(
+        f"CREATE OR REPLACE FUNCTION {name}_sync_{SHADOW}() RETURNS trigger AS $$ "
+        f"BEGIN NEW.{SHADOW} := NEW.id::uuid; RETURN NEW; END $$ LANGUAGE plpgsql"
+    ))
+    await connection.execute(text(f"DROP TRIGGER IF EXISTS {name}_sync_{SHADOW} ON {name}"))
+    await connection.execute(text(
+        f"CREATE TRIGGER {name}_sync_{SHADOW} BEFORE INSERT OR UPDATE OF id ON {name} "
+        f"FOR EACH ROW EXECUTE FUNCTION {name}_sync_{SHADOW}()"
+    ))
+
+    # 2. Backfill in checkpointed batches; an interrupted run resumes.
+    await run_backfill(target, registry[f"{name}_{SHADOW}"], throttle)
+
+    # 3. Indexes and a validated NOT NULL check, without blocking writes.
+    for index in _shadow_indexes(table):
+        await create_index_concurrently(target, index)
+    await connection.execute(text(
+        f"ALTER TABLE {name} DROP CONSTRAINT IF EXISTS {name}_{SHADOW}_not_null"
+    ))
+    await connection.execute(text(
+        f"ALTER TABLE {name} ADD CONSTRAINT {name}_{SHADOW}_not_null "
+        f"CHECK ({SHADOW} IS NOT NULL) NOT VALID"
+    ))
+    await connection.execute(text(f"ALTER TABLE {name} VALIDATE CONSTRAINT {name}_{SHADOW}_not_null"))
+
+    # 4. Swap. SET NOT NULL skips the table scan thanks to the validated
+    # check, so the exclusive lock is held only for catalog updates.
+    swap = [
+        "SET LOCAL lock_timeout = '5s'",
+        f"ALTER TABLE {name} ALTER COLUMN {SHADOW} SET NOT NULL",
+        f"ALTER TABLE {name} DROP CONSTRAINT {name}_{SHADOW}_not_null",
+        f"ALTER TABLE {name} DROP CONSTRAINT {name}_pkey",
+        f"ALTER TABLE {name} ADD CONSTRAINT {name}_pkey PRIMARY KEY USING INDEX {name}_{SHADOW}_key",
+        f"DROP TRIGGER {name}_sync_{SHADOW} ON {name}",
+        f"DROP FUNCTION {name}_sync_{SHADOW}()",
+        f"ALTER TABLE {name} DROP COLUMN id",
+        f"ALTER TABLE {name} RENAME COLUMN {SHADOW} TO id",
+        *(f"ALTER INDEX {index.name}_uuid RENAME TO {index.name}" for index in _id_indexes(table)),
+    ]
+    async with target.begin() as transaction:
+        for statement in swap:
+            await transaction.execute(text(statement))
+    logger.info("%s.id is now uuid", name)
+
+
+async def run(args: argparse.Namespace) -> None:
+    try:
+        async with engine.connect() as connection:
+            if connection.dialect.name != "postgresql":
+                message = "Only PostgreSQL needs this migration; other databases store UUIDs as text"
+                raise SystemExit(message)
+            autocommit = await connection.execution_options(isolation_level="AUTOCOMMIT")
+            throttle = Throttle.from_settings()
+            if args.pause is not None:
+                throttle.pause = args.pause
+            for name in args.table:
+                await migrate_table(engine, autocommit, Base.metadata.tables[name], throttle)
+    finally:
+        await close_db()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Convert id columns to native UUID without downtime.")
+    parser.add_argument("--table", action="append", choices=TABLES, help="Defaults to all tables")
+    parser.add_argument("--pause", type=float, help="Seconds to sleep between batches")
+    args = parser.parse_args()
+    args.table = args.table or list(TABLES)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    asyncio.run(run(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
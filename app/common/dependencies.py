@@ -1,24 +1,76 @@
+from dataclasses import dataclass
 from typing import Annotated
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.common.pagination import CountMode
+from app.core.config import settings
 from app.core.database import get_db
-from app.core.security import get_current_user_id
+from app.core.security import (
+    credentials_exception,
+    decode_token_cached,
+    get_current_user_id,
+    get_token_id,
+    oauth2_scheme,
+)
 from app.repositories.user_repository import UserRepository
+from app.services.principal_cache import principal_cache
+from app.services.revocation_service import revocation_service
 
 
-async def get_current_user(
+async def get_authenticated_user_id(
+    token: Annotated[str, Depends(oauth2_scheme)],
     user_id: Annotated[str, Depends(get_current_user_id)],
+) -> str:
+    # The payload was decoded for get_current_user_id, so this is a cache hit.
+    payload = decode_token_cached(token)
+    if await revocation_service.is_revoked(get_token_id(token, payload), user_id, payload.get("iat")):
+        raise credentials_exception()
+    return user_id
+
+
+async def get_current_user(
+    request: Request,
+    user_id: Annotated[str, Depends(get_authenticated_user_id)],
     db: AsyncSession = Depends(get_db),
 ):
-    user_repo = UserRepository(db)
-    user = await user_repo.get_by_id(user_id)
-    
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
+    # Dependencies resolved in the same request share one lookup.
+    user = getattr(request.state, "current_user", None)
+    if user is not None and user.id == user_id:
+        return user
+
+    user = await principal_cache.get(user_id)
+    if user is None:
+        user_repo = UserRepository(db)
+        user = await user_repo.get_by_id(user_id)
     
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+
+        await principal_cache.set(user)
+
+    request.state.current_user = user
     return user
 
+
+@dataclass
+class ListParams:
+    """Query parameters shared by the list endpoints; use as ``Depends()``."""
+
+    cursor: str | None = None
+    limit: Annotated[int, Query(ge=1, le=settings.pagination_max_limit)] = settings.pagination_default_limit
+    skip: Annotated[int, Query(ge=0, deprecated=True)] = 0
+    count: CountMode = CountMode.cached
+    fields: Annotated[
+        str | None, Query(description="Comma-separated fields to return, e.g. id,email")
+    ] = None
+    filter_specs: Annotated[
+        list[str] | None,
+        Query(alias="filter", description="field:op:value, repeatable, e.g. created_at:gte:2024-01-01"),
+    ] = None
+    sort: Annotated[
+        str | None, Query(description="Field to sort by, prefixed with - for descending")
+    ] = None
@@ -13,6 +13,16 @@ class AppException(HTTPException):
         super().__init__(status_code=status_code, detail=message)
 
 
+class DuplicateError(AppException):
+    def __init__(self, message: str, errors: Any = None):
+        super().__init__(status.HTTP_400_BAD_REQUEST, message, errors)
+
+
+class InvalidQueryError(AppException):
+    def __init__(self, message: str, errors: Any = None):
+        super().__init__(status.HTTP_400_BAD_REQUEST, message, errors)
+
+
 async def http_exception_handler(request, exc: StarletteHTTPException):
     return JSONResponse(
         status_code=exc.status_code,
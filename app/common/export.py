@@ -0,0 +1,71 @@
+import csv
+import io
+import json
+from collections.abc import AsyncIterator, Sequence
+from datetime import datetime
+from enum import StrEnum
+from typing import Any
+
+from fastapi.responses import StreamingResponse
+
+
+class ExportFormat(StrEnum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+MEDIA_TYPES = {
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.csv: "text/csv; charset=utf-8",
+}
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    message = f"Cannot serialize {type(value).__name__}"
+    raise TypeError(message)
+
+
+async def _ndjson_chunks(
+    batches: AsyncIterator[Sequence[Any]],
+    columns: Sequence[str],
+) -> AsyncIterator[str]:
+    async for rows in batches:
+        yield "".join(
+            json.dumps(dict(zip(columns, row, strict=True)), default=_json_default) + "\n" for row in rows
+        )
+
+
+async def _csv_chunks(
+    batches: AsyncIterator[Sequence[Any]],
+    columns: Sequence[str],
+) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    # The header goes out before the first query round trip completes.
+    yield buffer.getvalue()
+    async for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(
+            [value.isoformat() if isinstance(value, datetime) else value for value in row]
+            for row in rows
+        )
+        yield buffer.getvalue()
+
+
+def export_response(
+    batches: AsyncIterator[Sequence[Any]],
+    columns: Sequence[str],
+    fmt: ExportFormat,
+    filename: str,
+) -> StreamingResponse:
+    """Streams row batches as NDJSON or CSV, one chunk per batch."""
+    chunks = _csv_chunks(batches, columns) if fmt == ExportFormat.csv else _ndjson_chunks(batches, columns)
+    return StreamingResponse(
+        chunks,
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt.value}"'},
+    )
@@ -0,0 +1,202 @@
+import operator
+from collections.abc import Mapping, Sequence
+from datetime import datetime
+from enum import StrEnum
+from functools import cache
+from typing import Any, NamedTuple
+
+from sqlalchemy import Boolean, Column, DateTime, Integer, Table, func
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import (
+    BinaryExpression,
+    BindParameter,
+    False_,
+    Label,
+    True_,
+)
+
+from app.common.exceptions import InvalidQueryError
+
+
+class FilterOp(StrEnum):
+    eq = "eq"
+    in_ = "in"
+    lt = "lt"
+    lte = "lte"
+    gt = "gt"
+    gte = "gte"
+    startswith = "startswith"
+    contains = "contains"
+
+
+# Matched case-insensitively through lower(column) indexes.
+TEXT_OPS = (FilterOp.startswith, FilterOp.contains)
+COMPARISONS = {
+    FilterOp.lt: operator.lt,
+    FilterOp.lte: operator.le,
+    FilterOp.gt: operator.gt,
+    FilterOp.gte: operator.ge,
+}
+
+
+class Filter(NamedTuple):
+    field: str
+    op: FilterOp
+    value: str
+
+
+class Sort(NamedTuple):
+    field: str
+    descending: bool = False
+
+
+def parse_filters(filters: Sequence[str] | None) -> list[Filter]:
+    """Parses ``field:op:value`` strings, e.g. ``created_at:gte:2024-01-01``."""
+    parsed = []
+    for raw in filters or []:
+        field, _, rest = raw.partition(":")
+        op, separator, value = rest.partition(":")
+        if not separator or op not in FilterOp._value2member_map_:
+            message = (
+                f"Invalid filter '{raw}'. Expected field:op:value with op one of: "
+                f"{', '.join(op.value for op in FilterOp)}"
+            )
+            raise InvalidQueryError(message)
+        parsed.append(Filter(field, FilterOp(op), value))
+    return parsed
+
+
+def parse_sort(sort: str | None) -> Sort | None:
+    if not sort:
+        return None
+    return Sort(sort.lstrip("-"), sort.startswith("-"))
+
+
+def like_pattern(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _is_lower_of(expression: Any, column: Column) -> bool:
+    if isinstance(expression, Label):
+        expression = expression.element
+    if getattr(expression, "name", None) != "lower":
+        return False
+    arguments = list(expression.clauses)
+    return len(arguments) == 1 and arguments[0].compare(column)
+
+
+def _leads_index(table: Table, column: Column) -> bool:
+    leading = [index.expressions[0] for index in table.indexes]
+    leading += [next(iter(constraint.columns)) for constraint in table.constraints if len(constraint.columns)]
+    return any(expression.compare(column) for expression in leading)
+
+
+_UNSUPPORTED = object()
+
+
+def _predicate_value(where: Any, column: Column) -> Any:
+    # The value selected by a ``column IS true`` or ``column = value``
+    # predicate; _UNSUPPORTED for anything else.
+    if not isinstance(where, BinaryExpression) or not where.left.compare(column):
+        return _UNSUPPORTED
+    if where.operator not in (operators.is_, operators.eq):
+        return _UNSUPPORTED
+    if isinstance(where.right, True_):
+        return True
+    if isinstance(where.right, False_):
+        return False
+    if isinstance(where.right, BindParameter):
+        return where.right.value
+    return _UNSUPPORTED
+
+
+@cache
+def indexed_values(table: Table, field: str) -> tuple[Any, ...] | None:
+    """Values an index serves equality on for ``field``; None means any value.
+
+    A column that only appears in partial index predicates, such as
+    ``WHERE published IS true``, is indexed for the values they select only.
+    """
+    column = table.c[field]
+    if _leads_index(table, column):
+        return None
+    values = []
+    for index in table.indexes:
+        where = index.dialect_options["postgresql"]["where"]
+        value = _UNSUPPORTED if where is None else _predicate_value(where, column)
+        if value is not _UNSUPPORTED and value not in values:
+            values.append(value)
+    return tuple(values)
+
+
+@cache
+def has_supporting_index(table: Table, field: str, op: FilterOp | None) -> bool:
+    """Whether an index can serve ``op`` on ``field``; ``op=None`` means a sort.
+
+    Comparisons and sorts need the column to lead an index, the primary key
+    or a unique constraint. Equality may also use a partial index whose
+    predicate selects a value of the column, for that value only (see
+    indexed_values). Text matches need a lower(column) index, a GIN
+    (trigram) one for ``contains``.
+    """
+    column = table.c[field]
+    if op in TEXT_OPS:
+        return any(
+            _is_lower_of(index.expressions[0], column)
+            and (op != FilterOp.contains or index.dialect_options["postgresql"]["using"] == "gin")
+            for index in table.indexes
+        )
+    if _leads_index(table, column):
+        return True
+    return op == FilterOp.eq and bool(indexed_values(table, field))
+
+
+def check_query_spec(
+    table: Table,
+    filter_fields: Mapping[str, Sequence[FilterOp]],
+    sort_fields: Sequence[str],
+) -> None:
+    # Run when a repository is created, so a whitelist entry without an
+    # index fails in development instead of scanning in production.
+    missing = [
+        f"{field}:{op.value}"
+        for field, ops in filter_fields.items()
+        for op in ops
+        if not has_supporting_index(table, field, op)
+    ]
+    missing += [f"sort {field}" for field in sort_fields if not has_supporting_index(table, field, None)]
+    if missing:
+        message = f"No index on {table.name} supports: {', '.join(missing)}"
+        raise ValueError(message)
+
+
+def coerce_value(column: Column, value: str) -> Any:
+    invalid = f"Invalid value for {column.name}: '{value}'"
+    if isinstance(column.type, Boolean):
+        if value.lower() not in ("true", "false"):
+            raise InvalidQueryError(invalid)
+        return value.lower() == "true"
+    try:
+        if isinstance(column.type, DateTime):
+            return datetime.fromisoformat(value)
+        if isinstance(column.type, Integer):
+            return int(value)
+    except ValueError:
+        raise InvalidQueryError(invalid) from None
+    return value
+
+
+def filter_clause(column: Column, op: FilterOp, value: str) -> Any:
+    if op in TEXT_OPS:
+        pattern = like_pattern(value.lower())
+        pattern = f"{pattern}%" if op == FilterOp.startswith else f"%{pattern}%"
+        return func.lower(column).like(pattern, escape="\\")
+    if op == FilterOp.in_:
+        return column.in_([coerce_value(column, v) for v in value.split(",")])
+
+    value = coerce_value(column, value)
+    if op == FilterOp.eq:
+        # IS true/false renders a literal, which lets the planner match a
+        # partial index predicate even with prepared statements.
+        return column.is_(value) if isinstance(value, bool) else column == value
+    return COMPARISONS[op](column, value)
@@ -0,0 +1,59 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from enum import StrEnum
+from typing import Any, NamedTuple
+
+from fastapi import HTTPException, status
+
+NEXT = "next"
+PREV = "prev"
+
+
+class CountMode(StrEnum):
+    exact = "exact"
+    estimated = "estimated"
+    cached = "cached"
+    none = "none"
+
+
+class Page(NamedTuple):
+    items: list[Any]
+    next_cursor: str | None
+    prev_cursor: str | None
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "dt" in value:
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+
+def encode_cursor(values: list[Any], direction: str = NEXT) -> str:
+    payload = {"v": [_encode_value(v) for v in values], "d": direction}
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str, size: int) -> tuple[list[Any], str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        values = [_decode_value(v) for v in payload["v"]]
+        direction = payload["d"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        values, direction = [], ""
+
+    if len(values) != size or direction not in (NEXT, PREV):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    return values, direction
@@ -0,0 +1,37 @@
+from collections.abc import Sequence
+from typing import Any
+
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from app.common.schemas import PaginationResponse
+
+
+def parse_fields(fields: str | None, schema: type[BaseModel]) -> list[str]:
+    allowed = list(schema.model_fields)
+    if not fields:
+        return allowed
+
+    requested = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [f for f in requested if f not in allowed]
+    if unknown or not requested:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(allowed)}",
+        )
+    return requested
+
+
+def project(row: Any, fields: Sequence[str]) -> dict[str, Any]:
+    return {field: getattr(row, field) for field in fields}
+
+
+def sparse_response(response: PaginationResponse, items: list[dict[str, Any]]) -> JSONResponse:
+    # Sparse items would fail the response_model's required fields, so the
+    # page is rendered directly instead of going through validation.
+    content = response.model_dump(mode="json", by_alias=True, exclude={"items"})
+    key = type(response).model_fields["items"].alias or "items"
+    content[key] = jsonable_encoder(items)
+    return JSONResponse(content=content)
@@ -1,5 +1,5 @@
 from typing import Any, Generic, TypeVar
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 T = TypeVar('T')
 
@@ -19,20 +19,52 @@ class ErrorResponse(BaseModel):
 
 
 class PaginationResponse(BaseModel, Generic[T]):
+    # Subclasses may rename "items" with a field alias, hence populate_by_name.
+    model_config = ConfigDict(populate_by_name=True)
+
     items: list[T]
-    total: int
-    page: int
+    total: int | None = None
+    total_is_estimate: bool = False
+    page: int | None = None
     limit: int
-    total_pages: int
+    total_pages: int | None = None
+    next_cursor: str | None = None
+    prev_cursor: str | None = None
 
     @classmethod
-    def create(cls, items: list[T], total: int, page: int, limit: int):
-        total_pages = (total + limit - 1) // limit if limit > 0 else 0
+    def create(cls, items: list[T], total: int | None, page: int | None, limit: int, **extra: Any):
+        # The cursors and total_is_estimate pass through as fields.
+        total_pages = None
+        if total is not None:
+            total_pages = (total + limit - 1) // limit if limit > 0 else 0
         return cls(
             items=items,
             total=total,
             page=page,
             limit=limit,
             total_pages=total_pages,
+            **extra,
         )
 
+
+class BulkItemResult(BaseModel):
+    index: int
+    id: str | None = None
+    status: str
+    detail: str | None = None
+
+    @classmethod
+    def from_outcome(cls, index: int, item_id: str | None, outcome: Any, status: str):
+        # outcome is what the bulk repository call returned for the item: the
+        # row or True, None/False for an unknown id, or the error it raised.
+        if isinstance(outcome, Exception):
+            return cls(index=index, id=item_id, status="conflict", detail=getattr(outcome, "detail", str(outcome)))
+        if outcome is None or outcome is False:
+            return cls(index=index, id=item_id, status="not_found")
+        return cls(index=index, id=item_id, status=status)
+
+
+class BulkResponse(BaseModel):
+    created: list[BulkItemResult] = []
+    updated: list[BulkItemResult] = []
+    deleted: list[BulkItemResult] = []
@@ -0,0 +1,266 @@
+"""Data migrations in bounded, resumable batches.
+
+A backfill walks a table in key order, ``batch_size`` rows per transaction,
+and commits its position to ``backfill_checkpoints`` in the same
+transaction as each batch, so a killed run resumes where it stopped.
+Between batches it sleeps while replicas lag or the primary is busy.
+
+Migrations schedule backfills and index builds instead of running them in
+the migration transaction; ``alembic/env.py`` runs them once the schema
+change has committed::
+
+    def upgrade() -> None:
+        op.add_column("users", sa.Column("email_lower", sa.String(255)))
+        schedule(backfills.users_email_lower)
+        schedule_index(sa.Index("ix_users_email_lower", users.c.email_lower))
+
+``python -m app.cli.backfill`` runs, inspects and resets them by name.
+"""
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from datetime import UTC, date, datetime
+from datetime import time as time_
+from functools import partial
+from typing import Any
+
+from sqlalchemy import Index, and_, delete, func, insert, select, text, true, update
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy.sql import ColumnElement, Executable
+
+from app.core.config import settings
+from app.models.backfill_checkpoint import BackfillCheckpoint
+
+logger = logging.getLogger(__name__)
+
+checkpoints = BackfillCheckpoint.__table__
+
+# Seconds the slowest standby is behind, as seen from the primary.
+REPLICATION_LAG = text(
+    "SELECT COALESCE(EXTRACT(EPOCH FROM MAX(replay_lag)), 0) FROM pg_stat_replication"
+)
+ACTIVE_QUERIES = text(
+    "SELECT count(*) FROM pg_stat_activity WHERE state = 'active' AND pid <> pg_backend_pid()"
+)
+INVALID_INDEX = text(
+    "SELECT 1 FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid "
+    "WHERE c.relname = :name AND NOT i.indisvalid"
+)
+
+
+@dataclass(frozen=True)
+class Backfill:
+    """A data migration applied to the rows of ``key``'s table in key order.
+
+    ``statement`` receives a clause selecting one batch of rows and returns
+    the statement that migrates them, e.g.
+    ``lambda batch: users.update().where(batch, users.c.x.is_(None)).values(...)``.
+    It should skip rows that are already migrated so a batch can be replayed.
+    ``key`` must be unique; its values are checkpointed as text and restored
+    with the column type's Python type (str, int, UUID, date/time, ...).
+    """
+
+    name: str
+    key: ColumnElement
+    statement: Callable[[ColumnElement], Executable]
+    batch_size: int | None = None
+
+
+@dataclass
+class Throttle:
+    """Paces a backfill; a zero limit disables that check."""
+
+    pause: float = 0.0
+    max_replication_lag: float = 0.0
+    max_active_queries: int = 0
+    backoff: float = 5.0
+
+    @classmethod
+    def from_settings(cls) -> "Throttle":
+        return cls(
+            pause=settings.backfill_pause_seconds,
+            max_replication_lag=settings.backfill_max_replication_lag_seconds,
+            max_active_queries=settings.backfill_max_active_queries,
+            backoff=settings.backfill_backoff_seconds,
+        )
+
+    async def overloaded(self, target: AsyncEngine) -> str | None:
+        # Both views are PostgreSQL's; other databases are never throttled.
+        if target.dialect.name != "postgresql" or not (self.max_replication_lag or self.max_active_queries):
+            return None
+        async with target.connect() as connection:
+            if self.max_replication_lag:
+                lag = float((await connection.execute(REPLICATION_LAG)).scalar_one())
+                if lag > self.max_replication_lag:
+                    return f"replication lag {lag:.1f}s"
+            if self.max_active_queries:
+                active = (await connection.execute(ACTIVE_QUERIES)).scalar_one()
+                if active > self.max_active_queries:
+                    return f"{active} active queries"
+        return None
+
+    async def wait(self, target: AsyncEngine) -> None:
+        if self.pause:
+            await asyncio.sleep(self.pause)
+        while (reason := await self.overloaded(target)) is not None:
+            logger.info("Backfill paused for %ss: %s", self.backoff, reason)
+            await asyncio.sleep(self.backoff)
+
+
+def _dump_key(value: Any) -> str:
+    return value.isoformat() if isinstance(value, (date, time_)) else str(value)
+
+
+def _load_key(key: ColumnElement, value: str) -> Any:
+    # Checkpoints store keys as text; compare them in the key's own type so
+    # an integer, UUID or timestamp key is not compared against a string.
+    try:
+        python_type = key.type.python_type
+    except NotImplementedError:
+        return value  # an untyped column(), compared as text
+    if python_type in (str, object):
+        return value
+    if issubclass(python_type, (date, time_)):
+        return python_type.fromisoformat(value)
+    return python_type(value)
+
+
+registry: dict[str, Backfill] = {}
+
+
+def register(backfill: Backfill) -> Backfill:
+    if backfill.name in registry:
+        message = f"Backfill {backfill.name} is already registered"
+        raise ValueError(message)
+    registry[backfill.name] = backfill
+    return backfill
+
+
+async def _load_checkpoint(target: AsyncEngine, name: str, restart: bool) -> dict[str, Any]:
+    async with target.begin() as connection:
+        # Present after migration 0002; created here for runs against
+        # databases that predate it (e.g. app.cli.migrate_uuid_ids).
+        await connection.run_sync(checkpoints.create, checkfirst=True)
+        if restart:
+            await connection.execute(delete(checkpoints).where(checkpoints.c.name == name))
+        row = (await connection.execute(
+            select(checkpoints).where(checkpoints.c.name == name)
+        )).mappings().first()
+        if row is None:
+            await connection.execute(insert(checkpoints).values(name=name, rows=0, batches=0))
+            return {"name": name, "last_key": None, "rows": 0, "batches": 0, "finished_at": None}
+    return dict(row)
+
+
+async def run_backfill(
+    target: AsyncEngine,
+    backfill: Backfill,
+    throttle: Throttle | None = None,
+    restart: bool = False,
+) -> dict[str, Any]:
+    """Runs ``backfill`` to completion from its last checkpoint.
+
+    Each batch is the next ``batch_size`` keys after the checkpoint, bounded
+    by the last of them, so every transaction is a short range scan of the
+    key index whatever the size of the table. Returns the checkpoint.
+    """
+    throttle = throttle or Throttle.from_settings()
+    batch_size = backfill.batch_size or settings.backfill_batch_size
+    checkpoint = await _load_checkpoint(target, backfill.name, restart)
+    if checkpoint["finished_at"] is not None:
+        logger.info("Backfill %s already finished", backfill.name)
+        return checkpoint
+
+    key = backfill.key
+    started, done = time.monotonic(), 0
+    while True:
+        async with target.begin() as connection:
+            last_key = checkpoint["last_key"]
+            after = key > _load_key(key, last_key) if last_key is not None else true()
+            upper = (await connection.execute(
+                select(key).where(after).order_by(key).offset(batch_size - 1).limit(1)
+            )).scalar_one_or_none()
+            # Fewer than batch_size keys left: this is the last batch.
+            batch = and_(after, key <= upper) if upper is not None else after
+            rows = max((await connection.execute(backfill.statement(batch))).rowcount, 0)
+
+            checkpoint.update(
+                last_key=_dump_key(upper) if upper is not None else last_key,
+                rows=checkpoint["rows"] + rows,
+                batches=checkpoint["batches"] + 1,
+            )
+            await connection.execute(
+                update(checkpoints)
+                .where(checkpoints.c.name == backfill.name)
+                .values(
+                    last_key=checkpoint["last_key"],
+                    rows=checkpoint["rows"],
+                    batches=checkpoint["batches"],
+                    updated_at=func.now(),
+                    finished_at=func.now() if upper is None else None,
+                )
+            )
+
+        done += rows
+        logger.info(
+            "Backfill %s: batch %s, %s rows (%.0f rows/s)",
+            backfill.name,
+            checkpoint["batches"],
+            checkpoint["rows"],
+            done / max(time.monotonic() - started, 1e-9),
+        )
+        if upper is None:
+            checkpoint["finished_at"] = datetime.now(UTC)
+            return checkpoint
+        await throttle.wait(target)
+
+
+async def backfill_status(target: AsyncEngine) -> list[dict[str, Any]]:
+    async with target.connect() as connection:
+        await connection.run_sync(checkpoints.create, checkfirst=True)
+        result = await connection.execute(select(checkpoints).order_by(checkpoints.c.started_at))
+        await connection.commit()
+        return [dict(row) for row in result.mappings()]
+
+
+async def create_index_concurrently(target: AsyncEngine, index: Index) -> None:
+    """Builds ``index`` without blocking writes (CONCURRENTLY on PostgreSQL).
+
+    An interrupted concurrent build leaves an INVALID index behind, which
+    IF NOT EXISTS would keep; it is dropped first so reruns finish the job.
+    """
+    ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=target.dialect))
+    async with target.connect() as connection:
+        # CONCURRENTLY cannot run inside a transaction block.
+        autocommit = await connection.execution_options(isolation_level="AUTOCOMMIT")
+        if target.dialect.name == "postgresql":
+            if (await autocommit.execute(INVALID_INDEX, {"name": index.name})).first():
+                logger.warning("Dropping invalid index %s left by an interrupted build", index.name)
+                await autocommit.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index.name}"))
+            ddl = ddl.replace("INDEX", "INDEX CONCURRENTLY", 1)
+        await autocommit.execute(text(ddl))
+    logger.info("Index %s is ready", index.name)
+
+
+# Work queued by the migration being applied, run after it commits.
+_scheduled: list[Callable[[AsyncEngine], Awaitable[Any]]] = []
+
+
+def schedule(backfill: Backfill) -> None:
+    _scheduled.append(partial(run_backfill, backfill=backfill))
+
+
+def schedule_index(index: Index) -> None:
+    _scheduled.append(partial(create_index_concurrently, index=index))
+
+
+def scheduled() -> int:
+    return len(_scheduled)
+
+
+async def run_scheduled(target: AsyncEngine) -> None:
+    while _scheduled:
+        await _scheduled.pop(0)(target)
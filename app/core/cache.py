@@ -0,0 +1,377 @@
+import asyncio
+import contextlib
+import json
+import logging
+import sys
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable
+from typing import Any
+
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+MessageHandler = Callable[[str], None]
+ResyncHandler = Callable[[], Awaitable[None]]
+
+INVALIDATION_CHANNEL = "cache_invalidate"
+
+
+def _encode(value: Any) -> Any:
+    return json.dumps(value) if isinstance(value, (dict, list)) else value
+
+
+class _LocalEntry:
+    __slots__ = ("expires_at", "size", "value")
+
+    def __init__(self, value: str, expires_at: float, size: int):
+        self.value = value
+        self.expires_at = expires_at
+        self.size = size
+
+
+# Approximate per-entry cost beyond the key and value strings: the entry
+# itself plus its OrderedDict node and hash table slot.
+ENTRY_OVERHEAD = sys.getsizeof(_LocalEntry("", 0.0, 0)) + 100
+
+
+class LocalCache:
+    """Per-worker LRU of Redis values with a TTL per entry.
+
+    Bounded by entry count and by estimated memory (key, value and entry
+    sizes from sys.getsizeof), evicting least recently used entries first.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        # Bumped by every invalidation; see CacheService.get().
+        self.generation = 0
+        self._entries: OrderedDict[str, _LocalEntry] = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    def get(self, key: str) -> str | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self._misses += 1
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self._expirations += 1
+            self._misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return entry.value
+
+    def put(self, key: str, value: str, ttl: float) -> None:
+        self._remove(key)
+        size = sys.getsizeof(key) + sys.getsizeof(value) + ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        self._entries[key] = _LocalEntry(value, time.monotonic() + ttl, size)
+        self.bytes += size
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= evicted.size
+            self._evictions += 1
+
+    def discard(self, key: str) -> None:
+        self._remove(key)
+
+    def invalidate(self, keys: Iterable[str]) -> None:
+        self.generation += 1
+        for key in keys:
+            if self._remove(key):
+                self._invalidations += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.bytes = 0
+        self.generation += 1
+
+    def _remove(self, key: str) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self.bytes -= entry.size
+        return True
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self._hits + self._misses
+        return {
+            "entries": len(self._entries),
+            "memory_bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_ratio": self._hits / lookups if lookups else 0.0,
+            "evictions": self._evictions,
+            "expirations": self._expirations,
+            "invalidations": self._invalidations,
+        }
+
+
+class CacheService:
+    """Redis client, optionally fronted by a per-worker LocalCache.
+
+    ``local_policies`` maps key prefixes to how many seconds their values
+    may be served from worker memory; the longest matching prefix wins and
+    other keys always go to Redis. Writes and deletes of locally cached keys
+    publish the keys on INVALIDATION_CHANNEL, and every other worker evicts
+    its copy. Until the listener runs (or while it reconnects) the local
+    TTL is what bounds staleness.
+    """
+
+    def __init__(
+        self,
+        local_policies: dict[str, float] | None = None,
+        local_max_entries: int = 10000,
+        local_max_bytes: int = 32 * 1024 * 1024,
+    ):
+        self._redis: redis.Redis | None = None
+        self._handlers: dict[str, list[MessageHandler]] = {}
+        self._resync_handlers: list[ResyncHandler] = []
+        self._listener: asyncio.Task | None = None
+        self._redis_hits = 0
+        self._redis_misses = 0
+        self.local_policies = dict(
+            sorted((local_policies or {}).items(), key=lambda item: len(item[0]), reverse=True)
+        )
+        self.local: LocalCache | None = None
+        if any(self.local_policies.values()):
+            self.local = LocalCache(local_max_entries, local_max_bytes)
+            # Identifies this worker's own messages, which it skips.
+            self._origin = uuid.uuid4().hex
+            self.subscribe(INVALIDATION_CHANNEL, self._on_invalidate, resync=self._resync_local)
+
+    async def connect(self):
+        if not self._redis:
+            self._redis = await redis.from_url(
+                f"redis://{settings.redis_host}:{settings.redis_port}",
+                password=settings.redis_password if settings.redis_password else None,
+                db=settings.redis_db,
+                decode_responses=True,
+            )
+
+    async def disconnect(self):
+        await self.stop_listener()
+        if self._redis:
+            await self._redis.close()
+            self._redis = None
+
+    async def get(self, key: str) -> str | None:
+        local_ttl = self._local_ttl(key)
+        if local_ttl:
+            value = self.local.get(key)
+            if value is not None:
+                return value
+            generation = self.local.generation
+
+        await self.connect()
+        value = await self._redis.get(key)
+        if value is None:
+            self._redis_misses += 1
+            return None
+        self._redis_hits += 1
+        # Not kept if an invalidation arrived while Redis answered: the value
+        # read may be the one it invalidated.
+        if local_ttl and generation == self.local.generation:
+            self.local.put(key, value, local_ttl)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: int | None = None, nx: bool = False) -> bool:
+        # With nx=True the key is only written if absent; returns whether it was.
+        await self.connect()
+        value = _encode(value)
+        local_ttl = self._local_ttl(key)
+        if not local_ttl:
+            return bool(await self._redis.set(key, value, ex=ttl or None, nx=nx))
+
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.set(key, value, ex=ttl or None, nx=nx)
+            pipe.publish(INVALIDATION_CHANNEL, self._invalidation([key]))
+            written, _ = await pipe.execute()
+        if written:
+            self.local.put(key, str(value), min(local_ttl, ttl) if ttl else local_ttl)
+        else:
+            self.local.discard(key)
+        return bool(written)
+
+    async def set_many(
+        self,
+        items: dict[str, Any],
+        ttl: int | None = None,
+        nx: bool = False,
+        notify: tuple[str, str] | None = None,
+    ):
+        # One round trip for all keys, invalidation included; not atomic.
+        # With nx=True each key is only written if absent. ``notify`` is a
+        # (channel, message) published in the same round trip.
+        await self.connect()
+        local_keys = [key for key in items if self._local_ttl(key)]
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for key, value in items.items():
+                pipe.set(key, _encode(value), ex=ttl or None, nx=nx)
+            if local_keys:
+                pipe.publish(INVALIDATION_CHANNEL, self._invalidation(local_keys))
+            if notify is not None:
+                pipe.publish(*notify)
+            results = await pipe.execute()
+        written = dict(zip(items, results[:len(items)], strict=True))
+        for key in local_keys:
+            if not written[key]:
+                self.local.discard(key)
+                continue
+            local_ttl = self._local_ttl(key)
+            self.local.put(key, str(_encode(items[key])), min(local_ttl, ttl) if ttl else local_ttl)
+
+    async def delete(self, key: str):
+        await self.connect()
+        if not self._local_ttl(key):
+            await self._redis.delete(key)
+            return
+        self.local.discard(key)
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.delete(key)
+            pipe.publish(INVALIDATION_CHANNEL, self._invalidation([key]))
+            await pipe.execute()
+
+    async def delete_many(self, keys: list[str], notify: tuple[str, str] | None = None):
+        # One round trip for all keys, invalidation included; not atomic.
+        # ``notify`` is a (channel, message) published in the same round trip.
+        await self.connect()
+        local_keys = [key for key in keys if self._local_ttl(key)]
+        for key in local_keys:
+            self.local.discard(key)
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.delete(*keys)
+            if local_keys:
+                pipe.publish(INVALIDATION_CHANNEL, self._invalidation(local_keys))
+            if notify is not None:
+                pipe.publish(*notify)
+            await pipe.execute()
+
+    def _local_ttl(self, key: str) -> float:
+        if self.local is None:
+            return 0.0
+        for prefix, ttl in self.local_policies.items():
+            if key.startswith(prefix):
+                return ttl
+        return 0.0
+
+    def _invalidation(self, keys: list[str]) -> str:
+        return "\n".join([self._origin, *keys])
+
+    def _on_invalidate(self, message: str) -> None:
+        origin, *keys = message.split("\n")
+        if origin != self._origin:
+            self.local.invalidate(keys)
+
+    async def _resync_local(self) -> None:
+        # Invalidations may have been missed while unsubscribed.
+        self.local.clear()
+
+    async def stats(self) -> dict[str, Any]:
+        lookups = self._redis_hits + self._redis_misses
+        redis_stats: dict[str, Any] = {
+            "hits": self._redis_hits,
+            "misses": self._redis_misses,
+            "hit_ratio": self._redis_hits / lookups if lookups else 0.0,
+            "memory_bytes": None,
+        }
+        try:
+            await self.connect()
+            redis_stats["memory_bytes"] = (await self._redis.info("memory")).get("used_memory")
+        except RedisError as e:
+            logger.warning("Redis memory stats unavailable: %s", e)
+        return {
+            "local": self.local.stats() if self.local else None,
+            "local_policies": self.local_policies,
+            "redis": redis_stats,
+        }
+
+    async def exists(self, key: str) -> bool:
+        await self.connect()
+        return await self._redis.exists(key) > 0
+
+    async def scan_keys(self, pattern: str) -> AsyncIterator[str]:
+        await self.connect()
+        async for key in self._redis.scan_iter(match=pattern, count=1000):
+            yield key
+
+    async def publish(self, channel: str, message: str):
+        await self.connect()
+        await self._redis.publish(channel, message)
+
+    def subscribe(
+        self,
+        channel: str,
+        handler: MessageHandler,
+        resync: ResyncHandler | None = None,
+    ):
+        # Register before start_listener(); resync runs after every
+        # (re)subscription so handlers can reload what they missed.
+        self._handlers.setdefault(channel, []).append(handler)
+        if resync:
+            self._resync_handlers.append(resync)
+
+    def dispatch(self, channel: str, message: str):
+        # Runs the handlers subscribed to channel, as the listener does.
+        for handler in self._handlers.get(channel, []):
+            handler(message)
+
+    async def start_listener(self):
+        if self._handlers and not self._listener:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop_listener(self):
+        if self._listener:
+            self._listener.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._listener
+            self._listener = None
+
+    async def _listen(self):
+        while True:
+            pubsub = None
+            try:
+                await self.connect()
+                pubsub = self._redis.pubsub()
+                await pubsub.subscribe(*self._handlers)
+                for resync in self._resync_handlers:
+                    await resync()
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self.dispatch(message["channel"], message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Cache pub/sub listener failed, reconnecting: %s", e)
+                await asyncio.sleep(1)
+            finally:
+                if pubsub is not None:
+                    await pubsub.aclose()
+
+    async def set_blacklist_token(self, token_id: str, ttl: int = 3600):
+        await self.set(f"blacklist:{token_id}", "1", ttl)
+
+    async def is_token_blacklisted(self, token_id: str) -> bool:
+        return await self.exists(f"blacklist:{token_id}")
+
+
+cache_service = CacheService(
+    local_policies=settings.cache_local_policy_map,
+    local_max_entries=settings.cache_local_max_entries,
+    local_max_bytes=settings.cache_local_max_bytes,
+)
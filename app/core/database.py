@@ -1,25 +1,411 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from sqlalchemy.orm import declarative_base
-from typing import AsyncGenerator
+import asyncio
+import hashlib
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import AsyncGenerator
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import partial
+from typing import Any
 
+from redis.exceptions import RedisError
+from sqlalchemy import DDL, event, exc, make_url, text
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import Session, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core.cache import cache_service
 from app.core.config import settings
+from app.core.ids import normalize_id
+from app.core.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+ROUND_ROBIN = "round_robin"
+LEAST_CONNECTIONS = "least_connections"
+
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that records checkout waits and connect latency."""
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.checkout_wait = Histogram()
+        self.connect_latency = Histogram()
+        self.hold_time = Histogram()
+        self.timeouts = 0
+
+    def _do_get(self) -> Any:
+        started = time.monotonic()
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        self.checkout_wait.observe(time.monotonic() - started)
+        record.info["checked_out_at"] = time.monotonic()
+        return record
+
+    def _do_return_conn(self, record: Any) -> None:
+        checked_out_at = record.info.pop("checked_out_at", None)
+        if checked_out_at is not None:
+            self.hold_time.observe(time.monotonic() - checked_out_at)
+        super()._do_return_conn(record)
+
+    def _create_connection(self) -> Any:
+        started = time.monotonic()
+        record = super()._create_connection()
+        self.connect_latency.observe(time.monotonic() - started)
+        return record
+
+    def recreate(self) -> "InstrumentedPool":
+        # engine.dispose() swaps in a fresh pool; keep the history.
+        pool = super().recreate()
+        pool.checkout_wait = self.checkout_wait
+        pool.connect_latency = self.connect_latency
+        pool.hold_time = self.hold_time
+        pool.timeouts = self.timeouts
+        return pool
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            # overflow() counts up from -pool_size until the pool is full.
+            "overflow": max(self.overflow(), 0),
+            "timeouts": self.timeouts,
+            "checkout_wait_seconds": self.checkout_wait.snapshot(),
+            "connect_seconds": self.connect_latency.snapshot(),
+            "hold_seconds": self.hold_time.snapshot(),
+        }
+
+
+def _engine_options(url: str) -> dict[str, Any]:
+    options: dict[str, Any] = {"echo": settings.database_echo, "future": True}
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        return options
+
+    options.update(
+        poolclass=InstrumentedPool,
+        pool_size=settings.database_pool_size,
+        max_overflow=settings.database_max_overflow,
+        pool_timeout=settings.database_pool_timeout,
+        pool_recycle=settings.database_pool_recycle,
+        pool_pre_ping=settings.database_pool_pre_ping,
+    )
+    if parsed.get_driver_name() == "asyncpg":
+        options["connect_args"] = {
+            "timeout": settings.database_connect_timeout,
+            "prepared_statement_cache_size": settings.database_statement_cache_size,
+        }
+    return options
+
+
+engine = create_async_engine(settings.database_url, **_engine_options(settings.database_url))
+
+
+@dataclass
+class RoutingState:
+    pinned: bool = False
+    wrote: bool = False
+
+
+# Set per request by ReadYourWritesMiddleware; None outside of requests.
+_routing_state: ContextVar[RoutingState | None] = ContextVar("routing_state", default=None)
+
+
+class ReplicaSet:
+    def __init__(self, engines: list[AsyncEngine], strategy: str, eject_seconds: float):
+        if strategy not in (ROUND_ROBIN, LEAST_CONNECTIONS):
+            message = f"Unknown replica strategy: {strategy}"
+            raise ValueError(message)
+        self.engines = engines
+        self.strategy = strategy
+        self.eject_seconds = eject_seconds
+        self._next = 0
+        self._ejected_until = [0.0] * len(engines)
+        self._selected = [0] * len(engines)
+        self._ejections = [0] * len(engines)
+        self._in_use = [0] * len(engines)
+        self._fallbacks = 0
+        for index, replica in enumerate(engines):
+            event.listen(replica.sync_engine, "handle_error", partial(self._on_error, index))
+            event.listen(replica.sync_engine, "checkout", partial(self._on_checkout, index, 1))
+            event.listen(replica.sync_engine, "checkin", partial(self._on_checkout, index, -1))
+
+    def __len__(self) -> int:
+        return len(self.engines)
+
+    def choose(self) -> AsyncEngine | None:
+        now = time.monotonic()
+        healthy = [i for i in range(len(self.engines)) if self._ejected_until[i] <= now]
+        if not healthy:
+            self._fallbacks += 1
+            return None
+
+        # Rotating the candidates also spreads ties under least_connections.
+        offset = self._next % len(healthy)
+        self._next += 1
+        candidates = healthy[offset:] + healthy[:offset]
+        if self.strategy == LEAST_CONNECTIONS:
+            index = min(candidates, key=lambda i: self._in_use[i])
+        else:
+            index = candidates[0]
+        self._selected[index] += 1
+        return self.engines[index]
+
+    def eject(self, index: int) -> None:
+        self._ejected_until[index] = time.monotonic() + self.eject_seconds
+        self._ejections[index] += 1
+        logger.warning(
+            "Ejecting read replica %s for %ss",
+            self.engines[index].url.render_as_string(hide_password=True),
+            self.eject_seconds,
+        )
+
+    def _on_error(self, index: int, context: Any) -> None:
+        # Failed connects have no connection; dropped ones are disconnects.
+        if context.is_disconnect or context.connection is None:
+            self.eject(index)
+
+    def _on_checkout(self, index: int, delta: int, *_args: Any) -> None:
+        self._in_use[index] += delta
+
+    def stats(self) -> dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "strategy": self.strategy,
+            "primary_fallbacks": self._fallbacks,
+            "replicas": [
+                {
+                    "url": replica.url.render_as_string(hide_password=True),
+                    "healthy": self._ejected_until[i] <= now,
+                    "selected": self._selected[i],
+                    "ejections": self._ejections[i],
+                    "checked_out": self._in_use[i],
+                }
+                for i, replica in enumerate(self.engines)
+            ],
+        }
+
+    async def dispose(self) -> None:
+        for replica in self.engines:
+            await replica.dispose()
+
+
+class RoutingSession(Session):
+    """Sends statements marked ``replica=True`` to a read replica.
+
+    Everything else goes to the primary, as do all reads once the session
+    has written or the current client is pinned after a recent write.
+    """
+
+    def __init__(self, *args: Any, replicas: ReplicaSet | None = None, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.replicas = replicas
+        self.routing_state = _routing_state.get()
+
+    def get_bind(self, mapper: Any = None, clause: Any = None, **kw: Any) -> Any:
+        if clause is not None and clause.get_execution_options().get("replica"):
+            if self._use_replica():
+                replica = self.replicas.choose()
+                if replica is not None:
+                    return replica.sync_engine
+        elif self._flushing or (clause is not None and not getattr(clause, "is_select", False)):
+            self.info["wrote"] = True
+            if self.routing_state is not None:
+                self.routing_state.wrote = True
+        return super().get_bind(mapper, clause=clause, **kw)
+
+    def _use_replica(self) -> bool:
+        if not self.replicas or self.info.get("wrote"):
+            return False
+        return self.routing_state is None or not self.routing_state.pinned
+
+
+def reads_from_primary(session: AsyncSession) -> bool:
+    """Whether this session's replica-eligible reads are kept on the primary."""
+    sync_session = session.sync_session
+    if sync_session.info.get("wrote"):
+        return True
+    state = getattr(sync_session, "routing_state", None)
+    return state is not None and state.pinned
+
+
+replica_set: ReplicaSet | None = None
+if settings.database_replica_url_list:
+    replica_set = ReplicaSet(
+        [
+            create_async_engine(url, **_engine_options(url))
+            for url in settings.database_replica_url_list
+        ],
+        strategy=settings.database_replica_strategy,
+        eject_seconds=settings.database_replica_eject_seconds,
+    )
+
 
-engine = create_async_engine(
-    settings.database_url,
-    echo=settings.environment == "development",
-    future=True,
-)
+
+class ShardSet:
+    """Databases a sharded table is spread over, by a hash of the row id.
+
+    Each shard has its own engine and pool. The shard count is part of the
+    data layout: changing it means moving rows, not only editing the URLs.
+    """
+
+    def __init__(self, engines: list[AsyncEngine]):
+        self.engines = engines
+        self.session_makers = [
+            async_sessionmaker(shard, class_=AsyncSession, expire_on_commit=False)
+            for shard in engines
+        ]
+
+    def __len__(self) -> int:
+        return len(self.engines)
+
+    def shard_for(self, row_id: Any) -> int | None:
+        # Hashed rather than taken from the id itself, whose leading bits
+        # are a timestamp; None for values that are not UUIDs.
+        key = normalize_id(row_id)
+        if key is None:
+            return None
+        digest = hashlib.blake2b(uuid.UUID(key).bytes, digest_size=8).digest()
+        return int.from_bytes(digest, "big") % len(self.engines)
+
+    def stats(self) -> list[dict[str, Any]]:
+        return [
+            {"url": shard.url.render_as_string(hide_password=True), "pool": _pool_stats(shard)}
+            for shard in self.engines
+        ]
+
+    async def dispose(self) -> None:
+        for shard in self.engines:
+            await shard.dispose()
+
+
+shard_set: ShardSet | None = None
+if settings.database_shard_url_list:
+    shard_set = ShardSet([
+        create_async_engine(url, **_engine_options(url))
+        for url in settings.database_shard_url_list
+    ])
 
 async_session_maker = async_sessionmaker(
     engine,
     class_=AsyncSession,
+    sync_session_class=RoutingSession,
     expire_on_commit=False,
+    replicas=replica_set,
 )
 
 Base = declarative_base()
+# Alembic head the code expects; bump it with every new migration.
+SCHEMA_REVISION = "0003"
+SCHEMA_CACHE_KEY = "schema:revision"
+# Collations that order UTF-8 text by code point, as Python compares str.
+CODE_POINT_COLLATIONS = ("C", "POSIX", "C.UTF-8", "C.utf8")
+# Trigram search indexes need pg_trgm before the tables are created.
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
+_session_makers: dict[int, async_sessionmaker] = {}
+
+
+def get_session_maker(session: AsyncSession) -> async_sessionmaker:
+    # Work that outlives a request (background tasks, streaming) needs its own
+    # session, bound to the same engine as the request session.
+    bind = session.bind
+    if bind is None or bind is engine:
+        return async_session_maker
+    if id(bind) not in _session_makers:
+        _session_makers[id(bind)] = async_sessionmaker(
+            bind,
+            class_=AsyncSession,
+            expire_on_commit=False,
+        )
+    return _session_makers[id(bind)]
+
+
+def get_engine(session: AsyncSession) -> AsyncEngine:
+    # Work that needs a connection of its own (temporary tables, COPY).
+    return session.bind or engine
+
+
+class ReadYourWritesMiddleware:
+    """Pins a client to the primary for a short window after it writes.
+
+    Clients are keyed by their Authorization header, or by address for
+    anonymous requests. Pins are per worker.
+    """
+
+    def __init__(self, app: Any, window: float, max_clients: int = 10000):
+        self.app = app
+        self.window = window
+        self.max_clients = max_clients
+        self._pins: OrderedDict[str, float] = OrderedDict()
+
+    async def __call__(self, scope: Any, receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or not replica_set:
+            await self.app(scope, receive, send)
+            return
+
+        key = self._client_key(scope)
+        state = RoutingState(pinned=self._is_pinned(key))
+
+        async def send_wrapper(message: Any) -> None:
+            # Pin before the response leaves so the client's next request
+            # cannot race ahead of it.
+            if message["type"] == "http.response.start" and state.wrote:
+                self._pin(key)
+            await send(message)
+
+        token = _routing_state.set(state)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _routing_state.reset(token)
+            if state.wrote:
+                self._pin(key)
+
+    def _client_key(self, scope: Any) -> str:
+        for name, value in scope.get("headers", []):
+            if name == b"authorization":
+                return hashlib.sha256(value).hexdigest()
+        client = scope.get("client")
+        return client[0] if client else ""
+
+    def _is_pinned(self, key: str) -> bool:
+        expires_at = self._pins.get(key)
+        if expires_at is None:
+            return False
+        if expires_at <= time.monotonic():
+            del self._pins[key]
+            return False
+        return True
+
+    def _pin(self, key: str) -> None:
+        self._pins[key] = time.monotonic() + self.window
+        self._pins.move_to_end(key)
+        while len(self._pins) > self.max_clients:
+            self._pins.popitem(last=False)
 
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
+    # The session only checks out a connection at its first query. It goes
+    # back to the pool when a write commits, when a repository's release()
+    # ends the reads before slow work, or when the session closes here.
     async with async_session_maker() as session:
         try:
             yield session
@@ -28,10 +414,123 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
 
 
 async def init_db() -> None:
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    if settings.database_create_all:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        return
+    await check_schema()
+    if shard_set is not None:
+        await check_shard_collation(shard_set)
+
+
+async def check_schema(target: AsyncEngine | None = None) -> str:
+    """Fails fast unless the database is at SCHEMA_REVISION.
+
+    The first worker to verify the revision shares it through Redis, so a
+    deploy of many workers costs one ``SELECT`` instead of one per worker.
+    """
+    target = target or engine
+    try:
+        if await cache_service.get(SCHEMA_CACHE_KEY) == SCHEMA_REVISION:
+            return SCHEMA_REVISION
+    except RedisError as e:
+        logger.warning("Schema revision cache lookup failed: %s", e)
+
+    async with target.connect() as conn:
+        try:
+            revision = (await conn.execute(text("SELECT version_num FROM alembic_version"))).scalar_one_or_none()
+        except exc.DBAPIError:
+            revision = None
+    if revision != SCHEMA_REVISION:
+        message = (
+            f"Database schema is at revision {revision or '(none)'}, expected {SCHEMA_REVISION}. "
+            "Run `alembic upgrade head`."
+        )
+        raise RuntimeError(message)
+
+    try:
+        await cache_service.set(SCHEMA_CACHE_KEY, revision, settings.database_schema_cache_ttl)
+    except RedisError as e:
+        logger.warning("Schema revision cache write failed: %s", e)
+    return revision
+
+
+async def check_shard_collation(shards: ShardSet) -> None:
+    """Fails fast unless every PostgreSQL shard sorts text by code point.
+
+    Sharded pages and searches merge the rows each shard returned sorted in
+    Python, which compares strings by code point. A shard sorting by a
+    linguistic collation (en_US.UTF-8 and friends) would interleave them out
+    of order, so shard databases need ``LC_COLLATE 'C'``.
+    """
+    for shard in shards.engines:
+        if shard.dialect.name != "postgresql":
+            # SQLite's default BINARY collation already compares code points.
+            continue
+        async with shard.connect() as conn:
+            collation = (await conn.execute(
+                text("SELECT datcollate FROM pg_database WHERE datname = current_database()")
+            )).scalar_one()
+        if collation not in CODE_POINT_COLLATIONS:
+            message = (
+                f"Shard {shard.url.render_as_string(hide_password=True)} sorts text with "
+                f"collation {collation}; shard databases need LC_COLLATE 'C'."
+            )
+            raise RuntimeError(message)
+
+
+async def warm_pool(target: AsyncEngine, size: int) -> int:
+    # Holding all connections at once forces the pool to open `size` of them.
+    results = await asyncio.gather(
+        *(target.connect() for _ in range(size)),
+        return_exceptions=True,
+    )
+    opened = [r for r in results if not isinstance(r, BaseException)]
+    for connection in opened:
+        await connection.close()
+    if len(opened) < size:
+        errors = [r for r in results if isinstance(r, BaseException)]
+        logger.warning(
+            "Opened %s of %s connections to %s: %s",
+            len(opened),
+            size,
+            target.url.render_as_string(hide_password=True),
+            errors[0],
+        )
+    return len(opened)
+
+
+async def prewarm_pools() -> None:
+    engines = [
+        engine,
+        *(replica_set.engines if replica_set else []),
+        *(shard_set.engines if shard_set else []),
+    ]
+    for target in engines:
+        if isinstance(target.sync_engine.pool, InstrumentedPool):
+            await warm_pool(target, settings.database_pool_size)
 
 
 async def close_db() -> None:
     await engine.dispose()
+    if replica_set is not None:
+        await replica_set.dispose()
+    if shard_set is not None:
+        await shard_set.dispose()
+
+
+def _pool_stats(target: AsyncEngine) -> dict[str, Any] | None:
+    pool = target.sync_engine.pool
+    return pool.stats() if isinstance(pool, InstrumentedPool) else None
+
 
+def database_stats() -> dict[str, Any]:
+    stats: dict[str, Any] = {
+        "pool": _pool_stats(engine),
+        "read_replicas": replica_set.stats() if replica_set else None,
+        "shards": shard_set.stats() if shard_set else None,
+    }
+    if replica_set:
+        for replica, replica_stats in zip(replica_set.engines, stats["read_replicas"]["replicas"], strict=True):
+            replica_stats["pool"] = _pool_stats(replica)
+    return stats
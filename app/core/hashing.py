@@ -0,0 +1,102 @@
+import asyncio
+import time
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any
+
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+
+
+def _run_timed(fn: Callable[..., Any], *args: Any) -> tuple[float, Any]:
+    # Runs inside the worker; time.monotonic is system-wide, so the start
+    # timestamp is comparable with the submit timestamp even across processes.
+    started = time.monotonic()
+    return started, fn(*args)
+
+
+class HashingPool:
+    def __init__(self, kind: str, max_workers: int, max_queue: int):
+        if kind not in ("thread", "process"):
+            message = f"Unsupported password hash executor: {kind}"
+            raise ValueError(message)
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor: Executor | None = None
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="password-hash",
+                )
+        return self._executor
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self._in_flight >= self.capacity:
+            self._rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please retry",
+                headers={"Retry-After": "1"},
+            )
+
+        self._in_flight += 1
+        self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+        submitted = time.monotonic()
+        try:
+            loop = asyncio.get_running_loop()
+            started, result = await loop.run_in_executor(
+                self._get_executor(), _run_timed, fn, *args
+            )
+        finally:
+            self._in_flight -= 1
+
+        wait = max(started - submitted, 0.0)
+        self._completed += 1
+        self._wait_total += wait
+        self._wait_max = max(self._wait_max, wait)
+        return result
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "executor": self.kind,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "queued": max(self._in_flight - self.max_workers, 0),
+            "peak_in_flight": self._peak_in_flight,
+            "saturation": self._in_flight / self.capacity if self.capacity else 0.0,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "wait_seconds_total": self._wait_total,
+            "wait_seconds_avg": self._wait_total / self._completed if self._completed else 0.0,
+            "wait_seconds_max": self._wait_max,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+hashing_pool = HashingPool(
+    kind=settings.password_hash_executor,
+    max_workers=settings.password_hash_workers,
+    max_queue=settings.password_hash_max_queue,
+)
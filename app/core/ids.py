@@ -0,0 +1,84 @@
+import os
+import threading
+import time
+import uuid
+from typing import Any
+
+from sqlalchemy import Uuid
+from sqlalchemy.types import TypeDecorator
+
+# rand_a is 12 bits wide.
+COUNTER_MAX = 0xFFF
+
+
+class _Clock:
+    """The last millisecond handed out and its counter, shared by threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.last_ms = 0
+        self.counter = 0
+
+
+_clock = _Clock()
+
+
+def uuid7() -> uuid.UUID:
+    """Returns a time-ordered UUID (RFC 9562 version 7).
+
+    The first 48 bits are the Unix time in milliseconds, so new keys land at
+    the right edge of the primary key index instead of at random pages. The
+    12-bit rand_a field is a counter seeded randomly each millisecond, which
+    keeps ids from one process strictly increasing.
+    """
+    with _clock.lock:
+        ms = time.time_ns() // 1_000_000
+        if ms > _clock.last_ms:
+            _clock.last_ms = ms
+            # Seeded in the lower half to leave room for the counter.
+            _clock.counter = int.from_bytes(os.urandom(2), "big") & 0x7FF
+        else:
+            _clock.counter += 1
+            if _clock.counter > COUNTER_MAX:
+                # Counter exhausted: borrow the next millisecond.
+                _clock.last_ms += 1
+                _clock.counter = 0
+        ms, counter = _clock.last_ms, _clock.counter
+
+    rand_b = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+    value = (ms << 80) | (0x7 << 76) | (counter << 64) | (0b10 << 62) | rand_b
+    return uuid.UUID(int=value)
+
+
+def new_id() -> str:
+    return str(uuid7())
+
+
+def normalize_id(value: Any) -> str | None:
+    """Returns the canonical form of a UUID string, or None if it is not one."""
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    try:
+        return str(uuid.UUID(str(value)))
+    except ValueError:
+        return None
+
+
+class UUIDKey(TypeDecorator):
+    """Native UUID on PostgreSQL (CHAR(32) elsewhere), exposed as str.
+
+    Values that are not UUIDs bind as NULL, which compares equal to nothing,
+    so an unknown id from a URL is a miss rather than a driver error.
+    """
+
+    impl = Uuid
+    cache_ok = True
+
+    def __init__(self):
+        super().__init__(as_uuid=False)
+
+    def process_bind_param(self, value: Any, dialect: Any) -> str | None:  # noqa: ARG002
+        return None if value is None else normalize_id(value)
+
+    def process_literal_param(self, value: Any, dialect: Any) -> str:  # noqa: ARG002
+        return f"'{normalize_id(value)}'"
@@ -0,0 +1,77 @@
+import time
+from bisect import bisect_left
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+from typing import Any
+
+# Seconds; suits connection checkouts and other sub-second waits.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self._counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def snapshot(self) -> dict[str, Any]:
+        # Cumulative counts per upper bound, as in a Prometheus histogram.
+        buckets: dict[str, int] = {}
+        running = 0
+        for bound, count in zip([*map(str, self.buckets), "+Inf"], self._counts, strict=True):
+            running += count
+            buckets[bound] = running
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "avg": self.sum / self.count if self.count else 0.0,
+            "max": self.max,
+            "buckets": buckets,
+        }
+
+
+class PhaseTimer:
+    """Wall-clock time of named phases, e.g. the steps of app startup."""
+
+    def __init__(self, budget: float | None = None):
+        self.budget = budget
+        self.phases: dict[str, float] = {}
+        self.total: float | None = None
+        self._started = time.monotonic()
+
+    def start(self) -> None:
+        self.phases = {}
+        self.total = None
+        self._started = time.monotonic()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.monotonic() - started
+
+    def finish(self) -> float:
+        self.total = time.monotonic() - self._started
+        return self.total
+
+    @property
+    def over_budget(self) -> bool:
+        return self.budget is not None and self.total is not None and self.total > self.budget
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "total_seconds": self.total,
+            "budget_seconds": self.budget,
+            "over_budget": self.over_budget,
+            "phases": dict(self.phases),
+        }
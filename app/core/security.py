@@ -1,3 +1,9 @@
+import asyncio
+import logging
+import math
+import re
+import time
+import uuid
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
@@ -6,29 +12,133 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 
 from app.core.config import settings
+from app.core.hashing import hashing_pool
+from app.core.token_cache import token_cache, token_digest
+
+logger = logging.getLogger(__name__)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.prefix}/auth/login")
+# "$2b$12$...": the cost is the field after the bcrypt version.
+BCRYPT_COST = re.compile(r"\$2[abxy]?\$(\d+)\$")
+
+
+class _HashingCost:
+    """bcrypt rounds for new hashes; replaced by startup calibration."""
+
+    def __init__(self, rounds: int):
+        self.rounds = rounds
+
+
+_cost = _HashingCost(settings.bcrypt_rounds)
+
+
+def get_bcrypt_rounds() -> int:
+    return _cost.rounds
+
+
+def set_bcrypt_rounds(rounds: int) -> None:
+    _cost.rounds = rounds
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
 
-def get_password_hash(password: str) -> str:
+def get_password_hash(password: str, rounds: int | None = None) -> str:
     if len(password.encode('utf-8')) > 72:
         password = password.encode('utf-8')[:72].decode('utf-8', errors='ignore')
-    salt = bcrypt.gensalt(rounds=12)
+    salt = bcrypt.gensalt(rounds=rounds or _cost.rounds)
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed.decode('utf-8')
 
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await hashing_pool.run(verify_password, plain_password, hashed_password)
+
+
+async def hash_password_async(password: str) -> str:
+    # Rounds are passed explicitly so process-pool workers use the calibrated cost.
+    return await hashing_pool.run(get_password_hash, password, _cost.rounds)
+
+
+async def hash_passwords_async(passwords: list[str]) -> list[str]:
+    # At most one hash per worker at a time, so a bulk request leaves the
+    # pool's queue free for logins instead of filling it and causing 503s.
+    semaphore = asyncio.Semaphore(hashing_pool.max_workers)
+
+    async def hash_one(password: str) -> str:
+        async with semaphore:
+            return await hash_password_async(password)
+
+    return list(await asyncio.gather(*(hash_one(password) for password in passwords)))
+
+
+def get_hash_rounds(hashed_password: str) -> int | None:
+    match = BCRYPT_COST.match(hashed_password)
+    return int(match.group(1)) if match else None
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """True when the stored cost differs from this process's cost.
+
+    With ``bcrypt_calibrate`` each process picks its own cost, so only
+    lower costs are upgraded; otherwise workers on different hardware
+    would keep rewriting each other's hashes on every login.
+    """
+    rounds = get_hash_rounds(hashed_password)
+    if rounds is None:
+        return True
+    if settings.bcrypt_calibrate:
+        return rounds < _cost.rounds
+    return rounds != _cost.rounds
+
+
+def calibrate_bcrypt_rounds(target_ms: int, min_rounds: int, max_rounds: int) -> int:
+    # Each extra round doubles the cost, so one measurement at min_rounds is
+    # enough to extrapolate. Take the best of three to ignore scheduler noise.
+    salt = bcrypt.gensalt(rounds=min_rounds)
+    elapsed_ms = float("inf")
+    for _ in range(3):
+        started = time.perf_counter()
+        bcrypt.hashpw(b"calibration-password", salt)
+        elapsed_ms = min(elapsed_ms, (time.perf_counter() - started) * 1000)
+
+    rounds = min_rounds
+    while rounds < max_rounds and elapsed_ms * 2 <= target_ms:
+        elapsed_ms *= 2
+        rounds += 1
+    return rounds
+
+
+async def calibrate_password_hashing() -> int:
+    rounds = await hashing_pool.run(
+        calibrate_bcrypt_rounds,
+        settings.bcrypt_target_ms,
+        settings.bcrypt_min_rounds,
+        settings.bcrypt_max_rounds,
+    )
+    logger.info(
+        "Calibrated bcrypt cost to %s rounds for a %sms target",
+        rounds,
+        settings.bcrypt_target_ms,
+    )
+    set_bcrypt_rounds(rounds)
+    return rounds
+
+
+def _issued_at() -> float:
+    # Millisecond precision so a login right after "log out everywhere"
+    # is not caught by an epoch set within the same second.
+    return math.floor(time.time() * 1000) / 1000
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.jwt_access_token_expire_minutes)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": _issued_at(), "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, settings.jwt_secret_key, algorithm=settings.jwt_algorithm)
     return encoded_jwt
 
@@ -36,7 +146,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 def create_refresh_token(data: dict) -> str:
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(days=settings.jwt_refresh_token_expire_days)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": _issued_at(), "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, settings.jwt_secret_key, algorithm=settings.jwt_algorithm)
     return encoded_jwt
 
@@ -53,18 +163,36 @@ def decode_token(token: str) -> dict:
         )
 
 
-async def get_current_user_id(token: str = Depends(oauth2_scheme)) -> str:
-    credentials_exception = HTTPException(
+def get_token_id(token: str, payload: dict) -> str:
+    # Tokens issued before jti was added are identified by a short digest.
+    return payload.get("jti") or token_digest(token)[:32]
+
+
+def decode_token_cached(token: str) -> dict:
+    payload = token_cache.get(token)
+    if payload is None:
+        payload = decode_token(token)
+        token_cache.put(token, payload)
+    return payload
+
+
+def credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+async def get_current_user_id(token: str = Depends(oauth2_scheme)) -> str:
+    # Signature and expiry only; app.common.dependencies also rejects
+    # revoked tokens and is what routes should depend on.
     try:
-        payload = decode_token(token)
+        payload = decode_token_cached(token)
         user_id: str = payload.get("sub")
         if user_id is None:
-            raise credentials_exception
+            raise credentials_exception()
         return user_id
     except JWTError:
-        raise credentials_exception
+        raise credentials_exception()
 
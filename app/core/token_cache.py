@@ -0,0 +1,72 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any
+
+from app.core.config import settings
+
+
+def token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class VerifiedTokenCache:
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict[str, tuple[dict[str, Any], float]] = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, token: str) -> dict[str, Any] | None:
+        key = token_digest(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            self._misses += 1
+            return None
+
+        claims, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            self._expirations += 1
+            self._misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return claims
+
+    def put(self, token: str, claims: dict[str, Any]) -> None:
+        if self.max_size <= 0:
+            return
+        exp = claims.get("exp")
+        expires_at = float(exp) if isinstance(exp, (int, float)) else float("inf")
+
+        key = token_digest(token)
+        self._entries[key] = (claims, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def discard(self, token: str) -> None:
+        self._entries.pop(token_digest(token), None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self._hits + self._misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_ratio": self._hits / lookups if lookups else 0.0,
+            "evictions": self._evictions,
+            "expirations": self._expirations,
+        }
+
+
+token_cache = VerifiedTokenCache(max_size=settings.jwt_cache_size)
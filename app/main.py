@@ -1,3 +1,4 @@
+import logging
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -6,23 +7,61 @@ from starlette.exceptions import HTTPException as StarletteHTTPException
 from fastapi.exceptions import RequestValidationError
 
 from app.core.config import settings
-from app.core.database import init_db, close_db
+from app.core.database import (
+    ReadYourWritesMiddleware,
+    close_db,
+    database_stats,
+    init_db,
+    prewarm_pools,
+)
+from app.core.hashing import hashing_pool
+from app.core.metrics import PhaseTimer
+from app.core.security import calibrate_password_hashing
+from app.core.token_cache import token_cache
 from app.api.v1 import auth, users, templates
 from app.common.exceptions import (
     http_exception_handler,
     validation_exception_handler,
     general_exception_handler,
 )
+from app.repositories.cached import repository_cache_stats
+from app.repositories.loader import loader_stats
 from app.services.cache_service import cache_service
+from app.services.revocation_service import revocation_service
+from app.services.principal_cache import principal_cache
+
+
+logger = logging.getLogger(__name__)
+
+startup_timer = PhaseTimer(budget=settings.startup_budget_seconds)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    await init_db()
-    await cache_service.connect()
+    startup_timer.start()
+    with startup_timer.phase("schema_check"):
+        await init_db()
+    if settings.database_pool_prewarm:
+        with startup_timer.phase("pool_prewarm"):
+            await prewarm_pools()
+    with startup_timer.phase("cache_connect"):
+        await cache_service.connect()
+        await cache_service.start_listener()
+    if settings.bcrypt_calibrate:
+        with startup_timer.phase("bcrypt_calibrate"):
+            await calibrate_password_hashing()
+    startup_timer.finish()
+    log = logger.warning if startup_timer.over_budget else logger.info
+    log(
+        "Startup took %.3fs (budget %.1fs): %s",
+        startup_timer.total,
+        settings.startup_budget_seconds,
+        ", ".join(f"{name} {seconds:.3f}s" for name, seconds in startup_timer.phases.items()),
+    )
     yield
     await close_db()
     await cache_service.disconnect()
+    hashing_pool.shutdown()
 
 
 
@@ -68,6 +107,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(
+    ReadYourWritesMiddleware,
+    window=settings.database_read_your_writes_seconds,
+)
+
 app.add_exception_handler(StarletteHTTPException, http_exception_handler)
 app.add_exception_handler(RequestValidationError, validation_exception_handler)
 app.add_exception_handler(Exception, general_exception_handler)
@@ -83,6 +127,21 @@ async def health():
     return {"status": "ok", "version": settings.version}
 
 
+@app.get("/metrics")
+async def metrics():
+    return {
+        "password_hashing": hashing_pool.stats(),
+        "jwt_cache": token_cache.stats(),
+        "revocation": revocation_service.stats(),
+        "principal_cache": principal_cache.stats(),
+        "cache": await cache_service.stats(),
+        "database": database_stats(),
+        "repository_cache": repository_cache_stats(),
+        "loaders": loader_stats(),
+        "startup": startup_timer.snapshot(),
+    }
+
+
 app.include_router(auth.router, prefix=f"{settings.prefix}/auth", tags=["auth"])
 app.include_router(users.router, prefix=f"{settings.prefix}/users", tags=["users"])
 app.include_router(
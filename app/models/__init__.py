@@ -1,5 +1,6 @@
 from app.models.user import User
+from app.models.user_shard import UserShard
 from app.models.template import Template
+from app.models.backfill_checkpoint import BackfillCheckpoint
 
-__all__ = ["User", "Template"]
-
+__all__ = ["User", "UserShard", "Template", "BackfillCheckpoint"]
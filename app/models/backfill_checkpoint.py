@@ -0,0 +1,21 @@
+from sqlalchemy import BigInteger, Column, DateTime, Integer, String, func
+
+from app.core.database import Base
+
+
+class BackfillCheckpoint(Base):
+    """Progress of one backfill, committed together with each batch."""
+
+    __tablename__ = "backfill_checkpoints"
+
+    name = Column(String(255), primary_key=True)
+    # Highest key processed so far; NULL until the first batch commits.
+    last_key = Column(String(255), nullable=True)
+    rows = Column(BigInteger, default=0, nullable=False)
+    batches = Column(Integer, default=0, nullable=False)
+    started_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<BackfillCheckpoint(name={self.name}, last_key={self.last_key})>"
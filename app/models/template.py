@@ -1,12 +1,15 @@
-from datetime import datetime
-from sqlalchemy import Column, String, Boolean, DateTime, func
+from sqlalchemy import Column, Index, String, Boolean, DateTime, func
 from app.core.database import Base
+from app.core.ids import UUIDKey, new_id
 
 
 class Template(Base):
     __tablename__ = "templates"
+    __table_args__ = (
+        Index("ix_templates_created_at_id", "created_at", "id"),
+    )
 
-    id = Column(String, primary_key=True)
+    id = Column(UUIDKey, primary_key=True, default=new_id)
     email = Column(String(255), unique=True, nullable=False)
     name = Column(String(255), nullable=True)
     password = Column(String(255), nullable=False)
@@ -17,3 +20,39 @@ class Template(Base):
     def __repr__(self):
         return f"<Template(id={self.id}, email={self.email})>"
 
+
+# Listing published templates is the common case; a partial index keeps it
+# to the published rows, in keyset order.
+Index(
+    "ix_templates_published_created_at_id",
+    Template.created_at,
+    Template.id,
+    postgresql_where=Template.published.is_(True),
+    sqlite_where=Template.published.is_(True),
+)
+
+# Search indexes on lower(email) and lower(name). The B-trees serve prefix
+# (typeahead) matches; the trigram GIN indexes serve substring matches and
+# exist only on PostgreSQL.
+Index(
+    "ix_templates_email_prefix",
+    func.lower(Template.email).label("email_lower"),
+    postgresql_ops={"email_lower": "text_pattern_ops"},
+)
+Index(
+    "ix_templates_name_prefix",
+    func.lower(Template.name).label("name_lower"),
+    postgresql_ops={"name_lower": "text_pattern_ops"},
+)
+Index(
+    "ix_templates_email_trgm",
+    func.lower(Template.email).label("email_lower"),
+    postgresql_using="gin",
+    postgresql_ops={"email_lower": "gin_trgm_ops"},
+).ddl_if(dialect="postgresql")
+Index(
+    "ix_templates_name_trgm",
+    func.lower(Template.name).label("name_lower"),
+    postgresql_using="gin",
+    postgresql_ops={"name_lower": "gin_trgm_ops"},
+).ddl_if(dialect="postgresql")
@@ -1,13 +1,16 @@
-from datetime import datetime
-from sqlalchemy import Column, String, DateTime, func
+from sqlalchemy import Column, Index, String, DateTime, func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
+from app.core.ids import UUIDKey, new_id
 
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        Index("ix_users_created_at_id", "created_at", "id"),
+    )
 
-    id = Column(String, primary_key=True)
+    id = Column(UUIDKey, primary_key=True, default=new_id)
     email = Column(String(255), unique=True, nullable=False)
     name = Column(String(255), nullable=True)
     password = Column(String(255), nullable=False)
@@ -17,3 +20,29 @@ class User(Base):
     def __repr__(self):
         return f"<User(id={self.id}, email={self.email})>"
 
+
+# Search indexes on lower(email) and lower(name). The B-trees serve prefix
+# (typeahead) matches; the trigram GIN indexes serve substring matches and
+# exist only on PostgreSQL.
+Index(
+    "ix_users_email_prefix",
+    func.lower(User.email).label("email_lower"),
+    postgresql_ops={"email_lower": "text_pattern_ops"},
+)
+Index(
+    "ix_users_name_prefix",
+    func.lower(User.name).label("name_lower"),
+    postgresql_ops={"name_lower": "text_pattern_ops"},
+)
+Index(
+    "ix_users_email_trgm",
+    func.lower(User.email).label("email_lower"),
+    postgresql_using="gin",
+    postgresql_ops={"email_lower": "gin_trgm_ops"},
+).ddl_if(dialect="postgresql")
+Index(
+    "ix_users_name_trgm",
+    func.lower(User.name).label("name_lower"),
+    postgresql_using="gin",
+    postgresql_ops={"name_lower": "gin_trgm_ops"},
+).ddl_if(dialect="postgresql")
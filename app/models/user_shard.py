@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Index, Integer, PrimaryKeyConstraint, String
+
+from app.core.database import Base
+from app.core.ids import UUIDKey
+
+
+class UserShard(Base):
+    """Which shard holds the user with an email, when users are sharded.
+
+    Lives on the main database. Inserting here first is what keeps emails
+    unique across shards.
+    """
+
+    __tablename__ = "user_shards"
+    __table_args__ = (
+        # Named so a duplicate surfaces as "Email already registered".
+        PrimaryKeyConstraint("email", name="user_shards_email_key"),
+        Index("ix_user_shards_user_id", "user_id", unique=True),
+    )
+
+    email = Column(String(255), nullable=False)
+    user_id = Column(UUIDKey, nullable=False)
+    shard = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return f"<UserShard(email={self.email}, shard={self.shard})>"
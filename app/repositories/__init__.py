@@ -1,6 +1,7 @@
 from app.repositories.base import BaseRepository
+from app.repositories.cached import CachedRepository
+from app.repositories.sharded import ShardedRepository
 from app.repositories.user_repository import UserRepository
 from app.repositories.template_repository import TemplateRepository
 
-__all__ = ["BaseRepository", "UserRepository", "TemplateRepository"]
-
+__all__ = ["BaseRepository", "CachedRepository", "ShardedRepository", "UserRepository", "TemplateRepository"]
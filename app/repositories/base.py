@@ -1,51 +1,657 @@
-from typing import Any, Dict, Generic, Optional, Type, TypeVar
-from sqlalchemy import select, update, delete
+import hashlib
+import json
+import logging
+import uuid
+from collections.abc import AsyncIterator, Sequence
+from typing import Any, ClassVar, Generic, TypeVar
+
+from redis.exceptions import RedisError
+from sqlalchemy import (
+    Select,
+    and_,
+    delete,
+    func,
+    insert,
+    literal,
+    not_,
+    or_,
+    select,
+    text,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.core.database import Base
+from sqlalchemy.orm import SessionTransactionOrigin
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.common.exceptions import DuplicateError, InvalidQueryError
+from app.common.filtering import (
+    Filter,
+    FilterOp,
+    Sort,
+    check_query_spec,
+    coerce_value,
+    filter_clause,
+    indexed_values,
+    like_pattern,
+)
+from app.common.pagination import (
+    NEXT,
+    PREV,
+    CountMode,
+    Page,
+    decode_cursor,
+    encode_cursor,
+)
+from app.core.cache import cache_service
+from app.core.config import settings
+from app.core.database import Base, get_session_maker, reads_from_primary
+from app.repositories.loader import get_loader
+
+logger = logging.getLogger(__name__)
 
 ModelType = TypeVar("ModelType", bound=Base)
 
+# search() orders by (tier, the tier's search field, id).
+SEARCH_KEYSET_SIZE = 3
+
+UNIQUE_VIOLATION = "23505"
+SQLITE_UNIQUE_ERRORS = ("SQLITE_CONSTRAINT_UNIQUE", "SQLITE_CONSTRAINT_PRIMARYKEY")
+
+
+def unique_violation(error: IntegrityError) -> str | None:
+    # The violated constraint's name, or SQLite's "UNIQUE constraint failed:
+    # table.column" message; None for any other integrity error (NOT NULL,
+    # foreign key, check).
+    orig = error.orig
+    sqlstate = getattr(orig, "sqlstate", None) or getattr(orig, "pgcode", None)
+    if sqlstate is not None:
+        if sqlstate != UNIQUE_VIOLATION:
+            return None
+        # asyncpg keeps the driver error as the cause; psycopg2 exposes diag.
+        return (
+            getattr(orig.__cause__, "constraint_name", None)
+            or getattr(getattr(orig, "diag", None), "constraint_name", None)
+            or str(orig)
+        )
+    if getattr(orig, "sqlite_errorname", None) in SQLITE_UNIQUE_ERRORS:
+        return str(orig)
+    return None
+
 
 class BaseRepository(Generic[ModelType]):
-    def __init__(self, model: Type[ModelType], session: AsyncSession):
+    # Keyset pagination order; must be unique and backed by an index.
+    order_columns: tuple[str, ...] = ("created_at", "id")
+    count_cache_ttl: int = 60
+    # Most rows a filtered count=estimated will count.
+    filtered_count_cap: int = 10000
+    # Columns with unique constraints; violations surface as DuplicateError.
+    unique_fields: tuple[str, ...] = ("email",)
+    # Matched case-insensitively by search(); each needs the lower() indexes.
+    search_fields: tuple[str, ...] = ("email", "name")
+    search_cache_ttl: int = 30
+    # Shorter queries only match prefixes, since trigram indexes cannot
+    # serve substrings of fewer than three characters.
+    search_min_substring: int = 3
+    # Whitelists for list filters and sorts; every entry must be backed by
+    # an index, which is checked when the repository is created.
+    filter_fields: ClassVar[dict[str, tuple[FilterOp, ...]]] = {}
+    sort_fields: tuple[str, ...] = ()
+
+    def __init__(self, model: type[ModelType], session: AsyncSession):
         self.model = model
         self.session = session
+        check_query_spec(model.__table__, self.filter_fields, self.sort_fields)
 
-    async def get_by_id(self, id: str) -> Optional[ModelType]:
-        result = await self.session.execute(select(self.model).where(self.model.id == id))
-        return result.scalar_one_or_none()
+    async def get_by_id(self, id: str, columns: Sequence[str] | None = None) -> Any:
+        if columns is None and self._can_batch():
+            return await get_loader(self.model, self.session).load(id)
+        result = await self._read(self._select(columns).where(self.model.id == id))
+        return result.scalar_one_or_none() if columns is None else result.one_or_none()
 
-    async def get_by_email(self, email: str) -> Optional[ModelType]:
-        result = await self.session.execute(select(self.model).where(self.model.email == email))
+    async def get_by_email(self, email: str) -> ModelType | None:
+        result = await self._read(select(self.model).where(self.model.email == email))
         return result.scalar_one_or_none()
 
-    async def get_all(self, skip: int = 0, limit: int = 100) -> list[ModelType]:
-        result = await self.session.execute(select(self.model).offset(skip).limit(limit))
-        return list(result.scalars().all())
+    async def get_all(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        columns: Sequence[str] | None = None,
+        filters: Sequence[Filter] = (),
+        sort: Sort | None = None,
+    ) -> list[Any]:
+        order_by = self._order_by(sort)
+        if sort is not None and sort.descending:
+            order_by = [column.desc() for column in order_by]
+        stmt = self._where(self._select(columns), filters).order_by(*order_by).offset(skip).limit(limit)
+        return self._rows(await self._read(stmt), columns)
+
+    async def get_page(
+        self,
+        limit: int = 100,
+        cursor: str | None = None,
+        columns: Sequence[str] | None = None,
+        filters: Sequence[Filter] = (),
+        sort: Sort | None = None,
+    ) -> Page:
+        order_fields = self._order_fields(sort)
+        if columns is not None:
+            # The keyset columns are needed to build the next/prev cursors.
+            columns = list(dict.fromkeys([*columns, *order_fields]))
+        stmt, direction = self._page_statement(limit, cursor, columns, filters, sort)
+        items = self._rows(await self._read(stmt), columns)
+        return self._page(items, limit, cursor, direction, order_fields)
+
+    def _page_statement(
+        self,
+        limit: int,
+        cursor: str | None,
+        columns: Sequence[str] | None,
+        filters: Sequence[Filter],
+        sort: Sort | None,
+    ) -> tuple[Select, str]:
+        # One row past the page, in walking order, tells whether more follow.
+        stmt = self._where(self._select(columns), filters)
+        order_by = self._order_by(sort)
+        direction = NEXT
+        if cursor:
+            values, direction = decode_cursor(cursor, len(order_by))
+        if self._walks_ascending(direction, sort):
+            if cursor:
+                stmt = stmt.where(tuple_(*order_by) > tuple(values))
+            stmt = stmt.order_by(*order_by)
+        else:
+            if cursor:
+                stmt = stmt.where(tuple_(*order_by) < tuple(values))
+            stmt = stmt.order_by(*(column.desc() for column in order_by))
+        return stmt.limit(limit + 1), direction
+
+    def _walks_ascending(self, direction: str, sort: Sort | None) -> bool:
+        # A descending sort walks the keyset backwards.
+        return (direction == NEXT) != (sort is not None and sort.descending)
+
+    def _page(
+        self,
+        items: list[Any],
+        limit: int,
+        cursor: str | None,
+        direction: str,
+        order_fields: Sequence[str],
+    ) -> Page:
+        has_more = len(items) > limit
+        items = items[:limit]
+        if direction != NEXT:
+            items.reverse()
+        if not items:
+            return Page(items=[], next_cursor=None, prev_cursor=None)
+
+        if direction == NEXT:
+            has_next, has_prev = has_more, cursor is not None
+        else:
+            has_next, has_prev = True, has_more
+        return Page(
+            items=items,
+            next_cursor=encode_cursor(self._order_values(items[-1], order_fields), NEXT) if has_next else None,
+            prev_cursor=encode_cursor(self._order_values(items[0], order_fields), PREV) if has_prev else None,
+        )
+
+    async def search(
+        self,
+        query: str,
+        columns: Sequence[str],
+        limit: int = 20,
+        cursor: str | None = None,
+    ) -> Page:
+        """Finds rows whose search fields match ``query``, best matches first.
+
+        Exact matches come first, then prefix matches in ``search_fields``
+        order, then substring matches. Each tier is ordered by the field
+        that serves it and pages go forward only, keyed on (tier, that
+        field, id). Pages are cached for ``search_cache_ttl`` seconds under
+        a generation that every write through the repository replaces.
+        """
+        query = query.strip().lower()
+        try:
+            generation = await self._search_generation()
+            key = self._search_cache_key(query, columns, limit, cursor, generation)
+            cached = await cache_service.get(key)
+        except RedisError as e:
+            logger.warning("Search cache lookup failed: %s", e)
+            key = cached = None
+        if cached is not None:
+            data = json.loads(cached)
+            return Page(items=data["items"], next_cursor=data["next_cursor"], prev_cursor=None)
+
+        rows = await self._search_rows(query, columns, limit, cursor)
+        next_cursor = encode_cursor(list(rows[limit - 1][-SEARCH_KEYSET_SIZE:]), NEXT) if len(rows) > limit else None
+        items = [dict(zip(columns, row[:len(columns)], strict=True)) for row in rows[:limit]]
+        if key is not None:
+            try:
+                await cache_service.set(key, {"items": items, "next_cursor": next_cursor}, self.search_cache_ttl)
+            except RedisError as e:
+                logger.warning("Search cache write failed: %s", e)
+        return Page(items=items, next_cursor=next_cursor, prev_cursor=None)
+
+    async def _search_rows(
+        self,
+        query: str,
+        columns: Sequence[str],
+        limit: int,
+        cursor: str | None,
+    ) -> list[Any]:
+        # Up to limit + 1 rows of ``columns`` followed by their keyset
+        # values. One query per tier, each ordered by its field's index and
+        # bounded by the rows still missing, so no query sorts every match.
+        start, after = 0, None
+        if cursor:
+            (start, *after), _ = decode_cursor(cursor, SEARCH_KEYSET_SIZE)
+        rows: list[Any] = []
+        for tier, (condition, field) in enumerate(self._search_tiers(query)):
+            if tier < start:
+                continue
+            # Labelled so the keyset values survive alongside a projected id.
+            stmt = select(
+                *(getattr(self.model, name) for name in columns),
+                literal(tier).label("_keyset_0"),
+                field.label("_keyset_1"),
+                self.model.id.label("_keyset_2"),
+            ).where(condition)
+            if tier == start and after is not None:
+                stmt = stmt.where(tuple_(field, self.model.id) > tuple(after))
+            stmt = stmt.order_by(field, self.model.id).limit(limit + 1 - len(rows))
+            rows.extend((await self._read(stmt)).all())
+            if len(rows) > limit:
+                break
+        return rows
+
+    def _search_tiers(self, query: str) -> list[tuple[Any, Any]]:
+        # (condition, ordering field) per tier. A row belongs to the first
+        # tier it matches, so later tiers exclude what earlier ones matched;
+        # a NULL field matches nothing.
+        fields = [func.lower(getattr(self.model, name)) for name in self.search_fields]
+        pattern = like_pattern(query)
+        matched = [or_(field.is_(None), field != query) for field in fields]
+        tiers = [(or_(*(field == query for field in fields)), fields[0])]
+        for field in fields:
+            prefix = field.like(f"{pattern}%", escape="\\")
+            tiers.append((and_(prefix, *matched), field))
+            matched.append(or_(field.is_(None), not_(prefix)))
+        if len(query) >= self.search_min_substring:
+            substring = or_(*(field.like(f"%{pattern}%", escape="\\") for field in fields))
+            tiers.append((and_(substring, *matched), fields[0]))
+        return tiers
+
+    async def stream(
+        self,
+        columns: Sequence[str],
+        batch_size: int | None = None,
+    ) -> AsyncIterator[Sequence[Any]]:
+        """Yields every row, ``batch_size`` at a time, from a server-side cursor.
+
+        Runs on a session of its own so the stream can outlive the request's
+        session, and only one batch is held in memory at a time.
+        """
+        stmt = (
+            self._select(columns)
+            .order_by(*self._order_by())
+            .execution_options(yield_per=batch_size or settings.export_batch_size, replica=True)
+        )
+        async with get_session_maker(self.session)() as session:
+            result = await session.stream(stmt)
+            async for rows in result.partitions():
+                yield rows
+
+    async def count(
+        self,
+        mode: CountMode = CountMode.exact,
+        filters: Sequence[Filter] = (),
+    ) -> int | None:
+        if mode == CountMode.none:
+            return None
+        if filters:
+            if mode == CountMode.cached:
+                return await self._count_cached(filters)
+            # Planner statistics cover the whole table only, so a filtered
+            # estimate counts matches up to filtered_count_cap instead.
+            cap = self.filtered_count_cap if mode == CountMode.estimated else None
+            return await self._count_filtered(filters, cap)
+        if mode == CountMode.estimated:
+            estimate = await self._count_estimated()
+            if estimate is not None:
+                return estimate
+        if mode == CountMode.cached:
+            return await self._count_cached()
+        return await self._count_exact()
 
     async def create(self, obj_in: dict[str, Any]) -> ModelType:
-        db_obj = self.model(**obj_in)
-        self.session.add(db_obj)
+        stmt = insert(self.model).values(**obj_in).returning(self.model)
+        db_obj = (await self._execute_write(stmt)).scalar_one()
         await self.session.commit()
-        await self.session.refresh(db_obj)
+        await self._invalidate_count()
         return db_obj
 
-    async def update(self, id: str, obj_in: dict[str, Any]) -> Optional[ModelType]:
-        stmt = update(self.model).where(self.model.id == id).values(**obj_in)
-        await self.session.execute(stmt)
+    async def update(self, id: str, obj_in: dict[str, Any]) -> ModelType | None:
+        if not obj_in:
+            return await self.get_by_id(id)
+        stmt = (
+            update(self.model)
+            .where(self.model.id == id)
+            .values(**obj_in)
+            .returning(self.model)
+            .execution_options(populate_existing=True)
+        )
+        db_obj = (await self._execute_write(stmt)).scalar_one_or_none()
         await self.session.commit()
-        return await self.get_by_id(id)
+        if db_obj is not None:
+            await self._invalidate_search()
+        return db_obj
 
     async def delete(self, id: str) -> bool:
-        stmt = delete(self.model).where(self.model.id == id)
-        await self.session.execute(stmt)
+        stmt = delete(self.model).where(self.model.id == id).returning(self.model.id)
+        deleted = (await self.session.execute(stmt)).scalar_one_or_none() is not None
         await self.session.commit()
-        return True
+        if deleted:
+            await self._invalidate_count()
+        return deleted
+
+    async def bulk_create(
+        self,
+        objs_in: list[dict[str, Any]],
+        batch_size: int | None = None,
+    ) -> list[ModelType | None]:
+        """Inserts rows in multi-row INSERTs, one commit per batch.
+
+        Returns one entry per input; None where the row conflicted with an
+        existing unique value (or an earlier row of the same request).
+        """
+        batch_size = batch_size or settings.bulk_batch_size
+        results: list[ModelType | None] = []
+        for start in range(0, len(objs_in), batch_size):
+            chunk = objs_in[start:start + batch_size]
+            stmt = self._insert_ignoring_conflicts().values(chunk).returning(self.model)
+            created = {
+                db_obj.id: db_obj
+                for db_obj in (await self._execute_write(stmt)).scalars().all()
+            }
+            await self.session.commit()
+            results.extend(created.get(obj["id"]) for obj in chunk)
+        if any(result is not None for result in results):
+            await self._invalidate_count()
+        return results
+
+    async def bulk_update(
+        self,
+        objs_in: list[dict[str, Any]],
+        batch_size: int | None = None,
+    ) -> list[Any]:
+        """Updates rows by primary key with executemany, one commit per batch.
+
+        Each dict carries ``id`` plus the columns to change. Returns the
+        updated row, None for unknown ids, or the DuplicateError raised for
+        a row whose new unique value is taken.
+        """
+        batch_size = batch_size or settings.bulk_batch_size
+        results: list[Any] = []
+        for start in range(0, len(objs_in), batch_size):
+            chunk = objs_in[start:start + batch_size]
+            ids = [obj["id"] for obj in chunk]
+            # Bulk UPDATE by primary key requires every id to match a row.
+            existing = set(
+                (await self.session.execute(select(self.model.id).where(self.model.id.in_(ids))))
+                .scalars()
+                .all()
+            )
+            try:
+                matched = [obj for obj in chunk if obj["id"] in existing and len(obj) > 1]
+                if matched:
+                    await self._execute_write(update(self.model), matched)
+            except (DuplicateError, StaleDataError):
+                # Isolate conflicting or concurrently deleted rows by retrying
+                # them one by one.
+                await self.session.rollback()
+                results.extend([await self._update_or_error(obj) for obj in chunk])
+                continue
+            stmt = (
+                select(self.model)
+                .where(self.model.id.in_(ids))
+                .execution_options(populate_existing=True)
+            )
+            updated = {
+                db_obj.id: db_obj
+                for db_obj in (await self.session.execute(stmt)).scalars().all()
+            }
+            await self.session.commit()
+            results.extend(updated.get(obj_id) for obj_id in ids)
+        if any(isinstance(result, self.model) for result in results):
+            await self._invalidate_search()
+        return results
+
+    async def bulk_delete(self, ids: list[str], batch_size: int | None = None) -> list[bool]:
+        batch_size = batch_size or settings.bulk_batch_size
+        results: list[bool] = []
+        for start in range(0, len(ids), batch_size):
+            chunk = ids[start:start + batch_size]
+            stmt = delete(self.model).where(self.model.id.in_(chunk)).returning(self.model.id)
+            deleted = set((await self.session.execute(stmt)).scalars().all())
+            await self.session.commit()
+            results.extend(obj_id in deleted for obj_id in chunk)
+        if any(results):
+            await self._invalidate_count()
+        return results
+
+    async def _update_or_error(self, obj_in: dict[str, Any]) -> Any:
+        values = {key: value for key, value in obj_in.items() if key != "id"}
+        try:
+            db_obj = await self.update(obj_in["id"], values)
+        except DuplicateError as e:
+            return e
+        if db_obj is not None and db_obj in self.session:
+            # Detached so a later row's rollback cannot expire it.
+            self.session.expunge(db_obj)
+        return db_obj
+
+    def _insert_ignoring_conflicts(self, model: Any = None) -> Any:
+        model = model or self.model
+        dialect = self.session.get_bind().dialect.name
+        if dialect == "postgresql":
+            return postgresql.insert(model).on_conflict_do_nothing()
+        if dialect == "sqlite":
+            return sqlite.insert(model).on_conflict_do_nothing()
+        return insert(model)
+
+    async def _emails(self, ids: list[str]) -> dict[str, str]:
+        if not ids:
+            return {}
+        rows = await self.session.execute(
+            select(self.model.id, self.model.email).where(self.model.id.in_(ids))
+        )
+        return {row.id: row.email for row in rows}
 
     async def exists(self, **filters: Any) -> bool:
         stmt = select(self.model)
         for key, value in filters.items():
             stmt = stmt.where(getattr(self.model, key) == value)
-        result = await self.session.execute(stmt)
+        result = await self._read(stmt)
         return result.scalar_one_or_none() is not None
 
+    async def _count_exact(self) -> int:
+        result = await self._read(select(func.count()).select_from(self.model))
+        return result.scalar_one()
+
+    async def _count_estimated(self) -> int | None:
+        # Planner statistics are only available on Postgres; reltuples is -1
+        # until the table has been analyzed.
+        if self.session.get_bind().dialect.name != "postgresql":
+            return None
+        result = await self._read(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:table AS regclass)"),
+            {"table": self.model.__tablename__},
+        )
+        estimate = result.scalar_one_or_none()
+        return estimate if estimate is not None and estimate >= 0 else None
+
+    async def _count_filtered(self, filters: Sequence[Filter], cap: int | None = None) -> int:
+        matches = self._where(select(self.model.id), filters)
+        if cap is not None:
+            matches = matches.limit(cap)
+        result = await self._read(select(func.count()).select_from(matches.subquery()))
+        return result.scalar_one()
+
+    async def _count_cached(self, filters: Sequence[Filter] = ()) -> int:
+        # Writes only invalidate the unfiltered total; filtered totals are
+        # refreshed when their count_cache_ttl runs out.
+        key = self._count_cache_key(filters)
+        count_rows = self._count_exact if not filters else lambda: self._count_filtered(filters)
+        try:
+            cached = await cache_service.get(key)
+        except RedisError as e:
+            logger.warning("Count cache lookup failed: %s", e)
+            return await count_rows()
+        if cached is not None:
+            return int(cached)
+
+        total = await count_rows()
+        try:
+            await cache_service.set(key, total, self.count_cache_ttl)
+        except RedisError as e:
+            logger.warning("Count cache write failed: %s", e)
+        return total
+
+    async def _invalidate_count(self) -> None:
+        # Search pages go too, in the same round trip.
+        try:
+            await cache_service.delete_many([self._count_cache_key(), self._search_generation_key()])
+        except RedisError as e:
+            logger.warning("Count cache invalidation failed: %s", e)
+
+    async def _invalidate_search(self) -> None:
+        try:
+            await cache_service.delete(self._search_generation_key())
+        except RedisError as e:
+            logger.warning("Search cache invalidation failed: %s", e)
+
+    async def _search_generation(self) -> str:
+        # Deleting the generation orphans every cached page of the table;
+        # the next search starts a new one.
+        key = self._search_generation_key()
+        generation = await cache_service.get(key)
+        if generation is None:
+            generation = uuid.uuid4().hex
+            if not await cache_service.set(key, generation, nx=True):
+                generation = await cache_service.get(key) or generation
+        return generation
+
+    def _count_cache_key(self, filters: Sequence[Filter] = ()) -> str:
+        if not filters:
+            return f"count:{self.model.__tablename__}"
+        raw = json.dumps(sorted([field, op.value, value] for field, op, value in filters))
+        digest = hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+        return f"count:{self.model.__tablename__}:{digest}"
+
+    def _search_cache_key(
+        self,
+        query: str,
+        columns: Sequence[str],
+        limit: int,
+        cursor: str | None,
+        generation: str,
+    ) -> str:
+        raw = json.dumps([query, list(columns), limit, cursor])
+        digest = hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+        return f"search:{self.model.__tablename__}:{generation}:{digest}"
+
+    def _search_generation_key(self) -> str:
+        return f"search:{self.model.__tablename__}:generation"
+
+    async def release(self) -> None:
+        """Ends the session's implicit read-only transaction, if any.
+
+        Reads in a request share one transaction, and so one snapshot and
+        one pooled connection, until the session closes. Call this before
+        slow work that needs no database, such as hashing or sending email,
+        so the connection goes back to the pool meanwhile. Explicit
+        transactions and pending changes are left alone.
+        """
+        transaction = self.session.sync_session.get_transaction()
+        if (
+            transaction is None
+            or transaction.origin is not SessionTransactionOrigin.AUTOBEGIN
+            or self.session.in_nested_transaction()
+            or self.session.new
+            or self.session.dirty
+            or self.session.deleted
+        ):
+            return
+        await self.session.commit()
+
+    async def _read(self, stmt: Any, params: dict[str, Any] | None = None) -> Any:
+        # Reads may be served by a replica; the session keeps them on the
+        # primary once it has written or the client was pinned after a write.
+        return await self.session.execute(stmt.execution_options(replica=True), params)
+
+    def _can_batch(self) -> bool:
+        # Batched lookups run on their own session and may hit a replica, so
+        # they are skipped inside transactions and for primary-pinned reads.
+        return not self.session.in_transaction() and not reads_from_primary(self.session)
+
+    def _select(self, columns: Sequence[str] | None = None) -> Select:
+        # A column projection returns plain rows instead of ORM entities,
+        # skipping identity-map bookkeeping and unneeded columns.
+        if columns is None:
+            return select(self.model)
+        return select(*(getattr(self.model, name) for name in columns))
+
+    def _rows(self, result: Any, columns: Sequence[str] | None) -> list[Any]:
+        return list(result.scalars().all() if columns is None else result.all())
+
+    def _where(self, stmt: Select, filters: Sequence[Filter]) -> Select:
+        for field, op, value in filters:
+            if op not in self.filter_fields.get(field, ()):
+                allowed = [f"{name}:{op.value}" for name, ops in self.filter_fields.items() for op in ops]
+                message = f"Unsupported filter {field}:{op.value}. Allowed: {', '.join(allowed)}"
+                raise InvalidQueryError(message)
+            column = getattr(self.model, field)
+            if op == FilterOp.eq:
+                # A partial index only covers the values its predicate selects.
+                values = indexed_values(self.model.__table__, field)
+                if values is not None and coerce_value(column, value) not in values:
+                    allowed = ", ".join(str(v).lower() if isinstance(v, bool) else str(v) for v in values)
+                    message = f"Unsupported filter {field}:eq:{value}. Allowed values: {allowed}"
+                    raise InvalidQueryError(message)
+            elif op == FilterOp.contains and len(value) < self.search_min_substring:
+                # Like search(): trigram indexes cannot serve shorter substrings.
+                message = f"Filter {field}:contains needs at least {self.search_min_substring} characters"
+                raise InvalidQueryError(message)
+            stmt = stmt.where(filter_clause(column, op, value))
+        return stmt
+
+    def _order_fields(self, sort: Sort | None = None) -> list[str]:
+        if sort is None:
+            return list(self.order_columns)
+        if sort.field not in self.sort_fields:
+            message = f"Unsupported sort {sort.field}. Allowed: {', '.join(self.sort_fields)}"
+            raise InvalidQueryError(message)
+        # id breaks ties so the keyset stays unique.
+        return list(dict.fromkeys([sort.field, "id"]))
+
+    def _order_by(self, sort: Sort | None = None) -> list[Any]:
+        return [getattr(self.model, name) for name in self._order_fields(sort)]
+
+    def _order_values(self, item: Any, fields: Sequence[str] | None = None) -> list[Any]:
+        return [getattr(item, name) for name in fields or self.order_columns]
+
+    async def _execute_write(self, stmt: Any, params: Any = None) -> Any:
+        try:
+            return await self.session.execute(stmt, params)
+        except IntegrityError as e:
+            await self.session.rollback()
+            constraint = unique_violation(e)
+            if constraint is not None:
+                for field in self.unique_fields:
+                    if field in constraint:
+                        message = f"{field.capitalize()} already registered"
+                        raise DuplicateError(message) from e
+            raise
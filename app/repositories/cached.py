@@ -0,0 +1,265 @@
+import hashlib
+import json
+import logging
+import time
+from collections.abc import Sequence
+from datetime import datetime
+from functools import cache
+from typing import Any
+
+from redis.exceptions import RedisError
+from sqlalchemy import DateTime, Table
+
+from app.core.cache import cache_service
+from app.core.metrics import Histogram
+from app.repositories.base import BaseRepository, ModelType
+
+logger = logging.getLogger(__name__)
+
+# Seconds; how old a cached row was when it was served.
+STALENESS_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600)
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.invalidations = 0
+        self.staleness = Histogram(STALENESS_BUCKETS)
+
+    def snapshot(self) -> dict[str, Any]:
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+            "errors": self.errors,
+            "invalidations": self.invalidations,
+            "staleness_seconds": self.staleness.snapshot(),
+        }
+
+
+_stats: dict[str, CacheStats] = {}
+
+
+def repository_cache_stats() -> dict[str, Any]:
+    return {table: stats.snapshot() for table, stats in _stats.items()}
+
+
+@cache
+def _schema_version(table: Table, uncached: tuple[str, ...]) -> str:
+    # Keys change whenever the cached columns do, so a deploy never
+    # deserializes entries written by an older schema.
+    signature = ",".join(
+        f"{column.name}:{column.type}" for column in table.columns if column.key not in uncached
+    )
+    return hashlib.sha256(signature.encode("utf-8")).hexdigest()[:8]
+
+
+class CachedRepository(BaseRepository[ModelType]):
+    """Read-through Redis cache for ``get_by_id`` and ``get_by_email``.
+
+    Writes store the row they return (or a miss, for deletes) instead of
+    only deleting keys, so the next lookup neither hits Postgres nor reads a
+    lagging replica. Read-through fills use SET NX so a slow reader cannot
+    overwrite a newer value written by a concurrent update. Columns in
+    ``uncached_fields`` are never written to the cache and are None on cached
+    rows; login reads the password hash with ``get_by_email_uncached``.
+    """
+
+    cache_ttl: int = 300
+    uncached_fields: tuple[str, ...] = ("password",)
+    # Misses are cached briefly so unknown ids and emails stay off Postgres.
+    negative_cache_ttl: int = 30
+
+    @property
+    def cache_stats(self) -> CacheStats:
+        return _stats.setdefault(self.model.__tablename__, CacheStats())
+
+    async def get_by_id(self, id: str, columns: Sequence[str] | None = None) -> Any:
+        # Cached rows satisfy any projection that leaves out uncached fields.
+        if columns is not None and not set(columns).isdisjoint(self.uncached_fields):
+            return await super().get_by_id(id, columns)
+        return await self._cached_lookup("id", id)
+
+    async def get_by_email(self, email: str) -> ModelType | None:
+        return await self._cached_lookup("email", email)
+
+    async def get_by_email_uncached(self, email: str) -> ModelType | None:
+        """Reads the whole row, uncached fields included, from the database."""
+        return await self._fetch("email", email)
+
+    async def create(self, obj_in: dict[str, Any]) -> ModelType:
+        db_obj = await super().create(obj_in)
+        await self._store_row(db_obj)
+        return db_obj
+
+    async def update(self, id: str, obj_in: dict[str, Any]) -> ModelType | None:
+        previous = await self._cached_email(id) if "email" in obj_in else None
+        db_obj = await super().update(id, obj_in)
+        if db_obj is not None:
+            await self._store_row(db_obj)
+        if previous is not None and (db_obj is None or previous != db_obj.email):
+            await self._store_miss("email", previous)
+        return db_obj
+
+    async def delete(self, id: str) -> bool:
+        previous = await self._cached_email(id)
+        deleted = await super().delete(id)
+        await self._store_misses([("id", id)] + ([("email", previous)] if previous is not None else []))
+        return deleted
+
+    async def bulk_create(
+        self,
+        objs_in: list[dict[str, Any]],
+        batch_size: int | None = None,
+    ) -> list[ModelType | None]:
+        results = await super().bulk_create(objs_in, batch_size)
+        await self._store_rows([db_obj for db_obj in results if db_obj is not None])
+        return results
+
+    async def bulk_update(
+        self,
+        objs_in: list[dict[str, Any]],
+        batch_size: int | None = None,
+    ) -> list[Any]:
+        previous = await self._emails([obj["id"] for obj in objs_in if "email" in obj])
+        results = await super().bulk_update(objs_in, batch_size)
+        updated = [db_obj for db_obj in results if isinstance(db_obj, self.model)]
+        await self._store_rows(updated)
+        current = {db_obj.id: db_obj.email for db_obj in updated}
+        await self._store_misses(
+            [("email", email) for obj_id, email in previous.items() if current.get(obj_id) != email]
+        )
+        return results
+
+    async def bulk_delete(self, ids: list[str], batch_size: int | None = None) -> list[bool]:
+        previous = await self._emails(ids)
+        results = await super().bulk_delete(ids, batch_size)
+        await self._store_misses(
+            [("id", obj_id) for obj_id in ids] + [("email", email) for email in previous.values()]
+        )
+        return results
+
+    async def sync_cache(self, db_objs: list[ModelType]) -> None:
+        """Refreshes entries for rows written outside this repository."""
+        await self._store_rows(db_objs)
+        await self._invalidate_count()
+
+    async def _cached_lookup(self, field: str, value: str) -> ModelType | None:
+        stats = self.cache_stats
+        key = self._cache_key(field, value)
+        try:
+            cached = await cache_service.get(key)
+        except RedisError as e:
+            logger.warning("Repository cache lookup failed: %s", e)
+            stats.errors += 1
+            cached = None
+
+        if cached is not None:
+            entry = json.loads(cached)
+            stats.staleness.observe(max(time.time() - entry["at"], 0.0))
+            if entry["row"] is None:
+                stats.negative_hits += 1
+                return None
+            stats.hits += 1
+            return self._deserialize(entry["row"])
+
+        stats.misses += 1
+        db_obj = await self._fetch(field, value)
+        if db_obj is None:
+            await self._write(key, None, self.negative_cache_ttl, nx=True)
+        else:
+            # Both keys, so an email key is never cached without the id key
+            # that update() and delete() read the old email back from.
+            await self._write_many(self._entries([db_obj]), self.cache_ttl, nx=True)
+        return db_obj
+
+    async def _cached_email(self, row_id: str) -> str | None:
+        """The email of the cached row ``row_id``, without touching the database.
+
+        A row's email key is only ever cached along with its id key, so when
+        there is no cached row there is no email key to retire either.
+        """
+        try:
+            cached = await cache_service.get(self._cache_key("id", row_id))
+        except RedisError as e:
+            logger.warning("Repository cache lookup failed: %s", e)
+            self.cache_stats.errors += 1
+            return None
+        row = json.loads(cached)["row"] if cached is not None else None
+        return row["email"] if row is not None else None
+
+    async def _fetch(self, field: str, value: str) -> ModelType | None:
+        # Whole rows are fetched whatever projection the caller asked for,
+        # so concurrent misses by id share one batched loader query.
+        if field == "id":
+            return await super().get_by_id(value)
+        return await super().get_by_email(value)
+
+    async def _store_row(self, db_obj: ModelType) -> None:
+        await self._store_rows([db_obj])
+
+    async def _store_miss(self, field: str, value: str) -> None:
+        await self._store_misses([(field, value)])
+
+    async def _store_rows(self, db_objs: list[ModelType]) -> None:
+        await self._write_many(self._entries(db_objs), self.cache_ttl)
+
+    def _entries(self, db_objs: list[ModelType]) -> dict[str, Any]:
+        entries = {}
+        for db_obj in db_objs:
+            entry = {"row": self._serialize(db_obj), "at": time.time()}
+            entries[self._cache_key("id", db_obj.id)] = entry
+            entries[self._cache_key("email", db_obj.email)] = entry
+        return entries
+
+    async def _store_misses(self, lookups: list[tuple[str, str]]) -> None:
+        entry = {"row": None, "at": time.time()}
+        await self._write_many(
+            {self._cache_key(field, value): entry for field, value in lookups},
+            self.negative_cache_ttl,
+        )
+
+    async def _write_many(self, entries: dict[str, Any], ttl: int, nx: bool = False) -> None:
+        if not entries:
+            return
+        if not nx:
+            # Read-through fills (nx) replace nothing.
+            self.cache_stats.invalidations += len(entries)
+        try:
+            await cache_service.set_many(entries, ttl, nx=nx)
+        except RedisError as e:
+            # A failed write-through leaves the old entries until their TTL.
+            logger.warning("Repository cache write failed for %s keys: %s", len(entries), e)
+            self.cache_stats.errors += 1
+
+    async def _write(self, key: str, row: dict[str, Any] | None, ttl: int, nx: bool = False) -> None:
+        try:
+            await cache_service.set(key, {"row": row, "at": time.time()}, ttl, nx=nx)
+        except RedisError as e:
+            logger.warning("Repository cache write failed for %s: %s", key, e)
+            self.cache_stats.errors += 1
+
+    def _cache_key(self, field: str, value: str) -> str:
+        table = self.model.__table__
+        return f"repo:{table.name}:{_schema_version(table, self.uncached_fields)}:{field}:{value}"
+
+    def _serialize(self, db_obj: ModelType) -> dict[str, Any]:
+        data = {}
+        for column in self.model.__table__.columns:
+            if column.key in self.uncached_fields:
+                continue
+            value = getattr(db_obj, column.key)
+            data[column.key] = value.isoformat() if isinstance(value, datetime) else value
+        return data
+
+    def _deserialize(self, data: dict[str, Any]) -> ModelType:
+        data = dict(data)
+        for column in self.model.__table__.columns:
+            if isinstance(column.type, DateTime) and isinstance(data.get(column.key), str):
+                data[column.key] = datetime.fromisoformat(data[column.key])
+        return self.model(**data)
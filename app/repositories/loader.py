@@ -0,0 +1,118 @@
+import asyncio
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.core.database import get_session_maker
+from app.core.ids import normalize_id
+
+
+class BatchLoader:
+    """Coalesces concurrent by-id lookups into one ``WHERE id IN`` query.
+
+    Keys requested during the same event-loop tick, from any request on this
+    worker, are fetched together on a session of their own. Identical keys,
+    whether queued or already in flight, share one result. Every caller gets
+    its own instance, so no ORM object is shared between requests.
+    """
+
+    def __init__(self, model: Any, session_maker: async_sessionmaker, max_batch_size: int):
+        self.model = model
+        self.session_maker = session_maker
+        self.max_batch_size = max_batch_size
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._queued: dict[str, asyncio.Future] = {}
+        self._in_flight: dict[str, asyncio.Future] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._loads = 0
+        self._coalesced = 0
+        self._batches = 0
+        self._max_batch = 0
+
+    async def load(self, key: str) -> Any:
+        # Rows come back keyed by canonical id; anything else cannot match.
+        key = normalize_id(key)
+        if key is None:
+            return None
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Futures are bound to a loop; start over on a new one.
+            self._loop = loop
+            self._queued, self._in_flight = {}, {}
+
+        self._loads += 1
+        future = self._in_flight.get(key) or self._queued.get(key)
+        if future is not None:
+            self._coalesced += 1
+        else:
+            future = loop.create_future()
+            if not self._queued:
+                loop.call_soon(self._dispatch)
+            self._queued[key] = future
+            if len(self._queued) >= self.max_batch_size:
+                self._dispatch()
+
+        # Shielded so one cancelled caller does not fail the others.
+        data = await asyncio.shield(future)
+        return self.model(**data) if data is not None else None
+
+    def _dispatch(self) -> None:
+        if not self._queued:
+            return
+        batch, self._queued = self._queued, {}
+        self._in_flight.update(batch)
+        task = asyncio.get_running_loop().create_task(self._fetch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _fetch(self, batch: dict[str, asyncio.Future]) -> None:
+        self._batches += 1
+        self._max_batch = max(self._max_batch, len(batch))
+        try:
+            async with self.session_maker() as session:
+                stmt = (
+                    select(*self.model.__table__.columns)
+                    .where(self.model.id.in_(list(batch)))
+                    .execution_options(replica=True)
+                )
+                rows = {row["id"]: dict(row) for row in (await session.execute(stmt)).mappings()}
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+                    # Retrieved here so abandoned futures do not log warnings.
+                    future.exception()
+        else:
+            for key, future in batch.items():
+                if not future.done():
+                    future.set_result(rows.get(key))
+        finally:
+            for key, future in batch.items():
+                if self._in_flight.get(key) is future:
+                    del self._in_flight[key]
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "loads": self._loads,
+            "coalesced": self._coalesced,
+            "batches": self._batches,
+            "avg_batch_size": (self._loads - self._coalesced) / self._batches if self._batches else 0.0,
+            "max_batch_size": self._max_batch,
+        }
+
+
+_loaders: dict[tuple[int, str], BatchLoader] = {}
+
+
+def get_loader(model: Any, session: AsyncSession) -> BatchLoader:
+    session_maker = get_session_maker(session)
+    key = (id(session_maker), model.__tablename__)
+    if key not in _loaders:
+        _loaders[key] = BatchLoader(model, session_maker, settings.loader_max_batch_size)
+    return _loaders[key]
+
+
+def loader_stats() -> dict[str, Any]:
+    return {table: loader.stats() for (_, table), loader in _loaders.items()}
@@ -0,0 +1,374 @@
+import asyncio
+import copy
+import heapq
+from collections.abc import AsyncIterator, Awaitable, Callable, Sequence
+from contextlib import asynccontextmanager
+from itertools import islice
+from typing import Any
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.common.filtering import Filter, Sort
+from app.common.pagination import Page
+from app.core.config import settings
+from app.core.database import ShardSet
+from app.repositories.base import SEARCH_KEYSET_SIZE, BaseRepository, ModelType
+
+ShardCall = Callable[[Any], Awaitable[Any]]
+
+
+class ShardedRepository(BaseRepository[ModelType]):
+    """Spreads rows over the databases in ``shards`` by a hash of their id.
+
+    Reads and writes by id go to the owning shard only. ``directory``, a
+    table on the main database (``self.session``) with ``email``,
+    ``user_id`` and ``shard`` columns, maps every email to its shard: email
+    lookups go straight to one shard, and claiming the email there first
+    keeps emails unique across shards. Lists, pages, counts and searches
+    query all shards in parallel and merge the results in keyset order.
+    The merge compares text keys (emails, search fields) by code point, so
+    shards must sort text the same way: ``check_shard_collation`` refuses
+    to start on PostgreSQL shards without ``LC_COLLATE 'C'``.
+
+    Each shard is worked on through a copy of the repository bound to a
+    session of that shard, so BaseRepository's queries run unchanged. With
+    ``shards=None`` every method is BaseRepository's.
+    """
+
+    directory: Any = None
+
+    def __init__(self, model: type[ModelType], session: AsyncSession, shards: ShardSet | None = None):
+        super().__init__(model, session)
+        self.shards = shards
+
+    @asynccontextmanager
+    async def _on_shard(self, shard: int) -> AsyncIterator[Any]:
+        async with self.shards.session_makers[shard]() as session:
+            repo = copy.copy(self)
+            repo.session = session
+            repo.shards = None
+            yield repo
+
+    async def _on_shards(self, calls: dict[int, ShardCall]) -> dict[int, Any]:
+        async def run(shard: int, call: ShardCall) -> Any:
+            async with self._on_shard(shard) as repo:
+                return await call(repo)
+
+        results = await asyncio.gather(*(run(shard, call) for shard, call in calls.items()))
+        return dict(zip(calls, results, strict=True))
+
+    async def _fan_out(self, call: ShardCall) -> list[Any]:
+        return list((await self._on_shards(dict.fromkeys(range(len(self.shards)), call))).values())
+
+    @asynccontextmanager
+    async def _session_for(self, row_id: str) -> AsyncIterator[AsyncSession | None]:
+        """The session holding the row ``row_id``, or None if no shard can."""
+        if self.shards is None:
+            yield self.session
+            return
+        shard = self.shards.shard_for(row_id)
+        if shard is None:
+            yield None
+            return
+        async with self._on_shard(shard) as repo:
+            yield repo.session
+
+    # Calls on a shard copy use super(ShardedRepository, repo) where a
+    # subclass layer (the cache) overrides the method, so it runs once, on
+    # the sharded repository, rather than again for every shard.
+
+    async def get_by_id(self, id: str, columns: Sequence[str] | None = None) -> Any:
+        if self.shards is None:
+            return await super().get_by_id(id, columns)
+        shard = self.shards.shard_for(id)
+        if shard is None:
+            return None
+        async with self._on_shard(shard) as repo:
+            return await super(ShardedRepository, repo).get_by_id(id, columns)
+
+    async def get_by_email(self, email: str) -> ModelType | None:
+        if self.shards is None:
+            return await super().get_by_email(email)
+        entry = (await self._read(
+            select(self.directory.user_id, self.directory.shard).where(self.directory.email == email)
+        )).one_or_none()
+        if entry is None:
+            return None
+        async with self._on_shard(entry.shard) as repo:
+            db_obj = await super(ShardedRepository, repo).get_by_id(entry.user_id)
+        # An entry can briefly outlive its row; see delete().
+        return db_obj if db_obj is not None and db_obj.email == email else None
+
+    async def exists(self, **filters: Any) -> bool:
+        if self.shards is None:
+            return await super().exists(**filters)
+        return any(await self._fan_out(lambda repo: repo.exists(**filters)))
+
+    async def get_all(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        columns: Sequence[str] | None = None,
+        filters: Sequence[Filter] = (),
+        sort: Sort | None = None,
+    ) -> list[Any]:
+        if self.shards is None:
+            return await super().get_all(skip, limit, columns, filters, sort)
+        order_fields = self._order_fields(sort)
+        if columns is not None:
+            columns = list(dict.fromkeys([*columns, *order_fields]))
+        # Any shard may hold the whole window, so each returns all of it.
+        results = await self._fan_out(lambda repo: repo.get_all(0, skip + limit, columns, filters, sort))
+        merged = heapq.merge(
+            *results,
+            key=lambda item: self._order_values(item, order_fields),
+            reverse=sort is not None and sort.descending,
+        )
+        return list(islice(merged, skip, skip + limit))
+
+    async def get_page(
+        self,
+        limit: int = 100,
+        cursor: str | None = None,
+        columns: Sequence[str] | None = None,
+        filters: Sequence[Filter] = (),
+        sort: Sort | None = None,
+    ) -> Page:
+        if self.shards is None:
+            return await super().get_page(limit, cursor, columns, filters, sort)
+        order_fields = self._order_fields(sort)
+        if columns is not None:
+            columns = list(dict.fromkeys([*columns, *order_fields]))
+
+        async def fetch(repo: Any) -> tuple[list[Any], str]:
+            stmt, direction = repo._page_statement(limit, cursor, columns, filters, sort)  # noqa: SLF001
+            return repo._rows(await repo._read(stmt), columns), direction  # noqa: SLF001
+
+        results = await self._fan_out(fetch)
+        direction = results[0][1]
+        # Every shard answers in walking order, so the first limit + 1 rows
+        # of the merge are the page plus its has-more probe.
+        merged = heapq.merge(
+            *(items for items, _ in results),
+            key=lambda item: self._order_values(item, order_fields),
+            reverse=not self._walks_ascending(direction, sort),
+        )
+        return self._page(list(islice(merged, limit + 1)), limit, cursor, direction, order_fields)
+
+    async def _search_rows(
+        self,
+        query: str,
+        columns: Sequence[str],
+        limit: int,
+        cursor: str | None,
+    ) -> list[Any]:
+        if self.shards is None:
+            return await super()._search_rows(query, columns, limit, cursor)
+        results = await self._fan_out(lambda repo: repo._search_rows(query, columns, limit, cursor))  # noqa: SLF001
+        merged = heapq.merge(*results, key=lambda row: tuple(row[-SEARCH_KEYSET_SIZE:]))
+        return list(islice(merged, limit + 1))
+
+    async def stream(
+        self,
+        columns: Sequence[str],
+        batch_size: int | None = None,
+    ) -> AsyncIterator[Sequence[Any]]:
+        if self.shards is None:
+            async for rows in super().stream(columns, batch_size):
+                yield rows
+            return
+        # One shard after another: rows are ordered within a shard only.
+        for shard in range(len(self.shards)):
+            async with self._on_shard(shard) as repo:
+                async for rows in repo.stream(columns, batch_size):
+                    yield rows
+
+    async def _count_filtered(self, filters: Sequence[Filter], cap: int | None = None) -> int:
+        if self.shards is None:
+            return await super()._count_filtered(filters, cap)
+        total = sum(await self._fan_out(lambda repo: repo._count_filtered(filters, cap)))  # noqa: SLF001
+        return total if cap is None else min(total, cap)
+
+    async def _count_exact(self) -> int:
+        if self.shards is None:
+            return await super()._count_exact()
+        return sum(await self._fan_out(lambda repo: repo._count_exact()))  # noqa: SLF001
+
+    async def _count_estimated(self) -> int | None:
+        if self.shards is None:
+            return await super()._count_estimated()
+        estimates = await self._fan_out(lambda repo: repo._count_estimated())  # noqa: SLF001
+        return None if None in estimates else sum(estimates)
+
+    async def create(self, obj_in: dict[str, Any]) -> ModelType:
+        if self.shards is None:
+            return await super().create(obj_in)
+        shard = self.shards.shard_for(obj_in["id"])
+        await self._execute_write(
+            insert(self.directory).values(email=obj_in["email"], user_id=obj_in["id"], shard=shard)
+        )
+        await self.session.commit()
+        try:
+            async with self._on_shard(shard) as repo:
+                return await super(ShardedRepository, repo).create(obj_in)
+        except Exception:
+            await self._release_emails([obj_in["id"]])
+            raise
+
+    async def update(self, id: str, obj_in: dict[str, Any]) -> ModelType | None:
+        if self.shards is None:
+            return await super().update(id, obj_in)
+        shard = self.shards.shard_for(id)
+        if shard is None:
+            return None
+        previous = None
+        if "email" in obj_in:
+            previous = (await self.session.execute(
+                select(self.directory.email).where(self.directory.user_id == id)
+            )).scalar_one_or_none()
+            if previous is None:
+                return None
+            if previous == obj_in["email"]:
+                previous = None
+            else:
+                # Claimed before the row changes, like in create().
+                await self._move_email(id, obj_in["email"])
+        try:
+            async with self._on_shard(shard) as repo:
+                db_obj = await super(ShardedRepository, repo).update(id, obj_in)
+        except Exception:
+            if previous is not None:
+                await self._move_email(id, previous)
+            raise
+        if db_obj is None and previous is not None:
+            await self._move_email(id, previous)
+        return db_obj
+
+    async def delete(self, id: str) -> bool:
+        if self.shards is None:
+            return await super().delete(id)
+        shard = self.shards.shard_for(id)
+        if shard is None:
+            return False
+        # The row goes first: an entry left behind by a crash only blocks
+        # its email, while a row without an entry could be registered twice.
+        async with self._on_shard(shard) as repo:
+            deleted = await super(ShardedRepository, repo).delete(id)
+        if deleted:
+            await self._release_emails([id])
+        return deleted
+
+    async def bulk_create(
+        self,
+        objs_in: list[dict[str, Any]],
+        batch_size: int | None = None,
+    ) -> list[ModelType | None]:
+        if self.shards is None:
+            return await super().bulk_create(objs_in, batch_size)
+        batch_size = batch_size or settings.bulk_batch_size
+        claims = [
+            {"email": obj["email"], "user_id": obj["id"], "shard": self.shards.shard_for(obj["id"])}
+            for obj in objs_in
+        ]
+        claimed: set[str] = set()
+        for start in range(0, len(claims), batch_size):
+            stmt = (
+                self._insert_ignoring_conflicts(self.directory)
+                .values(claims[start:start + batch_size])
+                .returning(self.directory.user_id)
+            )
+            claimed.update((await self.session.execute(stmt)).scalars().all())
+            await self.session.commit()
+
+        groups = self._group_by_shard([obj["id"] for obj in objs_in if obj["id"] in claimed])
+        results = await self._on_shards({
+            shard: lambda repo, ids=set(ids): super(ShardedRepository, repo).bulk_create(  # noqa: UP008
+                [obj for obj in objs_in if obj["id"] in ids], batch_size
+            )
+            for shard, ids in groups.items()
+        })
+        created = {
+            db_obj.id: db_obj
+            for shard_results in results.values()
+            for db_obj in shard_results
+            if db_obj is not None
+        }
+        await self._release_emails([user_id for user_id in claimed if user_id not in created])
+        return [created.get(obj["id"]) for obj in objs_in]
+
+    async def bulk_update(
+        self,
+        objs_in: list[dict[str, Any]],
+        batch_size: int | None = None,
+    ) -> list[Any]:
+        if self.shards is None:
+            return await super().bulk_update(objs_in, batch_size)
+        results: dict[int, Any] = {}
+        groups: dict[int, list[int]] = {}
+        for i, obj in enumerate(objs_in):
+            shard = self.shards.shard_for(obj["id"])
+            if shard is None:
+                results[i] = None
+            elif "email" in obj:
+                # Email changes move directory entries, one row at a time.
+                results[i] = await self._update_or_error(obj)
+            else:
+                groups.setdefault(shard, []).append(i)
+
+        updated = await self._on_shards({
+            shard: lambda repo, indexes=indexes: super(ShardedRepository, repo).bulk_update(  # noqa: UP008
+                [objs_in[i] for i in indexes], batch_size
+            )
+            for shard, indexes in groups.items()
+        })
+        for shard, indexes in groups.items():
+            results.update(zip(indexes, updated[shard], strict=True))
+        return [results[i] for i in range(len(objs_in))]
+
+    async def bulk_delete(self, ids: list[str], batch_size: int | None = None) -> list[bool]:
+        if self.shards is None:
+            return await super().bulk_delete(ids, batch_size)
+        groups = self._group_by_shard(ids)
+        deleted = await self._on_shards({
+            shard: lambda repo, chunk=chunk: super(ShardedRepository, repo).bulk_delete(chunk, batch_size)  # noqa: UP008
+            for shard, chunk in groups.items()
+        })
+        gone = {
+            user_id
+            for shard, chunk in groups.items()
+            for user_id, ok in zip(chunk, deleted[shard], strict=True)
+            if ok
+        }
+        await self._release_emails(list(gone))
+        return [user_id in gone for user_id in ids]
+
+    async def _emails(self, ids: list[str]) -> dict[str, str]:
+        if self.shards is None:
+            return await super()._emails(ids)
+        if not ids:
+            return {}
+        rows = await self.session.execute(
+            select(self.directory.user_id, self.directory.email).where(self.directory.user_id.in_(ids))
+        )
+        return {row.user_id: row.email for row in rows}
+
+    def _group_by_shard(self, ids: Sequence[str]) -> dict[int, list[str]]:
+        groups: dict[int, list[str]] = {}
+        for user_id in ids:
+            shard = self.shards.shard_for(user_id)
+            if shard is not None:
+                groups.setdefault(shard, []).append(user_id)
+        return groups
+
+    async def _move_email(self, user_id: str, email: str) -> None:
+        await self._execute_write(
+            update(self.directory).where(self.directory.user_id == user_id).values(email=email)
+        )
+        await self.session.commit()
+
+    async def _release_emails(self, ids: list[str]) -> None:
+        if not ids:
+            return
+        await self.session.execute(delete(self.directory).where(self.directory.user_id.in_(ids)))
+        await self.session.commit()
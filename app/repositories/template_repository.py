@@ -1,10 +1,20 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Optional
+from typing import ClassVar, Optional
+from app.common.filtering import FilterOp
 from app.models.template import Template
-from app.repositories.base import BaseRepository
+from app.repositories.cached import CachedRepository
 
 
-class TemplateRepository(BaseRepository[Template]):
+class TemplateRepository(CachedRepository[Template]):
+    cache_ttl = 600
+    filter_fields: ClassVar[dict[str, tuple[FilterOp, ...]]] = {
+        "email": (FilterOp.eq, FilterOp.in_, FilterOp.startswith, FilterOp.contains),
+        "name": (FilterOp.startswith, FilterOp.contains),
+        "published": (FilterOp.eq,),
+        "created_at": (FilterOp.lt, FilterOp.lte, FilterOp.gt, FilterOp.gte),
+    }
+    sort_fields = ("created_at", "email")
+
     def __init__(self, session: AsyncSession):
         super().__init__(Template, session)
 
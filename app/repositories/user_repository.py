@@ -1,13 +1,49 @@
+from typing import ClassVar
+
+from sqlalchemy import update
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Optional
+
+from app.common.filtering import FilterOp
+from app.core.database import ShardSet, shard_set
 from app.models.user import User
-from app.repositories.base import BaseRepository
+from app.models.user_shard import UserShard
+from app.repositories.cached import CachedRepository
+from app.repositories.sharded import ShardedRepository
 
 
-class UserRepository(BaseRepository[User]):
-    def __init__(self, session: AsyncSession):
-        super().__init__(User, session)
+class UserRepository(CachedRepository[User], ShardedRepository[User]):
+    filter_fields: ClassVar[dict[str, tuple[FilterOp, ...]]] = {
+        "email": (FilterOp.eq, FilterOp.in_, FilterOp.startswith, FilterOp.contains),
+        "name": (FilterOp.startswith, FilterOp.contains),
+        "created_at": (FilterOp.lt, FilterOp.lte, FilterOp.gt, FilterOp.gte),
+    }
+    sort_fields = ("created_at", "email")
+    directory = UserShard
 
-    async def get_by_email(self, email: str) -> Optional[User]:
+    def __init__(self, session: AsyncSession, shards: ShardSet | None = shard_set):
+        # Sharded when DATABASE_SHARD_URLS is set; the cache sits above the
+        # shards, so cached lookups skip them entirely.
+        super().__init__(User, session, shards)
+
+    async def get_by_email(self, email: str) -> User | None:
         return await super().get_by_email(email)
 
+
+    async def update_password_hash(self, user_id: str, old_hash: str, new_hash: str) -> bool:
+        # Conditional on the old hash so a concurrent password reset always wins.
+        stmt = (
+            update(User)
+            .where(User.id == user_id, User.password == old_hash)
+            .values(password=new_hash)
+            .returning(User)
+            .execution_options(populate_existing=True)
+        )
+        async with self._session_for(user_id) as session:
+            if session is None:
+                return False
+            db_obj = (await session.execute(stmt)).scalar_one_or_none()
+            await session.commit()
+        if db_obj is None:
+            return False
+        await self._store_row(db_obj)
+        return True
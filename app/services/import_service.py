@@ -0,0 +1,330 @@
+import codecs
+import csv
+import json
+import logging
+import time
+from collections.abc import AsyncIterator, Callable
+from dataclasses import dataclass, field
+from enum import StrEnum
+from typing import Any
+
+from fastapi import status
+from pydantic import BaseModel, EmailStr, ValidationError
+from sqlalchemy import Column, MetaData, String, Table, func, select, true
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.common.exceptions import AppException
+from app.core.config import settings
+from app.core.database import get_engine
+from app.core.ids import UUIDKey, new_id
+from app.core.security import hash_passwords_async
+from app.models.user import User
+from app.repositories.user_repository import UserRepository
+from app.services.principal_cache import principal_cache
+from app.services.revocation_service import revocation_service
+
+logger = logging.getLogger(__name__)
+
+MAX_REPORTED_ERRORS = 100
+# Longest CSV record accepted, quoted line breaks included.
+MAX_RECORD_CHARS = 64 * 1024
+
+# Session-private staging table; rows are COPYed here and then merged into
+# users in the same transaction.
+staging_table = Table(
+    "users_import",
+    MetaData(),
+    Column("id", UUIDKey, nullable=False),
+    Column("email", String(255), nullable=False),
+    Column("name", String(255)),
+    Column("password", String(255), nullable=False),
+    prefixes=["TEMPORARY"],
+)
+STAGING_COLUMNS = ["id", "email", "name", "password"]
+
+
+class ImportedUser(BaseModel):
+    email: EmailStr
+    password: str
+    name: str | None = None
+
+
+class ImportFormat(StrEnum):
+    csv = "csv"
+    ndjson = "ndjson"
+
+
+class ConflictMode(StrEnum):
+    skip = "skip"
+    update = "update"
+
+
+@dataclass
+class ImportReport:
+    rows: int = 0
+    imported: int = 0
+    skipped: int = 0
+    invalid: int = 0
+    batches: int = 0
+    elapsed_seconds: float = 0.0
+    errors: list[dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    def add_error(self, line: int, error: str) -> None:
+        self.invalid += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": error})
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "imported": self.imported,
+            "skipped": self.skipped,
+            "invalid": self.invalid,
+            "batches": self.batches,
+            "elapsed_seconds": self.elapsed_seconds,
+            "rows_per_second": self.rows_per_second,
+            "errors": self.errors,
+        }
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+
+async def read_records(
+    chunks: AsyncIterator[bytes],
+    fmt: ImportFormat,
+) -> AsyncIterator[tuple[int, Any]]:
+    """Yields (line number, record) pairs without buffering the input.
+
+    Records that cannot be parsed are yielded as the error message string.
+    """
+    read = _read_ndjson if fmt == ImportFormat.ndjson else _read_csv
+    async for line_number, record in read(_lines(chunks)):
+        yield line_number, record
+
+
+async def _read_ndjson(lines: AsyncIterator[str]) -> AsyncIterator[tuple[int, Any]]:
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as e:
+            yield line_number, f"Invalid JSON: {e}"
+
+
+async def _read_csv(lines: AsyncIterator[str]) -> AsyncIterator[tuple[int, Any]]:
+    header: list[str] | None = None
+    pending: list[str] = []
+    pending_size = 0
+    in_quotes = False
+    line_number = start = 0
+    async for line in lines:
+        line_number += 1
+        if not pending:
+            start = line_number
+        pending.append(line + "\n")
+        pending_size += len(line) + 1
+        # A quoted field may span lines; a record is complete once its
+        # quotes balance. Doubled quotes inside a field keep the parity.
+        in_quotes ^= line.count('"') % 2 == 1
+        if pending_size > MAX_RECORD_CHARS:
+            # Usually a stray quote: drop the record instead of buffering
+            # the rest of the upload into it.
+            yield start, f"Record is longer than {MAX_RECORD_CHARS} characters"
+            pending, pending_size, in_quotes = [], 0, False
+            continue
+        if in_quotes:
+            continue
+        record, pending, pending_size = pending, [], 0
+        if len(record) == 1 and not line.strip():
+            continue
+        values = next(csv.reader(record))
+        if header is None:
+            header = [name.strip() for name in values]
+        elif len(values) != len(header):
+            yield start, f"Expected {len(header)} columns, got {len(values)}"
+        else:
+            yield start, {name: value or None for name, value in zip(header, values, strict=True)}
+    if pending:
+        yield start, "Unterminated quoted field"
+
+
+class ImportService:
+    def __init__(self, user_repository: UserRepository):
+        self.user_repository = user_repository
+
+    async def import_users(
+        self,
+        records: AsyncIterator[tuple[int, Any]],
+        on_conflict: ConflictMode = ConflictMode.skip,
+        batch_size: int | None = None,
+        progress: Callable[[ImportReport], None] | None = None,
+    ) -> ImportReport:
+        """Streams validated users into the table in committed batches.
+
+        Each batch commits on its own and emails are merged with ON CONFLICT,
+        so re-running an import after a failure picks up where it stopped.
+        With ``skip``, rows whose email already exists are not re-hashed.
+        """
+        if self.user_repository.shards is not None:
+            # The COPY + merge runs against one database's users table.
+            raise AppException(
+                status.HTTP_501_NOT_IMPLEMENTED,
+                "Imports are not supported while users are sharded",
+            )
+        batch_size = batch_size or settings.import_batch_size
+        report = ImportReport()
+        started = time.monotonic()
+        engine = get_engine(self.user_repository.session)
+
+        async with engine.connect() as connection:
+            await connection.run_sync(staging_table.create, checkfirst=True)
+            batch: dict[str, tuple[int, ImportedUser]] = {}
+            async for line, record in records:
+                report.rows += 1
+                user = self._validate(report, line, record)
+                if user is None:
+                    continue
+                if user.email in batch:
+                    report.skipped += 1
+                    continue
+                batch[user.email] = (line, user)
+                if len(batch) >= batch_size:
+                    await self._write_batch(connection, batch, on_conflict, report)
+                    batch = {}
+                    self._report_progress(report, started, progress)
+            if batch:
+                await self._write_batch(connection, batch, on_conflict, report)
+            await connection.run_sync(staging_table.drop, checkfirst=True)
+            await connection.commit()
+
+        self._report_progress(report, started, progress)
+        return report
+
+    def _validate(self, report: ImportReport, line: int, record: Any) -> ImportedUser | None:
+        if isinstance(record, str):
+            report.add_error(line, record)
+            return None
+        if not isinstance(record, dict):
+            report.add_error(line, "Expected an object")
+            return None
+        try:
+            return ImportedUser.model_validate(record)
+        except ValidationError as e:
+            report.add_error(line, "; ".join(
+                f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors()
+            ))
+            return None
+
+    async def _write_batch(
+        self,
+        connection: AsyncConnection,
+        batch: dict[str, tuple[int, ImportedUser]],
+        on_conflict: ConflictMode,
+        report: ImportReport,
+    ) -> None:
+        users = [user for _, user in batch.values()]
+        if on_conflict == ConflictMode.skip:
+            existing = set(
+                (await connection.execute(
+                    select(User.email).where(User.email.in_([user.email for user in users]))
+                )).scalars()
+            )
+            report.skipped += len(existing)
+            users = [user for user in users if user.email not in existing]
+        if not users:
+            await connection.commit()
+            report.batches += 1
+            return
+
+        passwords = await hash_passwords_async([user.password for user in users])
+        rows = [
+            (new_id(), user.email, user.name, password)
+            for user, password in zip(users, passwords, strict=True)
+        ]
+
+        await connection.execute(staging_table.delete())
+        await self._stage(connection, rows)
+        merged = (await connection.execute(self._merge_statement(connection, on_conflict))).mappings().all()
+        await connection.commit()
+
+        report.batches += 1
+        report.imported += len(merged)
+        report.skipped += len(rows) - len(merged)
+        await self.user_repository.sync_cache([User(**row) for row in merged])
+
+        # Rows merged into an existing user keep its id; their password was
+        # replaced, so end the user's sessions as a password reset does.
+        staged_ids = {row[0] for row in rows}
+        reset = [row["id"] for row in merged if row["id"] not in staged_ids]
+        if reset:
+            await revocation_service.revoke_all_many(reset)
+            await principal_cache.invalidate_many(reset)
+
+    async def _stage(self, connection: AsyncConnection, rows: list[tuple]) -> None:
+        if connection.dialect.driver == "asyncpg":
+            raw = await connection.get_raw_connection()
+            await raw.driver_connection.copy_records_to_table(
+                staging_table.name,
+                records=rows,
+                columns=STAGING_COLUMNS,
+            )
+        else:
+            await connection.execute(
+                staging_table.insert(),
+                [dict(zip(STAGING_COLUMNS, row, strict=True)) for row in rows],
+            )
+
+    def _merge_statement(self, connection: AsyncConnection, on_conflict: ConflictMode) -> Any:
+        dialect = postgresql if connection.dialect.name == "postgresql" else sqlite
+        # The WHERE keeps SQLite from reading ON CONFLICT as a join constraint.
+        source = select(*(staging_table.c[name] for name in STAGING_COLUMNS)).where(true())
+        stmt = dialect.insert(User).from_select(STAGING_COLUMNS, source)
+        if on_conflict == ConflictMode.update:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[User.email],
+                set_={
+                    "name": stmt.excluded.name,
+                    "password": stmt.excluded.password,
+                    "updated_at": func.now(),
+                },
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=[User.email])
+        return stmt.returning(*User.__table__.columns)
+
+    def _report_progress(
+        self,
+        report: ImportReport,
+        started: float,
+        progress: Callable[[ImportReport], None] | None,
+    ) -> None:
+        report.elapsed_seconds = time.monotonic() - started
+        logger.info(
+            "User import: %s rows, %s imported, %s skipped, %s invalid (%.0f rows/s)",
+            report.rows,
+            report.imported,
+            report.skipped,
+            report.invalid,
+            report.rows_per_second,
+        )
+        if progress is not None:
+            progress(report)
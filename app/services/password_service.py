@@ -0,0 +1,27 @@
+import logging
+
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.security import hash_password_async
+from app.repositories.user_repository import UserRepository
+
+logger = logging.getLogger(__name__)
+
+
+async def rehash_user_password(
+    session_maker: async_sessionmaker,
+    user_id: str,
+    old_hash: str,
+    password: str,
+) -> None:
+    try:
+        new_hash = await hash_password_async(password)
+    except HTTPException:
+        # Hashing pool is saturated; the next login will retry the upgrade.
+        return
+
+    async with session_maker() as session:
+        user_repo = UserRepository(session)
+        if await user_repo.update_password_hash(user_id, old_hash, new_hash):
+            logger.info("Upgraded password hash cost for user %s", user_id)
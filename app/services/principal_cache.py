@@ -0,0 +1,133 @@
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any
+
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.models.user import User
+from app.services.cache_service import cache_service
+
+logger = logging.getLogger(__name__)
+
+PRINCIPAL_CHANNEL = "principal_invalidate"
+PRINCIPAL_PREFIX = "principal:"
+PRINCIPAL_FIELDS = ("id", "email", "name", "created_at", "updated_at")
+DATETIME_FIELDS = ("created_at", "updated_at")
+
+
+def _serialize(user: User) -> dict[str, Any]:
+    data = {field: getattr(user, field) for field in PRINCIPAL_FIELDS}
+    for field in DATETIME_FIELDS:
+        if isinstance(data[field], datetime):
+            data[field] = data[field].isoformat()
+    return data
+
+
+def _deserialize(data: dict[str, Any]) -> User:
+    data = dict(data)
+    for field in DATETIME_FIELDS:
+        if isinstance(data.get(field), str):
+            data[field] = datetime.fromisoformat(data[field])
+    return User(**data)
+
+
+class PrincipalCache:
+    def __init__(self, local_ttl: float, redis_ttl: int, max_size: int):
+        self.local_ttl = local_ttl
+        self.redis_ttl = redis_ttl
+        self.max_size = max_size
+        self._local: OrderedDict[str, tuple[dict[str, Any], float]] = OrderedDict()
+        self._local_hits = 0
+        self._redis_hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    async def get(self, user_id: str) -> User | None:
+        entry = self._local.get(user_id)
+        if entry is not None:
+            if time.monotonic() - entry[1] < self.local_ttl:
+                self._local.move_to_end(user_id)
+                self._local_hits += 1
+                return _deserialize(entry[0])
+            del self._local[user_id]
+
+        try:
+            value = await cache_service.get(f"{PRINCIPAL_PREFIX}{user_id}")
+        except RedisError as e:
+            logger.warning("Principal cache lookup failed: %s", e)
+            value = None
+        if value is None:
+            self._misses += 1
+            return None
+
+        data = json.loads(value)
+        self._store_local(user_id, data)
+        self._redis_hits += 1
+        return _deserialize(data)
+
+    async def set(self, user: User) -> None:
+        data = _serialize(user)
+        self._store_local(user.id, data)
+        try:
+            await cache_service.set(f"{PRINCIPAL_PREFIX}{user.id}", data, self.redis_ttl)
+        except RedisError as e:
+            logger.warning("Principal cache write failed: %s", e)
+
+    async def invalidate(self, user_id: str) -> None:
+        await self.invalidate_many([user_id])
+
+    async def invalidate_many(self, user_ids: list[str]) -> None:
+        # One Redis round trip and one message for the whole batch.
+        if not user_ids:
+            return
+        for user_id in user_ids:
+            self._local.pop(user_id, None)
+        self._invalidations += len(user_ids)
+        try:
+            await cache_service.delete_many(
+                [f"{PRINCIPAL_PREFIX}{user_id}" for user_id in user_ids],
+                notify=(PRINCIPAL_CHANNEL, "\n".join(user_ids)),
+            )
+        except RedisError as e:
+            # Other workers still drop their copy once local_ttl passes.
+            logger.warning("Principal cache invalidation failed for %s users: %s", len(user_ids), e)
+
+    def _store_local(self, user_id: str, data: dict[str, Any]) -> None:
+        self._local[user_id] = (data, time.monotonic())
+        self._local.move_to_end(user_id)
+        while len(self._local) > self.max_size:
+            self._local.popitem(last=False)
+
+    def on_invalidate(self, message: str) -> None:
+        for user_id in message.split("\n"):
+            self._local.pop(user_id, None)
+
+    async def resync(self) -> None:
+        self._local.clear()
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self._local_hits + self._redis_hits + self._misses
+        return {
+            "local_size": len(self._local),
+            "local_hits": self._local_hits,
+            "redis_hits": self._redis_hits,
+            "misses": self._misses,
+            "hit_ratio": (self._local_hits + self._redis_hits) / lookups if lookups else 0.0,
+            "invalidations": self._invalidations,
+        }
+
+
+principal_cache = PrincipalCache(
+    local_ttl=settings.principal_cache_local_ttl,
+    redis_ttl=settings.principal_cache_redis_ttl,
+    max_size=settings.principal_cache_size,
+)
+cache_service.subscribe(
+    PRINCIPAL_CHANNEL,
+    principal_cache.on_invalidate,
+    resync=principal_cache.resync,
+)
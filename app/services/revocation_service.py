@@ -0,0 +1,249 @@
+import asyncio
+import hashlib
+import logging
+import math
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any
+
+from fastapi import HTTPException, status
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.services.cache_service import cache_service
+
+logger = logging.getLogger(__name__)
+
+REVOCATION_CHANNEL = "revocation"
+EPOCH_CHANNEL = "revocation_epoch"
+BLACKLIST_PREFIX = "blacklist:"
+EPOCH_PREFIX = "revocation_epoch:"
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(int(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hash_count = max(round(self.size / capacity * math.log(2)), 1)
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str) -> list[int]:
+        # Double hashing over one SHA-256 digest gives k independent positions.
+        digest = hashlib.sha256(item.encode("utf-8")).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:16], "big") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._bits)
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+
+class RevocationService:
+    def __init__(
+        self,
+        capacity: int,
+        error_rate: float,
+        epoch_cache_size: int = 100000,
+        epoch_cache_ttl: int = 60,
+    ):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.epoch_cache_size = epoch_cache_size
+        self.epoch_cache_ttl = epoch_cache_ttl
+        self._filter = BloomFilter(capacity, error_rate)
+        # Tags this worker's revocation messages; it already added those ids.
+        self._origin = uuid.uuid4().hex
+        # user_id -> (epoch, cached_at); epoch 0.0 means "never revoked"
+        self._epochs: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._pending: list[str] | None = None
+        self._rebuild_task: asyncio.Task | None = None
+        self._checks = 0
+        self._filter_hits = 0
+        self._false_positives = 0
+        self._revoked = 0
+        self._rebuilds = 0
+        self._epoch_hits = 0
+        self._epoch_misses = 0
+        self._epochs_revoked = 0
+
+    async def revoke(self, token_id: str, expires_at: float) -> None:
+        ttl = max(int(expires_at - time.time()), 1)
+        await cache_service.set_blacklist_token(token_id, ttl)
+        self._add(token_id)
+        await cache_service.publish(REVOCATION_CHANNEL, f"{self._origin}:{token_id}")
+        self._revoked += 1
+
+    async def revoke_all(self, user_id: str) -> float:
+        return await self.revoke_all_many([user_id])
+
+    async def revoke_all_many(self, user_ids: list[str]) -> float:
+        # Invalidates every token issued to the users up to now with a single
+        # key each. Tokens outlive the epoch key by at most the refresh
+        # lifetime. One Redis round trip and one message for the whole batch.
+        epoch = time.time()
+        if not user_ids:
+            return epoch
+        ttl = settings.jwt_refresh_token_expire_days * 86400
+        await cache_service.set_many(
+            {f"{EPOCH_PREFIX}{user_id}": repr(epoch) for user_id in user_ids},
+            ttl,
+            notify=(EPOCH_CHANNEL, "\n".join(f"{user_id}:{epoch!r}" for user_id in user_ids)),
+        )
+        for user_id in user_ids:
+            self._cache_epoch(user_id, epoch)
+        self._epochs_revoked += len(user_ids)
+        return epoch
+
+    async def get_epoch(self, user_id: str) -> float:
+        cached = self._epochs.get(user_id)
+        if cached is not None and time.monotonic() - cached[1] < self.epoch_cache_ttl:
+            self._epochs.move_to_end(user_id)
+            self._epoch_hits += 1
+            return cached[0]
+
+        self._epoch_misses += 1
+        try:
+            value = await cache_service.get(f"{EPOCH_PREFIX}{user_id}")
+        except RedisError as e:
+            # No new epochs can be written while Redis is down, so the last
+            # one seen here (kept current by pub/sub) is still the latest.
+            # A user never seen by this worker cannot be checked: fail closed.
+            if cached is not None:
+                logger.warning("Revocation epoch lookup failed, using last known: %s", e)
+                return cached[0]
+            logger.warning("Revocation epoch lookup failed: %s", e)
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Token revocation state is unavailable, please retry",
+                headers={"Retry-After": "1"},
+            ) from e
+        epoch = float(value) if value else 0.0
+        self._cache_epoch(user_id, epoch)
+        return epoch
+
+    def _cache_epoch(self, user_id: str, epoch: float) -> None:
+        self._epochs[user_id] = (epoch, time.monotonic())
+        self._epochs.move_to_end(user_id)
+        while len(self._epochs) > self.epoch_cache_size:
+            self._epochs.popitem(last=False)
+
+    def on_epoch_message(self, message: str) -> None:
+        for line in message.split("\n"):
+            user_id, _, epoch = line.rpartition(":")
+            self._cache_epoch(user_id, float(epoch))
+
+    async def resync_epochs(self) -> None:
+        # Epoch changes may have been missed while disconnected.
+        self._epochs.clear()
+
+    async def is_revoked(
+        self,
+        token_id: str,
+        user_id: str | None = None,
+        issued_at: float | None = None,
+    ) -> bool:
+        self._checks += 1
+        if user_id is not None:
+            epoch = await self.get_epoch(user_id)
+            if epoch and (issued_at is None or issued_at < epoch):
+                return True
+
+        if token_id not in self._filter:
+            return False
+
+        self._filter_hits += 1
+        try:
+            if await cache_service.is_token_blacklisted(token_id):
+                return True
+        except RedisError as e:
+            # Most likely revoked; it cannot be confirmed, so treat it as such.
+            logger.warning("Blacklist lookup failed: %s", e)
+            return True
+        self._false_positives += 1
+        return False
+
+    def _add(self, token_id: str) -> None:
+        self._filter.add(token_id)
+        if self._pending is not None:
+            self._pending.append(token_id)
+        if self._filter.count > self.capacity and self._rebuild_task is None:
+            # Expired revocations are never removed from a Bloom filter, so
+            # rebuild from the live Redis keys once it is over capacity.
+            self._rebuild_task = asyncio.create_task(self._rebuild_in_background())
+
+    def on_message(self, message: str) -> None:
+        origin, _, token_id = message.rpartition(":")
+        if origin != self._origin:
+            self._add(token_id)
+
+    async def _rebuild_in_background(self) -> None:
+        try:
+            await self.rebuild()
+        except Exception as e:
+            logger.warning("Failed to rebuild revocation filter: %s", e)
+        finally:
+            self._rebuild_task = None
+
+    async def rebuild(self) -> None:
+        if self._pending is not None:
+            return
+        rebuilt = BloomFilter(self.capacity, self.error_rate)
+        self._pending = []
+        try:
+            async for key in cache_service.scan_keys(f"{BLACKLIST_PREFIX}*"):
+                rebuilt.add(key[len(BLACKLIST_PREFIX):])
+            for token_id in self._pending:
+                rebuilt.add(token_id)
+        finally:
+            self._pending = None
+        self._filter = rebuilt
+        self._rebuilds += 1
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "filter_entries": self._filter.count,
+            "filter_capacity": self.capacity,
+            "filter_bytes": self._filter.nbytes,
+            "checks": self._checks,
+            "filter_hits": self._filter_hits,
+            "false_positives": self._false_positives,
+            "revoked": self._revoked,
+            "rebuilds": self._rebuilds,
+            "epoch_cache_size": len(self._epochs),
+            "epoch_hits": self._epoch_hits,
+            "epoch_misses": self._epoch_misses,
+            "epochs_revoked": self._epochs_revoked,
+        }
+
+
+revocation_service = RevocationService(
+    capacity=settings.revocation_filter_capacity,
+    error_rate=settings.revocation_filter_error_rate,
+    epoch_cache_size=settings.revocation_epoch_cache_size,
+    epoch_cache_ttl=settings.revocation_epoch_cache_ttl,
+)
+cache_service.subscribe(
+    REVOCATION_CHANNEL,
+    revocation_service.on_message,
+    resync=revocation_service.rebuild,
+)
+cache_service.subscribe(
+    EPOCH_CHANNEL,
+    revocation_service.on_epoch_message,
+    resync=revocation_service.resync_epochs,
+)
@@ -1,6 +1,10 @@
-from typing import Any, Optional
-from app.repositories.template_repository import TemplateRepository
+from collections.abc import AsyncIterator, Sequence
+from typing import Any
+
+from app.common.filtering import Filter, Sort
+from app.common.pagination import CountMode, Page
 from app.models.template import Template
+from app.repositories.template_repository import TemplateRepository
 
 
 class TemplateService:
@@ -10,18 +14,62 @@ class TemplateService:
     async def create_template(self, template_data: dict[str, Any]) -> Template:
         return await self.template_repository.create(template_data)
 
-    async def get_template_by_id(self, template_id: str) -> Optional[Template]:
-        return await self.template_repository.get_by_id(template_id)
+    async def get_template_by_id(self, template_id: str, columns: Sequence[str] | None = None) -> Any:
+        return await self.template_repository.get_by_id(template_id, columns)
 
-    async def get_template_by_email(self, email: str) -> Optional[Template]:
+    async def get_template_by_email(self, email: str) -> Template | None:
         return await self.template_repository.get_by_email(email)
 
-    async def update_template(self, template_id: str, template_data: dict[str, Any]) -> Optional[Template]:
+    async def update_template(self, template_id: str, template_data: dict[str, Any]) -> Template | None:
         return await self.template_repository.update(template_id, template_data)
 
     async def delete_template(self, template_id: str) -> bool:
         return await self.template_repository.delete(template_id)
 
-    async def get_all_templates(self, skip: int = 0, limit: int = 100) -> list[Template]:
-        return await self.template_repository.get_all(skip, limit)
+    async def bulk_create_templates(self, templates_data: list[dict[str, Any]]) -> list[Template | None]:
+        return await self.template_repository.bulk_create(templates_data)
+
+    async def bulk_update_templates(self, templates_data: list[dict[str, Any]]) -> list[Any]:
+        return await self.template_repository.bulk_update(templates_data)
+
+    async def bulk_delete_templates(self, template_ids: list[str]) -> list[bool]:
+        return await self.template_repository.bulk_delete(template_ids)
+
+    async def get_all_templates(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        columns: Sequence[str] | None = None,
+        filters: Sequence[Filter] = (),
+        sort: Sort | None = None,
+    ) -> list[Any]:
+        return await self.template_repository.get_all(skip, limit, columns, filters, sort)
+
+    async def get_templates_page(
+        self,
+        limit: int = 100,
+        cursor: str | None = None,
+        columns: Sequence[str] | None = None,
+        filters: Sequence[Filter] = (),
+        sort: Sort | None = None,
+    ) -> Page:
+        return await self.template_repository.get_page(limit, cursor, columns, filters, sort)
+
+    async def count_templates(
+        self,
+        mode: CountMode = CountMode.exact,
+        filters: Sequence[Filter] = (),
+    ) -> int | None:
+        return await self.template_repository.count(mode, filters)
+
+    async def search_templates(
+        self,
+        query: str,
+        columns: Sequence[str],
+        limit: int = 20,
+        cursor: str | None = None,
+    ) -> Page:
+        return await self.template_repository.search(query, columns, limit, cursor)
 
+    def stream_templates(self, columns: Sequence[str]) -> AsyncIterator[Sequence[Any]]:
+        return self.template_repository.stream(columns)
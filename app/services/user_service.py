@@ -1,7 +1,10 @@
-from typing import Any, Optional
-from sqlalchemy.ext.asyncio import AsyncSession
-from app.repositories.user_repository import UserRepository
+from collections.abc import AsyncIterator, Sequence
+from typing import Any
+
+from app.common.filtering import Filter, Sort
+from app.common.pagination import CountMode, Page
 from app.models.user import User
+from app.repositories.user_repository import UserRepository
 
 
 class UserService:
@@ -11,18 +14,62 @@ class UserService:
     async def create_user(self, user_data: dict[str, Any]) -> User:
         return await self.user_repository.create(user_data)
 
-    async def get_user_by_id(self, user_id: str) -> Optional[User]:
-        return await self.user_repository.get_by_id(user_id)
+    async def get_user_by_id(self, user_id: str, columns: Sequence[str] | None = None) -> Any:
+        return await self.user_repository.get_by_id(user_id, columns)
 
-    async def get_user_by_email(self, email: str) -> Optional[User]:
+    async def get_user_by_email(self, email: str) -> User | None:
         return await self.user_repository.get_by_email(email)
 
-    async def update_user(self, user_id: str, user_data: dict[str, Any]) -> Optional[User]:
+    async def update_user(self, user_id: str, user_data: dict[str, Any]) -> User | None:
         return await self.user_repository.update(user_id, user_data)
 
     async def delete_user(self, user_id: str) -> bool:
         return await self.user_repository.delete(user_id)
 
-    async def get_all_users(self, skip: int = 0, limit: int = 100) -> list[User]:
-        return await self.user_repository.get_all(skip, limit)
+    async def bulk_create_users(self, users_data: list[dict[str, Any]]) -> list[User | None]:
+        return await self.user_repository.bulk_create(users_data)
+
+    async def bulk_update_users(self, users_data: list[dict[str, Any]]) -> list[Any]:
+        return await self.user_repository.bulk_update(users_data)
+
+    async def bulk_delete_users(self, user_ids: list[str]) -> list[bool]:
+        return await self.user_repository.bulk_delete(user_ids)
+
+    async def get_all_users(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        columns: Sequence[str] | None = None,
+        filters: Sequence[Filter] = (),
+        sort: Sort | None = None,
+    ) -> list[Any]:
+        return await self.user_repository.get_all(skip, limit, columns, filters, sort)
+
+    async def get_users_page(
+        self,
+        limit: int = 100,
+        cursor: str | None = None,
+        columns: Sequence[str] | None = None,
+        filters: Sequence[Filter] = (),
+        sort: Sort | None = None,
+    ) -> Page:
+        return await self.user_repository.get_page(limit, cursor, columns, filters, sort)
+
+    async def count_users(
+        self,
+        mode: CountMode = CountMode.exact,
+        filters: Sequence[Filter] = (),
+    ) -> int | None:
+        return await self.user_repository.count(mode, filters)
+
+    async def search_users(
+        self,
+        query: str,
+        columns: Sequence[str],
+        limit: int = 20,
+        cursor: str | None = None,
+    ) -> Page:
+        return await self.user_repository.search(query, columns, limit, cursor)
 
+    def stream_users(self, columns: Sequence[str]) -> AsyncIterator[Sequence[Any]]:
+        return self.user_repository.stream(columns)
@@ -14,18 +14,18 @@ TestingSessionLocal = async_sessionmaker(engine, class_=AsyncSession, expire_on_
 async def db_session():
     async with engine.begin() as connection:
         await connection.run_sync(Base.metadata.create_all)
-        yield
+    yield
+    async with engine.begin() as connection:
         await connection.run_sync(Base.metadata.drop_all)
 
 
 @pytest.fixture
 async def async_client(db_session):
     async def override_get_db():
-        async for session in TestingSessionLocal():
+        async with TestingSessionLocal() as session:
             yield session
 
     app.dependency_overrides[get_db] = override_get_db
     client = TestClient(app)
     yield client
     app.dependency_overrides.clear()
-
@@ -1,5 +1,10 @@
 import pytest
 from faker import Faker
+from fastapi import status
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.services.principal_cache import principal_cache
+from app.services.revocation_service import revocation_service
 
 fake = Faker()
 
@@ -34,7 +39,7 @@ async def test_register_duplicate_email(async_client):
         json={"email": email, "password": "testpassword123", "name": "Test User"},
     )
     assert response.status_code == 400
-    assert "already registered" in response.json()["detail"]
+    assert "already registered" in response.json()["message"]
 
 
 @pytest.mark.asyncio
@@ -63,5 +68,77 @@ async def test_login_invalid_credentials(async_client):
         json={"email": "nonexistent@test.com", "password": "wrongpassword"},
     )
     assert response.status_code == 401
-    assert "Incorrect email or password" in response.json()["detail"]
+    assert "Incorrect email or password" in response.json()["message"]
+
+
+@pytest.mark.asyncio
+async def test_me_is_served_from_the_principal_cache(async_client, monkeypatch):
+    email = fake.email()
+    async_client.post(
+        "/api/auth/register",
+        json={"email": email, "password": "testpassword123", "name": "Test User"},
+    )
+    token = async_client.post(
+        "/api/auth/login",
+        json={"email": email, "password": "testpassword123"},
+    ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async def get_epoch(user_id):
+        return 0.0 if user_id else None
+
+    # No Redis here, so the user's revocation epoch is stubbed.
+    monkeypatch.setattr(revocation_service, "get_epoch", get_epoch)
+
+    response = async_client.get("/api/auth/me", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["email"] == email
+
+    hits = principal_cache.stats()["local_hits"]
+    response = async_client.get("/api/auth/me", headers=headers)
+    assert response.json()["email"] == email
+    assert principal_cache.stats()["local_hits"] == hits + 1
+
+    assert async_client.get("/api/auth/me").status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.asyncio
+async def test_authenticated_route_with_redis_down(async_client, monkeypatch):
+    email = fake.email()
+    user_id = async_client.post(
+        "/api/auth/register",
+        json={"email": email, "password": "testpassword123", "name": "Test User"},
+    ).json()["id"]
+    token = async_client.post(
+        "/api/auth/login",
+        json={"email": email, "password": "testpassword123"},
+    ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async def fail(_key):
+        message = "redis is down"
+        raise RedisConnectionError(message)
+
+    monkeypatch.setattr("app.core.cache.cache_service.get", fail)
+
+    # This worker has never seen the user's epoch, so it cannot vouch for it.
+    response = async_client.post("/api/auth/logout-all", headers=headers)
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert "revocation" in response.json()["message"]
+
+    # An epoch it did see (here via pub/sub) is used once it goes stale.
+    revocation_service.on_epoch_message(f"{user_id}:1.0")
+    monkeypatch.setattr(revocation_service, "epoch_cache_ttl", 0)
+    written = {}
+
+    async def set_many(items, ttl=None, nx=False, notify=None):
+        written.update(items)
+        return ttl, nx, notify
+
+    monkeypatch.setattr("app.core.cache.cache_service.set_many", set_many)
+    response = async_client.post("/api/auth/logout-all", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert f"revocation_epoch:{user_id}" in written
 
+    response = async_client.post("/api/auth/logout-all", headers=headers)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
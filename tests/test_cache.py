@@ -0,0 +1,351 @@
+import json
+from unittest.mock import AsyncMock
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.cache import CacheService, LocalCache
+from app.core.database import Base
+from app.core.ids import new_id
+from app.models.user import User
+from app.repositories.user_repository import UserRepository
+from app.services.principal_cache import PrincipalCache
+
+USER_ID = new_id()
+
+
+@pytest.fixture
+def redis_down(monkeypatch):
+    async def fail(*_args, **_kwargs):
+        message = "redis is down"
+        raise RedisConnectionError(message)
+
+    for name in ("get", "set", "set_many", "delete", "delete_many", "publish"):
+        monkeypatch.setattr(f"app.services.cache_service.cache_service.{name}", fail)
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    store = {}
+
+    async def get(key):
+        return store.get(key)
+
+    async def set_(key, value, _ttl=None, nx=False):
+        if nx and key in store:
+            return False
+        store[key] = json.dumps(value) if isinstance(value, (dict, list)) else str(value)
+        return True
+
+    async def set_many(items, ttl=None, nx=False):
+        for key, value in items.items():
+            await set_(key, value, ttl, nx)
+
+    async def delete(key):
+        store.pop(key, None)
+
+    async def delete_many(keys):
+        for key in keys:
+            store.pop(key, None)
+
+    monkeypatch.setattr("app.core.cache.cache_service.get", get)
+    monkeypatch.setattr("app.core.cache.cache_service.set", set_)
+    monkeypatch.setattr("app.core.cache.cache_service.set_many", set_many)
+    monkeypatch.setattr("app.core.cache.cache_service.delete", delete)
+    monkeypatch.setattr("app.core.cache.cache_service.delete_many", delete_many)
+    return store
+
+
+class SharedRedis:
+    """One Redis for several CacheService "workers"; publish() delivers
+    to every worker's subscribed handlers right away."""
+
+    used_memory = 4096
+
+    def __init__(self):
+        self.store = {}
+        self.workers = []
+        self.gets = 0
+        self.before_get_returns = None
+
+    async def get(self, key):
+        self.gets += 1
+        value = self.store.get(key)
+        if self.before_get_returns:
+            await self.before_get_returns()
+        return value
+
+    async def set(self, key, value, nx=False, **_options):
+        if nx and key in self.store:
+            return None
+        self.store[key] = str(value)
+        return True
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.store.pop(key, None)
+
+    async def publish(self, channel, message):
+        for worker in self.workers:
+            worker.dispatch(channel, message)
+
+    async def info(self, _section):
+        return {"used_memory": self.used_memory}
+
+    def pipeline(self, **_options):
+        return SharedPipeline(self)
+
+
+class SharedPipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.commands.append((name, args, kwargs))
+
+    async def execute(self):
+        return [await getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+
+
+@pytest.fixture
+def shared_redis(monkeypatch):
+    redis = SharedRedis()
+
+    async def from_url(*_args, **_kwargs):
+        return redis
+
+    monkeypatch.setattr("app.core.cache.redis.from_url", from_url)
+    return redis
+
+
+def _workers(redis, count, **kwargs):
+    for _ in range(count):
+        redis.workers.append(CacheService(local_policies={"hot:": 60, "hot:uncached:": 0}, **kwargs))
+    return redis.workers
+
+
+@pytest.fixture
+async def session_maker():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("redis_down")
+async def test_principal_cache_serves_local_copy_until_invalidated():
+    cache = PrincipalCache(local_ttl=60, redis_ttl=60, max_size=10)
+    assert await cache.get("user-1") is None
+
+    await cache.set(User(id="user-1", email="user@example.com", name="User"))
+    user = await cache.get("user-1")
+    assert user.email == "user@example.com"
+    assert cache.stats()["local_hits"] == 1
+
+    await cache.invalidate("user-1")
+    assert await cache.get("user-1") is None
+
+
+@pytest.mark.asyncio
+async def test_principal_cache_invalidates_a_batch_in_one_round_trip(monkeypatch):
+    delete_many = AsyncMock()
+    monkeypatch.setattr("app.core.cache.cache_service.set", AsyncMock())
+    monkeypatch.setattr("app.core.cache.cache_service.delete_many", delete_many)
+    cache = PrincipalCache(local_ttl=60, redis_ttl=60, max_size=10)
+    for user_id in ("user-1", "user-2", "user-3"):
+        await cache.set(User(id=user_id, email=f"{user_id}@example.com"))
+
+    invalidated = ["user-1", "user-2"]
+    await cache.invalidate_many(invalidated)
+    delete_many.assert_awaited_once_with(
+        ["principal:user-1", "principal:user-2"],
+        notify=("principal_invalidate", "user-1\nuser-2"),
+    )
+    assert cache.stats()["local_size"] == 1
+    assert cache.stats()["invalidations"] == len(invalidated)
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("fake_redis")
+async def test_cached_repository_serves_lookups_from_cache(session_maker):
+    async with session_maker() as session:
+        repo = UserRepository(session)
+        await repo.create({"id": USER_ID, "email": "one@example.com", "password": "x"})
+        misses = repo.cache_stats.misses
+
+        # The row written by create is served without touching the table.
+        await session.execute(User.__table__.delete())
+        await session.commit()
+        assert (await repo.get_by_id(USER_ID)).email == "one@example.com"
+        assert (await repo.get_by_email("one@example.com")).id == USER_ID
+        assert repo.cache_stats.misses == misses
+
+        assert await repo.get_by_email("nobody@example.com") is None
+        assert await repo.get_by_email("nobody@example.com") is None
+        assert repo.cache_stats.misses == misses + 1
+        assert repo.cache_stats.negative_hits == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("fake_redis")
+async def test_cached_repository_writes_refresh_entries(session_maker):
+    async with session_maker() as session:
+        repo = UserRepository(session)
+        assert await repo.get_by_email("one@example.com") is None
+
+        await repo.create({"id": USER_ID, "email": "one@example.com", "password": "x"})
+        assert (await repo.get_by_email("one@example.com")).id == USER_ID
+
+        await repo.update(USER_ID, {"email": "two@example.com", "name": "Two"})
+        assert (await repo.get_by_id(USER_ID)).name == "Two"
+        assert await repo.get_by_email("one@example.com") is None
+        assert (await repo.get_by_email("two@example.com")).id == USER_ID
+
+        assert await repo.delete(USER_ID)
+        assert await repo.get_by_id(USER_ID) is None
+        assert await repo.get_by_email("two@example.com") is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("fake_redis")
+async def test_cached_repository_writes_are_single_statements(session_maker):
+    async with session_maker() as session:
+        await session.execute(User.__table__.insert().values(id=USER_ID, email="one@example.com", password="x"))
+        await session.commit()
+        repo = UserRepository(session)
+        # A read-through fill caches the row under both keys.
+        assert (await repo.get_by_email("one@example.com")).id == USER_ID
+
+        statements = []
+        event.listen(session.bind.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        await repo.update(USER_ID, {"email": "two@example.com"})
+        assert len(statements) == 1
+        assert await repo.get_by_email("one@example.com") is None
+
+        statements.clear()
+        assert await repo.delete(USER_ID)
+        assert len(statements) == 1
+        assert await repo.get_by_email("two@example.com") is None
+
+
+@pytest.mark.asyncio
+async def test_cached_repository_never_caches_password_hashes(fake_redis, session_maker):
+    async with session_maker() as session:
+        repo = UserRepository(session)
+        await repo.create({"id": USER_ID, "email": "one@example.com", "password": "secret-hash"})
+        assert await repo.get_by_id(USER_ID) is not None
+
+        assert fake_redis
+        assert all("secret-hash" not in value for value in fake_redis.values())
+        assert (await repo.get_by_email("one@example.com")).password is None
+        assert (await repo.get_by_email_uncached("one@example.com")).password == "secret-hash"
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("redis_down")
+async def test_cached_repository_falls_back_when_redis_is_down(session_maker):
+    async with session_maker() as session:
+        repo = UserRepository(session)
+        await repo.create({"id": USER_ID, "email": "one@example.com", "password": "x"})
+        assert (await repo.get_by_email("one@example.com")).id == USER_ID
+
+
+@pytest.mark.asyncio
+async def test_delete_many_is_one_round_trip_across_workers(shared_redis):
+    redis = shared_redis
+    a, b = _workers(redis, 2)
+    messages = []
+    b.subscribe("batch", messages.append)
+    await a.set_many({"hot:one": 1, "hot:two": 2})
+    assert await b.get("hot:one") == "1"
+
+    # Every copy is evicted and the extra message rides along.
+    await a.delete_many(["hot:one", "hot:two"], notify=("batch", "one\ntwo"))
+    assert messages == ["one\ntwo"]
+    assert await b.get("hot:one") is None
+    assert "hot:two" not in redis.store
+
+
+@pytest.mark.asyncio
+async def test_local_tier_is_invalidated_across_workers(shared_redis):
+    redis = shared_redis
+    a, b = _workers(redis, 2)
+    await a.set("hot:config", {"v": 1}, ttl=300)
+    assert json.loads(await b.get("hot:config")) == {"v": 1}
+    assert json.loads(await b.get("hot:config")) == {"v": 1}
+    assert redis.gets == 1
+
+    # A write by one worker evicts the copy held by the other.
+    gets, invalidations = redis.gets, b.local.stats()["invalidations"]
+    await a.set_many({"hot:config": {"v": 2}, "cold:key": "x"})
+    assert b.local.stats()["invalidations"] == invalidations + 1
+    assert json.loads(await b.get("hot:config")) == {"v": 2}
+    assert redis.gets == gets + 1
+    await a.delete("hot:config")
+    assert await b.get("hot:config") is None
+    assert await a.get("hot:config") is None
+
+    # Keys outside a local policy always go to Redis.
+    gets = redis.gets
+    keys = ("cold:key", "cold:key", "hot:uncached:key")
+    for key in keys:
+        await b.get(key)
+    assert redis.gets == gets + len(keys)
+
+    # A value read while another worker's write lands is not kept locally.
+    await redis.set("hot:raced", "old")
+    redis.before_get_returns = lambda: a.set("hot:raced", "new")
+    assert await b.get("hot:raced") == "old"
+    redis.before_get_returns = None
+    gets = redis.gets
+    assert await b.get("hot:raced") == "new"
+    assert redis.gets == gets + 1
+
+    stats = await b.stats()
+    assert stats["local"]["hits"] == 1
+    assert stats["redis"]["memory_bytes"] == redis.used_memory
+    assert stats["local"]["memory_bytes"] > 0
+
+
+def test_local_cache_respects_its_memory_cap():
+    max_bytes, count = 4096, 100
+    cache = LocalCache(max_entries=1000, max_bytes=max_bytes)
+    for i in range(count):
+        cache.put(f"key:{i}", "x" * 100, ttl=60)
+    stats = cache.stats()
+    assert 0 < stats["entries"] < count
+    assert stats["memory_bytes"] <= max_bytes
+    assert cache.get("key:99") is not None
+    assert cache.get("key:0") is None
+
+    cache.put("expired", "x", ttl=0)
+    assert cache.get("expired") is None
+    cache.put("huge", "x" * 10000, ttl=60)
+    assert cache.get("huge") is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("fake_redis")
+async def test_writes_invalidate_cached_search_pages(session_maker):
+    async with session_maker() as session:
+        repo = UserRepository(session)
+        await repo.create({"id": USER_ID, "email": "one@example.com", "password": "x"})
+        assert [row["email"] for row in (await repo.search("one", ["email"])).items] == ["one@example.com"]
+
+        await repo.update(USER_ID, {"email": "two@example.com"})
+        assert (await repo.search("one", ["email"])).items == []
+        assert [row["email"] for row in (await repo.search("two", ["email"])).items] == ["two@example.com"]
+
+        assert await repo.delete(USER_ID)
+        assert (await repo.search("two", ["email"])).items == []
@@ -0,0 +1,413 @@
+import asyncio
+import uuid
+from unittest.mock import AsyncMock
+
+import pytest
+from alembic.autogenerate import compare_metadata
+from alembic.command import upgrade
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import (
+    Column,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    create_engine,
+    event,
+    func,
+    select,
+    text,
+)
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.api.v1.users.schemas import UserResponse
+from app.common.exceptions import DuplicateError
+from app.core.backfill import (
+    Backfill,
+    Throttle,
+    backfill_status,
+    create_index_concurrently,
+    run_backfill,
+)
+from app.core.database import (
+    SCHEMA_REVISION,
+    Base,
+    InstrumentedPool,
+    ReplicaSet,
+    RoutingSession,
+    RoutingState,
+    _routing_state,
+    check_schema,
+    warm_pool,
+)
+from app.core.ids import new_id, normalize_id, uuid7
+from app.core.metrics import Histogram
+from app.models.user import User
+from app.repositories.base import BaseRepository
+from app.repositories.user_repository import UserRepository
+from app.services.user_service import UserService
+
+REPLICA_ID, PRIMARY_ID, U1, U2 = (new_id() for _ in range(4))
+# The batch a simulated crash kills in the backfill tests.
+CRASHING_BATCH = 2
+
+
+class KilledError(Exception):
+    pass
+
+
+def _engine():
+    return create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+
+
+@pytest.fixture
+async def databases():
+    primary, replica = _engine(), _engine()
+    for db in (primary, replica):
+        async with db.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+    replicas = ReplicaSet([replica], strategy="round_robin", eject_seconds=30)
+    session_maker = async_sessionmaker(
+        primary,
+        class_=AsyncSession,
+        sync_session_class=RoutingSession,
+        expire_on_commit=False,
+        replicas=replicas,
+    )
+    async with async_sessionmaker(replica, expire_on_commit=False)() as session:
+        await UserRepository(session).create({"id": REPLICA_ID, "email": "replica@example.com", "password": "x"})
+    yield session_maker, replicas
+    await primary.dispose()
+    await replica.dispose()
+
+
+@pytest.mark.asyncio
+async def test_reads_go_to_replica_until_the_session_writes(databases):
+    session_maker, replicas = databases
+    async with session_maker() as session:
+        repo = UserRepository(session)
+        assert [u.email for u in await repo.get_all()] == ["replica@example.com"]
+
+        await repo.create({"id": PRIMARY_ID, "email": "primary@example.com", "password": "x"})
+        assert session.info["wrote"]
+        assert [u.email for u in await repo.get_all()] == ["primary@example.com"]
+    assert replicas.stats()["replicas"][0]["selected"] == 1
+
+
+@pytest.mark.asyncio
+async def test_pinned_client_reads_from_primary(databases):
+    session_maker, _ = databases
+    token = _routing_state.set(RoutingState(pinned=True))
+    try:
+        async with session_maker() as session:
+            assert await UserRepository(session).get_all() == []
+    finally:
+        _routing_state.reset(token)
+
+
+@pytest.mark.asyncio
+async def test_ejected_replica_falls_back_to_primary(databases):
+    session_maker, replicas = databases
+    replicas.eject(0)
+    async with session_maker() as session:
+        assert await UserRepository(session).get_all() == []
+    stats = replicas.stats()
+    assert stats["primary_fallbacks"] == 1
+    assert not stats["replicas"][0]["healthy"]
+
+
+@pytest.mark.asyncio
+async def test_least_connections_prefers_idle_replica():
+    engines = [_engine(), _engine()]
+    replicas = ReplicaSet(engines, strategy="least_connections", eject_seconds=30)
+    try:
+        async with engines[0].connect():
+            assert replicas.stats()["replicas"][0]["checked_out"] == 1
+            assert [replicas.choose() for _ in engines] == [engines[1]] * len(engines)
+    finally:
+        await replicas.dispose()
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram(buckets=(0.01, 0.1))
+    values = (0.005, 0.05, 0.05, 3.0)
+    for value in values:
+        histogram.observe(value)
+
+    snapshot = histogram.snapshot()
+    assert snapshot["buckets"] == {"0.01": 1, "0.1": 3, "+Inf": 4}
+    assert snapshot["count"] == len(values)
+    assert snapshot["max"] == max(values)
+
+
+@pytest.mark.asyncio
+async def test_warm_pool_fills_instrumented_pool(tmp_path):
+    size = 3
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedPool,
+        pool_size=size,
+        max_overflow=0,
+    )
+    try:
+        assert await warm_pool(engine, size) == size
+        stats = engine.sync_engine.pool.stats()
+        assert stats["checked_in"] == size
+        assert stats["checked_out"] == 0
+        assert stats["connect_seconds"]["count"] == size
+        assert stats["checkout_wait_seconds"]["count"] == size
+
+        # Connections opened up front are reused instead of reconnecting.
+        async with engine.connect():
+            pass
+        stats = engine.sync_engine.pool.stats()
+        assert stats["connect_seconds"]["count"] == size
+        assert stats["checkout_wait_seconds"]["count"] == size + 1
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_repository_reads_share_a_connection_until_released(tmp_path):
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'release.db'}",
+        poolclass=InstrumentedPool,
+    )
+    checkouts = []
+    event.listen(engine.sync_engine, "checkout", lambda *_: checkouts.append(None))
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    pool = engine.sync_engine.pool
+    try:
+        async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+            repo = UserRepository(session)
+            user = await repo.create({"id": U1, "email": "u1@example.com", "password": "x"})
+            assert pool.checkedout() == 0
+
+            assert (await repo.get_by_email_uncached("u1@example.com")).id == user.id
+            assert await repo.exists(email="u1@example.com")
+            assert pool.checkedout() == 1
+            await repo.release()
+            assert pool.checkedout() == 0
+
+            async with session.begin():
+                await repo.exists(email="u1@example.com")
+                await repo.release()
+                assert pool.checkedout() == 1
+        assert pool.stats()["hold_seconds"]["count"] == len(checkouts)
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_get_by_id_is_batched(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'loader.db'}")
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    async with session_maker() as session:
+        await BaseRepository(User, session).create({"id": U1, "email": "u1@example.com", "password": "x"})
+        await BaseRepository(User, session).create({"id": U2, "email": "u2@example.com", "password": "x"})
+
+    statements = []
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    async def lookup(user_id):
+        async with session_maker() as session:
+            return await BaseRepository(User, session).get_by_id(user_id)
+
+    try:
+        users = await asyncio.gather(*(lookup(i) for i in [U1, U2, U1, "missing"]))
+        assert [u.email if u else None for u in users] == [
+            "u1@example.com", "u2@example.com", "u1@example.com", None
+        ]
+        assert users[0] is not users[2]
+        assert len(statements) == 1
+        assert " IN " in statements[0]
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_user_requests_share_one_lookup(tmp_path, monkeypatch):
+    # GET /users/{id} and get_current_user read through the repository cache,
+    # whose misses go to the batch loader whatever projection was asked for.
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'requests.db'}")
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    async with session_maker() as session:
+        await BaseRepository(User, session).create({"id": U1, "email": "u1@example.com", "password": "x"})
+        await BaseRepository(User, session).create({"id": U2, "email": "u2@example.com", "password": "x"})
+
+    # Every lookup misses the cache.
+    monkeypatch.setattr("app.core.cache.cache_service.get", AsyncMock(return_value=None))
+    monkeypatch.setattr("app.core.cache.cache_service.set", AsyncMock())
+    statements = []
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    async def get_user(user_id):
+        async with session_maker() as session:
+            repo = UserRepository(session, shards=None)
+            return await UserService(repo).get_user_by_id(user_id, list(UserResponse.model_fields))
+
+    try:
+        users = await asyncio.gather(get_user(U1), get_user(U2), get_user(U1))
+        assert [user.email for user in users] == ["u1@example.com", "u2@example.com", "u1@example.com"]
+        assert len(statements) == 1
+        assert " IN " in statements[0]
+    finally:
+        await engine.dispose()
+
+
+async def test_only_unique_violations_become_duplicate_errors(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'unique.db'}")
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    try:
+        async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+            repo = BaseRepository(User, session)
+            await repo.create({"id": U1, "email": "u1@example.com", "password": "x"})
+            await repo.create({"id": U2, "email": "u2@example.com", "password": "x"})
+
+            with pytest.raises(DuplicateError):
+                await repo.update(U2, {"email": "u1@example.com"})
+            with pytest.raises(IntegrityError) as exc_info:
+                await repo.update(U2, {"email": None})
+            assert not isinstance(exc_info.value, DuplicateError)
+            with pytest.raises(IntegrityError):
+                await repo.create({"id": U1, "email": "other@example.com", "password": "x"})
+    finally:
+        await engine.dispose()
+
+
+def test_uuid7_ids_are_time_ordered():
+    ids = [uuid7() for _ in range(5000)]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+    assert {(i.version, i.variant) for i in ids} == {(7, uuid.RFC_4122)}
+    assert normalize_id(str(ids[0]).upper()) == str(ids[0])
+    assert normalize_id("nonexistent-id") is None
+
+
+@pytest.mark.filterwarnings("ignore")
+def test_baseline_migration_matches_models(tmp_path):
+    config = Config("alembic.ini")
+    config.set_main_option("sqlalchemy.url", f"sqlite+aiosqlite:///{tmp_path}/migrated.db")
+    upgrade(config, "head")
+    assert ScriptDirectory.from_config(config).get_current_head() == SCHEMA_REVISION
+
+    with create_engine(f"sqlite:///{tmp_path}/migrated.db").connect() as connection:
+        assert compare_metadata(MigrationContext.configure(connection), Base.metadata) == []
+
+
+@pytest.mark.asyncio
+async def test_check_schema_is_shared_through_the_cache(monkeypatch):
+    store = {}
+
+    async def get(key):
+        return store.get(key)
+
+    async def set_(key, value, *_args, **_kwargs):
+        store[key] = value
+
+    monkeypatch.setattr("app.core.cache.cache_service.get", get)
+    monkeypatch.setattr("app.core.cache.cache_service.set", set_)
+
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+    queries = []
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: queries.append(args[2]))
+
+    with pytest.raises(RuntimeError, match="expected"):
+        await check_schema(engine)
+
+    async with engine.begin() as connection:
+        await connection.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL)"))
+        await connection.execute(text("INSERT INTO alembic_version VALUES (:revision)"), {"revision": SCHEMA_REVISION})
+    queries.clear()
+
+    assert await check_schema(engine) == SCHEMA_REVISION
+    assert len(queries) == 1
+    # Another worker finds the verified revision in Redis and skips the query.
+    assert await check_schema(engine) == SCHEMA_REVISION
+    assert len(queries) == 1
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_backfill_resumes_from_its_checkpoint():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.execute(
+            User.__table__.insert(),
+            [{"id": new_id(), "email": f"user{i}@example.com", "password": "x"} for i in range(25)],
+        )
+
+    users = User.__table__
+    statements = []
+
+    def fill_name(batch):
+        statements.append(batch)
+        if len(statements) == CRASHING_BATCH:
+            raise KilledError
+        return users.update().where(batch, users.c.name.is_(None)).values(name=func.upper(users.c.email))
+
+    backfill = Backfill(name="users_name", key=users.c.id, statement=fill_name, batch_size=10)
+    with pytest.raises(KilledError):
+        await run_backfill(engine, backfill, Throttle())
+    [checkpoint] = await backfill_status(engine)
+    assert (checkpoint["rows"], checkpoint["batches"], checkpoint["finished_at"]) == (10, 1, None)
+
+    # The second batch rolled back with its checkpoint and is redone.
+    checkpoint = await run_backfill(engine, backfill, Throttle())
+    assert (checkpoint["rows"], checkpoint["batches"]) == (25, 3)
+    assert checkpoint["finished_at"] is not None
+    async with engine.connect() as connection:
+        missing = await connection.execute(select(func.count()).where(users.c.name.is_(None)))
+        assert missing.scalar_one() == 0
+
+    # A finished backfill is not run again.
+    assert (await run_backfill(engine, backfill, Throttle()))["batches"] == checkpoint["batches"]
+    assert len(statements) == checkpoint["batches"] + 1
+
+    index = Index("ix_users_name_scratch", users.c.name)
+    for _ in range(2):
+        await create_index_concurrently(engine, index)
+    users.indexes.discard(index)
+    async with engine.connect() as connection:
+        names = await connection.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'"))
+        assert "ix_users_name_scratch" in names.scalars().all()
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_backfill_checkpoint_keeps_the_key_type():
+    items = Table("items", MetaData(), Column("id", Integer, primary_key=True), Column("label", String))
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+    async with engine.begin() as connection:
+        await connection.run_sync(items.metadata.create_all)
+        await connection.execute(items.insert(), [{"id": i} for i in range(1, 26)])
+
+    bounds = []
+
+    def label(batch):
+        bounds.append(list(batch.compile().params.values()))
+        if len(bounds) == CRASHING_BATCH:
+            raise KilledError
+        return items.update().where(batch).values(label="x")
+
+    backfill = Backfill(name="items_label", key=items.c.id, statement=label, batch_size=10)
+    with pytest.raises(KilledError):
+        await run_backfill(engine, backfill, Throttle())
+    checkpoint = await run_backfill(engine, backfill, Throttle())
+
+    assert (checkpoint["rows"], checkpoint["last_key"]) == (25, "20")
+    # The resumed run compared ids with the integer 10, not the string "10".
+    assert bounds[2] == [10, 20]
+    await engine.dispose()
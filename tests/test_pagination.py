@@ -0,0 +1,133 @@
+from datetime import UTC, datetime
+
+import pytest
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.api.v1.users.schemas import UserResponse
+from app.common.filtering import FilterOp, check_query_spec, parse_filters
+from app.common.pagination import NEXT, PREV, CountMode, decode_cursor, encode_cursor
+from app.common.projection import parse_fields
+from app.core.database import Base
+from app.core.ids import new_id
+from app.models.template import Template
+from app.repositories.template_repository import TemplateRepository
+from app.repositories.user_repository import UserRepository
+
+USER_1, USER_2 = new_id(), new_id()
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2024, 1, 2, 3, 4, 5, tzinfo=UTC)
+    cursor = encode_cursor([created_at, "user-1"], PREV)
+
+    assert decode_cursor(cursor, 2) == ([created_at, "user-1"], PREV)
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", encode_cursor(["only-one"], NEXT)])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as exc_info:
+        decode_cursor(cursor, 2)
+    assert exc_info.value.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_parse_fields():
+    assert parse_fields(None, UserResponse) == ["id", "email", "name"]
+    assert parse_fields(" email,id,email", UserResponse) == ["email", "id"]
+    for fields in ("password", ","):
+        with pytest.raises(HTTPException) as exc_info:
+            parse_fields(fields, UserResponse)
+        assert exc_info.value.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_query_spec_requires_indexes():
+    TemplateRepository(None)
+    check_query_spec(Template.__table__, {"published": (FilterOp.eq,)}, ("created_at",))
+    with pytest.raises(ValueError, match="name:eq, sort name"):
+        check_query_spec(Template.__table__, {"name": (FilterOp.eq,)}, ("name",))
+
+    assert parse_filters(["created_at:gte:2024-01-01T00:00:00"])[0].value == "2024-01-01T00:00:00"
+    for raw in ("published", "published:like:x"):
+        with pytest.raises(HTTPException) as exc_info:
+            parse_filters([raw])
+        assert exc_info.value.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.asyncio
+async def test_count_modes(monkeypatch):
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    store = {}
+
+    async def get(key):
+        return store.get(key)
+
+    async def set_(key, value, *_args, **_kwargs):
+        store[key] = str(value)
+
+    async def set_many(items, ttl=None, nx=False):
+        pass
+
+    async def delete(key):
+        store.pop(key, None)
+
+    async def delete_many(keys):
+        for key in keys:
+            store.pop(key, None)
+
+    monkeypatch.setattr("app.core.cache.cache_service.get", get)
+    monkeypatch.setattr("app.core.cache.cache_service.set_many", set_many)
+    monkeypatch.setattr("app.core.cache.cache_service.set", set_)
+    monkeypatch.setattr("app.core.cache.cache_service.delete", delete)
+    monkeypatch.setattr("app.core.cache.cache_service.delete_many", delete_many)
+
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+        repo = UserRepository(session)
+        await repo.create({"id": USER_1, "email": "one@example.com", "password": "x"})
+
+        assert await repo.count(CountMode.exact) == 1
+        assert await repo.count(CountMode.estimated) == 1
+        assert await repo.count(CountMode.none) is None
+        assert await repo.count(CountMode.cached) == 1
+        assert store["count:users"] == "1"
+
+        await repo.create({"id": USER_2, "email": "two@example.com", "password": "x"})
+        assert "count:users" not in store
+        assert await repo.count(CountMode.cached) == len([USER_1, USER_2])
+
+        # Filtered totals honour the mode: cached by filter, estimates capped.
+        filters = parse_filters(["email:startswith:t"])
+        assert await repo.count(CountMode.cached, filters) == 1
+        assert [key for key in store if key.startswith("count:users:")]
+        assert await repo.count(CountMode.exact, parse_filters(["email:startswith:"])) == await repo.count()
+        monkeypatch.setattr(repo, "filtered_count_cap", 1)
+        assert await repo.count(CountMode.estimated, parse_filters(["email:startswith:"])) == 1
+
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_partial_index_filters_only_accept_its_values():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+        repo = TemplateRepository(session)
+        assert await repo.get_all(filters=parse_filters(["published:eq:true"])) == []
+        with pytest.raises(HTTPException, match="Allowed values: true"):
+            await repo.get_all(filters=parse_filters(["published:eq:false"]))
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_contains_filters_need_a_trigram():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+        repo = UserRepository(session)
+        assert await repo.get_all(filters=parse_filters(["name:contains:abc"])) == []
+        with pytest.raises(HTTPException, match="at least 3 characters"):
+            await repo.get_all(filters=parse_filters(["name:contains:ab"]))
+    await engine.dispose()
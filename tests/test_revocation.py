@@ -0,0 +1,115 @@
+import time
+
+import pytest
+
+from app.services.revocation_service import BloomFilter, RevocationService
+
+
+def test_bloom_filter_membership():
+    bloom = BloomFilter(capacity=1000, error_rate=0.001)
+    for i in range(1000):
+        bloom.add(f"token-{i}")
+
+    assert all(f"token-{i}" in bloom for i in range(1000))
+    trials = 10000
+    false_positives = sum(f"other-{i}" in bloom for i in range(trials))
+    assert false_positives < 5 * bloom.error_rate * trials
+
+
+@pytest.mark.asyncio
+async def test_unrevoked_token_skips_redis(monkeypatch):
+    service = RevocationService(capacity=100, error_rate=0.01)
+
+    async def fail(_token_id):
+        message = "Redis should not be queried on a filter miss"
+        raise AssertionError(message)
+
+    monkeypatch.setattr(
+        "app.services.revocation_service.cache_service.is_token_blacklisted", fail
+    )
+    assert not await service.is_revoked("never-revoked")
+    assert service.stats()["filter_hits"] == 0
+
+
+@pytest.mark.asyncio
+async def test_filter_hit_is_confirmed_in_redis(monkeypatch):
+    service = RevocationService(capacity=100, error_rate=0.01)
+    service.on_message("revoked-id")
+    blacklisted = {"revoked-id"}
+
+    async def is_token_blacklisted(token_id):
+        return token_id in blacklisted
+
+    monkeypatch.setattr(
+        "app.services.revocation_service.cache_service.is_token_blacklisted",
+        is_token_blacklisted,
+    )
+    assert await service.is_revoked("revoked-id")
+    blacklisted.clear()
+    assert not await service.is_revoked("revoked-id")
+    assert service.stats()["false_positives"] == 1
+
+
+@pytest.mark.asyncio
+async def test_own_revocation_message_is_not_counted_twice(monkeypatch):
+    service = RevocationService(capacity=100, error_rate=0.01)
+    published = []
+
+    async def set_blacklist_token(token_id, ttl):
+        pass
+
+    async def publish(_channel, message):
+        published.append(message)
+
+    monkeypatch.setattr(
+        "app.services.revocation_service.cache_service.set_blacklist_token",
+        set_blacklist_token,
+    )
+    monkeypatch.setattr("app.services.revocation_service.cache_service.publish", publish)
+
+    await service.revoke("revoked-id", time.time() + 60)
+    service.on_message(published[0])
+    assert service.stats()["filter_entries"] == 1
+
+    # Another worker's revocation is still added.
+    other = RevocationService(capacity=100, error_rate=0.01)
+    other.on_message(published[0])
+    assert other.stats()["filter_entries"] == 1
+
+
+@pytest.mark.asyncio
+async def test_epoch_revokes_tokens_issued_before_it(monkeypatch):
+    service = RevocationService(capacity=100, error_rate=0.01)
+    store = {}
+
+    async def get(key):
+        return store.get(key)
+
+    async def set_many(items, ttl=None, nx=False, notify=None):
+        store.update(items)
+        return ttl, nx, notify
+
+    monkeypatch.setattr("app.services.revocation_service.cache_service.get", get)
+    monkeypatch.setattr("app.services.revocation_service.cache_service.set_many", set_many)
+
+    assert not await service.is_revoked("jti-1", "user-1", 100.0)
+    epoch = await service.revoke_all("user-1")
+
+    assert await service.is_revoked("jti-1", "user-1", epoch - 1)
+    assert not await service.is_revoked("jti-2", "user-1", epoch + 1)
+    assert not await service.is_revoked("jti-1", "user-2", epoch - 1)
+    assert service.stats()["epoch_hits"] > 1
+
+    epoch = await service.revoke_all_many(["user-2", "user-3"])
+    assert await service.is_revoked("jti-1", "user-2", epoch - 1)
+    assert await service.is_revoked("jti-1", "user-3", epoch - 1)
+
+
+@pytest.mark.asyncio
+async def test_epoch_message_updates_local_cache():
+    service = RevocationService(capacity=100, error_rate=0.01)
+    epoch = 1700000000.5
+    service.on_epoch_message(f"user-1:{epoch!r}")
+
+    assert await service.get_epoch("user-1") == epoch
+    assert service.stats()["epoch_misses"] == 0
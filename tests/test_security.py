@@ -0,0 +1,112 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+from app.core.hashing import HashingPool
+from app.core.security import (
+    calibrate_bcrypt_rounds,
+    create_access_token,
+    decode_token_cached,
+    get_hash_rounds,
+    get_password_hash,
+    hash_password_async,
+    password_needs_rehash,
+    set_bcrypt_rounds,
+    verify_password_async,
+)
+from app.core.token_cache import VerifiedTokenCache, token_cache
+
+
+def _slow_identity(value):
+    time.sleep(0.2)
+    return value
+
+
+@pytest.mark.asyncio
+async def test_hash_and_verify_password_async():
+    hashed = await hash_password_async("testpassword123")
+    assert await verify_password_async("testpassword123", hashed)
+    assert not await verify_password_async("wrongpassword", hashed)
+
+
+@pytest.mark.asyncio
+async def test_hashing_pool_rejects_when_queue_is_full():
+    pool = HashingPool(kind="thread", max_workers=1, max_queue=1)
+    try:
+        results = await asyncio.gather(
+            *(pool.run(_slow_identity, i) for i in range(3)),
+            return_exceptions=True,
+        )
+    finally:
+        pool.shutdown()
+
+    rejected = [r for r in results if isinstance(r, HTTPException)]
+    assert len(rejected) == 1
+    assert rejected[0].status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+    stats = pool.stats()
+    assert stats["completed"] == len(results) - len(rejected)
+    assert stats["rejected"] == 1
+    assert stats["peak_in_flight"] == pool.max_workers + pool.max_queue
+    assert stats["wait_seconds_max"] > 0
+
+
+def test_password_needs_rehash_when_cost_differs(monkeypatch):
+    rounds = 4
+    current = get_password_hash("testpassword123")
+    outdated = get_password_hash("testpassword123", rounds=rounds)
+
+    assert get_hash_rounds(outdated) == rounds
+    assert not password_needs_rehash(current)
+    assert password_needs_rehash(outdated)
+
+    set_bcrypt_rounds(rounds)
+    try:
+        # A lowered configured cost is applied to stronger hashes too...
+        assert password_needs_rehash(current)
+        # ...but a process calibrated to a lower cost does not downgrade them.
+        monkeypatch.setattr(settings, "bcrypt_calibrate", True)
+        assert not password_needs_rehash(current)
+    finally:
+        set_bcrypt_rounds(settings.bcrypt_rounds)
+
+
+def test_calibrate_bcrypt_rounds_stays_within_bounds():
+    bounds = {"min_rounds": 4, "max_rounds": 6}
+    assert calibrate_bcrypt_rounds(target_ms=0, **bounds) == bounds["min_rounds"]
+    assert calibrate_bcrypt_rounds(target_ms=10**9, **bounds) == bounds["max_rounds"]
+
+
+def test_verified_token_cache_hits_and_evicts():
+    cache = VerifiedTokenCache(max_size=2)
+    exp = time.time() + 60
+
+    assert cache.get("token-a") is None
+    cache.put("token-a", {"sub": "a", "exp": exp})
+    cache.put("token-b", {"sub": "b", "exp": exp})
+    assert cache.get("token-a") == {"sub": "a", "exp": exp}
+
+    cache.put("token-c", {"sub": "c", "exp": exp})
+    assert cache.get("token-b") is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_verified_token_cache_drops_expired_claims():
+    cache = VerifiedTokenCache(max_size=10)
+    cache.put("token", {"sub": "a", "exp": time.time() - 1})
+
+    assert cache.get("token") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_decode_token_cached_verifies_once():
+    token = create_access_token({"sub": "user-1"})
+    token_cache.clear()
+
+    assert decode_token_cached(token)["sub"] == "user-1"
+    hits = token_cache.stats()["hits"]
+    assert decode_token_cached(token)["sub"] == "user-1"
+    assert token_cache.stats()["hits"] == hits + 1
@@ -0,0 +1,160 @@
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.common.exceptions import DuplicateError
+from app.common.filtering import parse_filters, parse_sort
+from app.common.pagination import CountMode
+from app.core.database import Base, ShardSet
+from app.core.ids import new_id
+from app.models.user import User
+from app.models.user_shard import UserShard
+from app.repositories.user_repository import UserRepository
+
+SHARDS = 3
+USERS = 30
+
+
+@pytest.fixture(autouse=True)
+def redis_down(monkeypatch):
+    # Every lookup goes to the databases.
+    async def fail(*_args, **_kwargs):
+        message = "redis is down"
+        raise RedisConnectionError(message)
+
+    for name in ("get", "set", "set_many", "delete", "delete_many"):
+        monkeypatch.setattr(f"app.core.cache.cache_service.{name}", fail)
+
+
+@pytest.fixture
+async def sharded(tmp_path):
+    main = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/main.db")
+    shards = ShardSet([
+        create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/shard{i}.db") for i in range(SHARDS)
+    ])
+    for engine in (main, *shards.engines):
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+    async with async_sessionmaker(main, expire_on_commit=False)() as session:
+        yield UserRepository(session, shards), shards
+    await shards.dispose()
+    await main.dispose()
+
+
+async def _create_users(repo):
+    started = datetime(2024, 1, 1, tzinfo=UTC)
+    return [
+        await repo.create({
+            "id": new_id(),
+            "email": f"user{i:02}@example.com",
+            "name": f"User {i:02}",
+            "password": "x",
+            "created_at": started + timedelta(minutes=i),
+        })
+        for i in range(USERS)
+    ]
+
+
+async def _shard_ids(shards, shard):
+    async with shards.session_makers[shard]() as session:
+        return set((await session.execute(select(User.id))).scalars().all())
+
+
+@pytest.mark.asyncio
+async def test_users_are_spread_over_shards_by_id(sharded):
+    repo, shards = sharded
+    users = await _create_users(repo)
+
+    placed = [await _shard_ids(shards, shard) for shard in range(SHARDS)]
+    assert all(placed), "every shard should hold some users"
+    for user in users:
+        assert [user.id in ids for ids in placed].count(True) == 1
+        assert user.id in placed[shards.shard_for(user.id)]
+    async with repo.session.begin():
+        assert (await repo.session.execute(select(func.count()).select_from(User))).scalar_one() == 0
+        assert (await repo.session.execute(select(func.count()).select_from(UserShard))).scalar_one() == USERS
+
+    user = users[7]
+    assert (await repo.get_by_id(user.id)).email == user.email
+    assert (await repo.get_by_email(user.email)).id == user.id
+    assert await repo.get_by_id("not-a-uuid") is None
+    assert await repo.get_by_email("nobody@example.com") is None
+    assert await repo.count(CountMode.exact) == USERS
+    expected = sum(u.email.startswith("user1") for u in users)
+    assert await repo.count(CountMode.exact, parse_filters(["email:startswith:user1"])) == expected
+
+    # Emails stay unique across shards, whichever shard the new id hashes to.
+    with pytest.raises(DuplicateError):
+        await repo.create({"id": new_id(), "email": user.email, "password": "x"})
+    assert await repo.count(CountMode.exact) == USERS
+
+
+@pytest.mark.asyncio
+async def test_fan_out_reads_merge_in_order(sharded):
+    repo, _ = sharded
+    users = await _create_users(repo)
+    expected = [user.email for user in users]
+
+    assert [u.email for u in await repo.get_all(5, 10)] == expected[5:15]
+    descending = await repo.get_all(0, 4, ["email"], sort=parse_sort("-email"))
+    assert [u.email for u in descending] == expected[::-1][:4]
+
+    seen, cursor = [], None
+    while True:
+        page = await repo.get_page(7, cursor, ["id", "email"])
+        seen += [u.email for u in page.items]
+        if page.next_cursor is None:
+            break
+        cursor = page.next_cursor
+    assert seen == expected
+    back = await repo.get_page(7, page.prev_cursor, ["email"])
+    assert [u.email for u in back.items] == expected[-9:-2]
+
+    first = await repo.search("user", ["id", "email"], limit=4)
+    second = await repo.search("user", ["id", "email"], limit=4, cursor=first.next_cursor)
+    assert [u["email"] for u in first.items + second.items] == expected[:8]
+
+    streamed = [row.email async for rows in repo.stream(["email"]) for row in rows]
+    assert sorted(streamed) == expected
+
+
+@pytest.mark.asyncio
+async def test_sharded_writes_keep_the_directory_in_step(sharded):
+    repo, shards = sharded
+    users = await _create_users(repo)
+    user = users[3]
+
+    assert (await repo.update(user.id, {"email": "renamed@example.com"})).email == "renamed@example.com"
+    assert await repo.get_by_email(user.email) is None
+    assert (await repo.get_by_email("renamed@example.com")).id == user.id
+    with pytest.raises(DuplicateError):
+        await repo.update(user.id, {"email": users[4].email})
+    assert (await repo.get_by_email("renamed@example.com")).id == user.id
+    assert await repo.update_password_hash(user.id, "x", "y")
+
+    created = await repo.bulk_create([
+        {"id": new_id(), "email": "bulk1@example.com", "password": "x"},
+        {"id": new_id(), "email": users[0].email, "password": "x"},
+        {"id": new_id(), "email": "bulk2@example.com", "password": "x"},
+    ])
+    assert [c is not None for c in created] == [True, False, True]
+    updated = await repo.bulk_update([
+        {"id": created[0].id, "name": "Bulk"},
+        {"id": created[2].id, "email": "bulk3@example.com"},
+        {"id": new_id(), "name": "Missing"},
+    ])
+    assert updated[0].name == "Bulk"
+    assert updated[2] is None
+    assert (await repo.get_by_email("bulk3@example.com")).id == created[2].id
+
+    deleted = await repo.bulk_delete([created[0].id, created[2].id, new_id()])
+    assert deleted == [True, True, False]
+    assert await repo.delete(user.id)
+    assert await repo.get_by_email("renamed@example.com") is None
+    # Released emails can be registered again.
+    await repo.create({"id": new_id(), "email": "renamed@example.com", "password": "x"})
+    assert await repo.count(CountMode.exact) == USERS
+    assert sum([len(await _shard_ids(shards, shard)) for shard in range(SHARDS)]) == USERS
@@ -1,5 +1,20 @@
+import json
+from unittest.mock import AsyncMock
+
 import pytest
 from faker import Faker
+from fastapi import status
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.database import Base
+from app.repositories.user_repository import UserRepository
+from app.services.import_service import (
+    MAX_RECORD_CHARS,
+    ConflictMode,
+    ImportFormat,
+    ImportService,
+    read_records,
+)
 
 fake = Faker()
 
@@ -53,5 +68,213 @@ async def test_get_user_by_id(async_client):
 async def test_get_user_not_found(async_client):
     response = async_client.get("/api/users/nonexistent-id")
     assert response.status_code == 404
-    assert "not found" in response.json()["detail"]
+    assert "not found" in response.json()["message"]
+
+
+
+@pytest.mark.asyncio
+async def test_update_and_delete_user(async_client):
+    response = async_client.post(
+        "/api/users/",
+        json={"email": fake.email(), "password": "testpassword123", "name": "Test User"},
+    )
+    user_id = response.json()["id"]
+
+    response = async_client.put(f"/api/users/{user_id}", json={"name": "Renamed"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["name"] == "Renamed"
+
+    # email may be left out but not cleared.
+    response = async_client.put(f"/api/users/{user_id}", json={"email": None})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
+
+    response = async_client.delete(f"/api/users/{user_id}")
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    response = async_client.delete(f"/api/users/{user_id}")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.asyncio
+async def test_bulk_users(async_client):
+    email = fake.email()
+    response = async_client.post(
+        "/api/users/bulk",
+        json={
+            "create": [
+                {"email": email, "password": "testpassword123"},
+                {"email": fake.email(), "password": "testpassword123"},
+                {"email": email, "password": "testpassword123"},
+            ]
+        },
+    )
+    assert response.status_code == status.HTTP_200_OK
+    created = response.json()["created"]
+    assert [item["status"] for item in created] == ["created", "created", "conflict"]
+
+    first_id, second_id = created[0]["id"], created[1]["id"]
+    response = async_client.post(
+        "/api/users/bulk",
+        json={
+            "update": [
+                {"id": first_id, "name": "Renamed"},
+                {"id": second_id, "email": email},
+                {"id": "nonexistent-id", "name": "Nobody"},
+            ],
+            "delete": [second_id, "nonexistent-id"],
+        },
+    )
+    body = response.json()
+    assert [item["status"] for item in body["updated"]] == ["updated", "conflict", "not_found"]
+    assert [item["status"] for item in body["deleted"]] == ["deleted", "not_found"]
+    assert async_client.get(f"/api/users/{first_id}").json()["name"] == "Renamed"
+
+
+@pytest.mark.asyncio
+async def test_import_users(async_client):
+    email = fake.email()
+    body = (
+        "email,password,name\n"
+        f'{email},testpassword123,"Imported, User"\n'
+        "not-an-email,testpassword123,Bad\n"
+        f"{fake.email()},testpassword123\n"
+    )
+    response = async_client.post("/api/users/import?format=csv", content=body)
+    assert response.status_code == status.HTTP_200_OK
+    report = response.json()
+    assert report["imported"] == 1
+    assert report["invalid"] == len(report["errors"])
+    assert [error["line"] for error in report["errors"]] == [3, 4]
+
+    # Re-running the same file skips rows that were already imported.
+    report = async_client.post("/api/users/import?format=csv", content=body).json()
+    assert report["imported"] == 0
+    assert report["skipped"] == 1
+
+    # Overwriting existing users is CLI-only; over HTTP they are skipped.
+    body = f'{{"email": "{email}", "password": "newpassword123", "name": "Updated"}}\n'
+    report = async_client.post("/api/users/import?format=ndjson&on_conflict=update", content=body).json()
+    assert report["imported"] == 0
+    assert report["skipped"] == 1
+    users = async_client.get("/api/users/?limit=100").json()["users"]
+    assert [user["name"] for user in users if user["email"] == email] == ["Imported, User"]
+
+
+@pytest.mark.asyncio
+async def test_import_update_resets_sessions_in_one_call(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'import.db'}")
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    revoke_all_many = AsyncMock()
+    invalidate_many = AsyncMock()
+    monkeypatch.setattr("app.services.import_service.revocation_service.revoke_all_many", revoke_all_many)
+    monkeypatch.setattr("app.services.import_service.principal_cache.invalidate_many", invalidate_many)
+
+    async def chunks(*emails):
+        for email in emails:
+            yield f'{{"email": "{email}", "password": "x", "name": "{email}"}}\n'.encode()
+
+    existing, emails = ("a@example.com", "b@example.com"), ("a@example.com", "b@example.com", "c@example.com")
+    try:
+        async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+            repo = UserRepository(session, shards=None)
+            await ImportService(repo).import_users(read_records(chunks(*existing), ImportFormat.ndjson))
+            existing_ids = [(await repo.get_by_email_uncached(email)).id for email in existing]
+            revoke_all_many.assert_not_awaited()
+
+            report = await ImportService(repo).import_users(
+                read_records(chunks(*emails), ImportFormat.ndjson),
+                on_conflict=ConflictMode.update,
+            )
+    finally:
+        await engine.dispose()
+
+    assert report.imported == len(emails)
+    revoke_all_many.assert_awaited_once()
+    assert sorted(revoke_all_many.await_args.args[0]) == sorted(existing_ids)
+    invalidate_many.assert_awaited_once_with(revoke_all_many.await_args.args[0])
+
+
+@pytest.mark.asyncio
+async def test_stray_quote_does_not_swallow_the_upload():
+    async def chunks():
+        yield b'email,password\n"a@example.com,x\n'
+        for i in range(MAX_RECORD_CHARS // 10):
+            yield f"u{i}@example.com,x\n".encode()
+        yield b"last@example.com,x\n"
+
+    records = [record async for record in read_records(chunks(), ImportFormat.csv)]
+    assert records[0] == (2, f"Record is longer than {MAX_RECORD_CHARS} characters")
+    assert records[-1][1] == {"email": "last@example.com", "password": "x"}
+
+
+@pytest.mark.asyncio
+async def test_export_users(async_client):
+    email = fake.email()
+    async_client.post(
+        "/api/users/",
+        json={"email": email, "password": "testpassword123", "name": "Exported, User"},
+    )
+
+    response = async_client.get("/api/users/export")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert {"email": email, "name": "Exported, User"}.items() <= next(
+        row for row in rows if row["email"] == email
+    ).items()
+    assert all("password" not in row for row in rows)
+
+    response = async_client.get("/api/users/export?format=csv&fields=email,name")
+    assert response.status_code == status.HTTP_200_OK
+    lines = response.text.splitlines()
+    assert lines[0] == "email,name"
+    assert f'{email},"Exported, User"' in lines
+
+
+@pytest.mark.asyncio
+async def test_search_users(async_client):
+    prefix = fake.pystr(min_chars=8, max_chars=8).lower()
+    for email, name in [
+        (f"{prefix}b@example.com", "Second"),
+        (f"{prefix}a@example.com", "First"),
+        (f"other.{prefix}@example.com", "Substring"),
+        ("someone@example.com", f"{prefix} By Name"),
+    ]:
+        async_client.post("/api/users/", json={"email": email, "password": "testpassword123", "name": name})
+
+    response = async_client.get("/api/users/search", params={"q": prefix.upper(), "limit": 2})
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert [user["name"] for user in data["users"]] == ["First", "Second"]
+
+    data = async_client.get(
+        "/api/users/search", params={"q": prefix, "limit": 2, "cursor": data["next_cursor"]}
+    ).json()
+    assert [user["name"] for user in data["users"]] == [f"{prefix} By Name", "Substring"]
+    assert data["next_cursor"] is None
+
+    data = async_client.get("/api/users/search", params={"q": "%", "fields": "email"}).json()
+    assert data["users"] == []
+
+
+@pytest.mark.asyncio
+async def test_filter_and_sort_users(async_client):
+    prefix = fake.pystr(min_chars=8, max_chars=8).lower()
+    emails = [f"{prefix}{i}@example.com" for i in range(3)]
+    for email in emails:
+        async_client.post("/api/users/", json={"email": email, "password": "testpassword123"})
+
+    params = {"filter": f"email:startswith:{prefix.upper()}", "sort": "-email", "limit": 2}
+    data = async_client.get("/api/users/", params=params).json()
+    assert data["total"] == len(emails)
+    assert [user["email"] for user in data["users"]] == emails[:0:-1]
+
+    data = async_client.get("/api/users/", params={**params, "cursor": data["next_cursor"]}).json()
+    assert [user["email"] for user in data["users"]] == emails[:1]
+    assert data["next_cursor"] is None
 
+    response = async_client.get("/api/users/", params={"filter": "name:eq:x"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    response = async_client.get("/api/users/", params={"sort": "name"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST